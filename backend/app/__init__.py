@@ -3,17 +3,22 @@
 
 import os
 import logging # Add logging import
-from flask import Flask, send_from_directory, render_template
+from flask import Flask, send_from_directory, render_template, jsonify, request
 from flask_cors import CORS
 
 from .config import config_by_name
 from .models import recipe as db_recipe # Alias to avoid naming conflict
+from .models import response_cache
+from . import json_provider
 from .routes import recipes
 from .routes import daily_menus # Import the new daily_menus blueprint
 from .routes import utils # Import the new utils blueprint
 from .routes import secure_recipes # Import the new secure_recipes blueprint
 # Import all CLI commands from the cli_commands module
-from .scripts.cli_commands import init_db_command, seed_recipes_command, seed_images_command
+from .scripts.cli_commands import init_db_command, seed_recipes_command, seed_images_command, rebuild_search_index_command, \
+    backfill_recipe_index_command, migrate_images_to_store_command, generate_image_derivatives_command, \
+    init_data_versions_command, clear_response_cache_command, ensure_indexes_command, benchmark_recipe_indexes_command, \
+    import_recipes_command, export_recipes_command, benchmark_validation_command, migrate_menu_versions_command
 
 def create_app(config_name=None):
     """Application factory function."""
@@ -43,11 +48,15 @@ def create_app(config_name=None):
     except OSError:
         pass # Already exists
 
+    # jsonify() through orjson when installed, with support for pre-encoded recipe documents
+    json_provider.init_app(app)
+
     # Initialize extensions
     CORS(app, resources={r"/api/*": {"origins": "*"}}) # Allow all origins for API routes for now
 
     # Initialize database functions
     db_recipe.init_app(app)
+    response_cache.init_app(app)
 
     # Register blueprints
     app.register_blueprint(recipes.bp)
@@ -59,6 +68,31 @@ def create_app(config_name=None):
     app.cli.add_command(init_db_command)
     app.cli.add_command(seed_recipes_command)
     app.cli.add_command(seed_images_command)
+    app.cli.add_command(rebuild_search_index_command)
+    app.cli.add_command(backfill_recipe_index_command)
+    app.cli.add_command(migrate_images_to_store_command)
+    app.cli.add_command(generate_image_derivatives_command)
+    app.cli.add_command(init_data_versions_command)
+    app.cli.add_command(clear_response_cache_command)
+    app.cli.add_command(ensure_indexes_command)
+    app.cli.add_command(benchmark_recipe_indexes_command)
+    app.cli.add_command(import_recipes_command)
+    app.cli.add_command(export_recipes_command)
+    app.cli.add_command(benchmark_validation_command)
+    app.cli.add_command(migrate_menu_versions_command)
+
+    # Bodies over the request's limit (MAX_CONTENT_LENGTH unless the route raised it, like the
+    # recipe import) are refused by the request parser; answer in JSON like the API
+    @app.errorhandler(413)
+    def request_entity_too_large(error):
+        limit = request.max_content_length
+        if not limit:
+            message = "Request body is too large."
+        elif limit >= 1024 * 1024:
+            message = f"Request body exceeds the limit of {limit // 1024 // 1024}MB."
+        else:
+            message = f"Request body exceeds the limit of {limit // 1024}KB."
+        return jsonify({"message": message}), 413
 
     # Add debug log before publish
     app.logger.setLevel(logging.DEBUG)
@@ -19,6 +19,59 @@ class Config:
     DATABASE = os.environ.get('DATABASE_URL') or \
         os.path.join(basedir, 'instance', 'database.db')
 
+    # Recipe images are stored as files named by their content hash (not as BLOBs in the database)
+    IMAGE_STORE_PATH = os.environ.get('IMAGE_STORE_PATH') or \
+        os.path.join(basedir, 'instance', 'images')
+    # When set (e.g. '/_image_store/'), image responses only carry an X-Accel-Redirect header
+    # and nginx serves the file from its matching `internal` location (see deployment/nginx.conf)
+    IMAGE_ACCEL_REDIRECT_PREFIX = os.environ.get('IMAGE_ACCEL_REDIRECT_PREFIX')
+    # Menu responses reference images by URL; with ?inline_images=thumb, the thumb derivative
+    # is embedded as Base64 (or the original, when there is no derivative and it is at most this size)
+    MENU_INLINE_IMAGE_MAX_BYTES = 16 * 1024
+    # Longest range (in days, inclusive) one /api/daily-menus/calendar or /shopping-list request may cover
+    MENU_CALENDAR_MAX_DAYS = 366
+    # Number of background processes that resize uploads into thumb/card/full derivatives
+    # (0 = resize synchronously inside the upload request)
+    IMAGE_DERIVATIVE_WORKERS = int(os.environ.get('IMAGE_DERIVATIVE_WORKERS') or 2)
+
+    # Uploads are streamed from the request into the image store in chunks (never read whole
+    # into memory). Larger image files are rejected with 413; MAX_CONTENT_LENGTH caps every
+    # request body (the multipart envelope around an image needs a little room above the image)
+    MAX_IMAGE_UPLOAD_BYTES = int(os.environ.get('MAX_IMAGE_UPLOAD_BYTES') or 10 * 1024 * 1024)
+    MAX_CONTENT_LENGTH = MAX_IMAGE_UPLOAD_BYTES + 1024 * 1024
+
+    # Response cache for recipe and menu queries, shared by all gunicorn workers through a
+    # separate SQLite file (set RESPONSE_CACHE_PATH to an empty string to disable it)
+    RESPONSE_CACHE_PATH = os.environ.get('RESPONSE_CACHE_PATH', os.path.join(basedir, 'instance', 'response_cache.db'))
+    RESPONSE_CACHE_TTL = 300 # Seconds; writes through the app invalidate entries before that
+    RESPONSE_CACHE_MAX_ENTRIES = 2000 # Least recently used entries are evicted beyond this
+    RESPONSE_CACHE_MMAP_SIZE = 64 * 1024 * 1024 # Read cache entries through memory mapping
+
+    # Database connections are pooled per worker thread (see app/models/db_pool.py) and
+    # get this PRAGMA profile once, when they are opened
+    SQLITE_POOL_ENABLED = True
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL', # Readers don't block on the writer (persists in the database file)
+        'synchronous': 'NORMAL', # Safe with WAL; fsync only at checkpoints
+        'foreign_keys': 'ON', # Makes the ON DELETE CASCADE clauses in the schema work
+        'busy_timeout': 5000, # Milliseconds to wait for a lock before failing
+        'cache_size': -16000, # Page cache per connection in KiB (negative) = 16 MB
+        'mmap_size': 128 * 1024 * 1024, # Read the database through memory mapping
+        'temp_store': 'MEMORY',
+    }
+    # Reads (GET handlers) go through read-only connections; writes take the write lock up
+    # front with BEGIN IMMEDIATE and, if busy_timeout runs out, retry with exponential backoff
+    SQLITE_READ_ONLY_CONNECTIONS = True
+    SQLITE_WRITE_RETRIES = 3
+    SQLITE_WRITE_BACKOFF = 0.05 # Seconds before the first retry, doubled for each further one
+
+    # Recipes per transaction for the NDJSON bulk import (flask import-recipes, POST /api/secure/recipes/import)
+    RECIPE_IMPORT_BATCH_SIZE = 500
+    RECIPE_IMPORT_MAX_BYTES = 512 * 1024 * 1024 # Request body limit of the import endpoint
+
+    # Encode API responses with orjson when it is installed (see app/json_provider.py)
+    JSON_USE_ORJSON = True
+
     # Disable SQLAlchemy event system if not using SQLAlchemy, saves resources
     SQLALCHEMY_TRACK_MODIFICATIONS = False # Relevant if using Flask-SQLAlchemy
 
@@ -50,6 +103,8 @@ class TestingConfig(Config):
     # Or use a file:
     # DATABASE = os.path.join(basedir, 'instance', 'test_database.db')
     SECRET_KEY = 'test-secret-key' # Use a fixed key for tests
+    IMAGE_DERIVATIVE_WORKERS = 0 # Generate derivatives synchronously so tests can check them
+    RESPONSE_CACHE_PATH = None # Tests that need the response cache enable it explicitly
 
 class ProductionConfig(Config):
     """Production specific configuration."""
@@ -0,0 +1,135 @@
+# backend/app/http_cache.py
+# HTTP caching (ETag / Last-Modified / 304 and the shared response cache) for read-only API responses
+
+import functools
+import hashlib
+import sqlite3
+from datetime import datetime, timezone
+from flask import request, make_response, current_app
+
+from .models.recipe import get_read_db
+from .models import response_cache
+
+# Cache-Control policies. JSON data changes whenever someone edits a recipe or saves a menu,
+# so browsers may store it but must revalidate (cheap: usually a 304 without a body).
+REVALIDATE = 'no-cache'
+# Versioned image URLs (?v=<content hash>) never change content
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+def get_data_versions(scopes):
+    """
+    Returns (token, last_modified) for the given data_versions scopes, or None if the
+    data_versions table does not exist yet (run `flask init-data-versions`).
+    The token changes on every write to any of the scopes.
+    """
+    try:
+        rows = get_read_db().execute(
+            f"SELECT name, version, updated_at FROM data_versions WHERE name IN ({', '.join('?' for _ in scopes)})",
+            tuple(scopes)
+        ).fetchall()
+    except sqlite3.OperationalError:
+        return None
+    if len(rows) != len(scopes):
+        return None
+    token = '|'.join(f"{row['name']}:{row['version']}" for row in sorted(rows, key=lambda row: row['name']))
+    last_modified = max(
+        datetime.strptime(row['updated_at'], '%Y-%m-%d %H:%M:%S.%f').replace(tzinfo=timezone.utc)
+        for row in rows
+    )
+    return token, last_modified
+
+
+def is_not_modified(etag, last_modified=None):
+    """
+    True if the request's validators still match. If-None-Match wins over If-Modified-Since
+    (RFC 9110); the date is only trusted for changes older than the current second, because
+    Last-Modified has one second resolution.
+    """
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    if request.if_modified_since and last_modified is not None:
+        last_modified_second = last_modified.replace(microsecond=0)
+        now_second = datetime.now(timezone.utc).replace(microsecond=0)
+        return last_modified_second < now_second and request.if_modified_since >= last_modified_second
+    return False
+
+
+def set_validators(response, etag, last_modified=None, cache_control=REVALIDATE):
+    """Adds ETag, Last-Modified and Cache-Control headers to a response."""
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.headers['Cache-Control'] = cache_control
+    return response
+
+
+def not_modified_response(etag, last_modified=None, cache_control=REVALIDATE):
+    """An empty 304 response carrying the same validators as the full response would."""
+    response = current_app.response_class(status=304)
+    return set_validators(response, etag, last_modified, cache_control)
+
+
+def conditional(*scopes, cache_control=REVALIDATE, when=None):
+    """
+    Decorator for GET views whose output only depends on the request and the given data scopes.
+    The ETag is derived from the scopes' data versions and the URL, so a matching
+    If-None-Match / If-Modified-Since is answered with 304 before the view runs
+    (one small data_versions read instead of the view's queries and JSON encoding).
+    Only 200 responses get validators; errors are passed through unchanged.
+    `when` is an optional predicate (no arguments) limiting validators to some requests.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapped(*args, **kwargs):
+            if when is not None and not when():
+                return view(*args, **kwargs)
+            versions = get_data_versions(scopes)
+            if versions is None:
+                # Validators unavailable (old database): behave like an uncached endpoint
+                return view(*args, **kwargs)
+
+            token, last_modified = versions
+            etag = hashlib.sha1(f"{request.full_path}|{token}".encode('utf-8')).hexdigest()
+            if is_not_modified(etag, last_modified):
+                return not_modified_response(etag, last_modified, cache_control)
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                set_validators(response, etag, last_modified, cache_control)
+            return response
+        return wrapped
+    return decorator
+
+
+def cached(tags, when=None):
+    """
+    Decorator for GET views backed by the shared response cache (see models/response_cache.py).
+    `tags` is called as tags(payload, **view_kwargs) with the JSON body of a fresh 200 response
+    and returns the data tags the response depends on; writes invalidate entries by tag.
+    `when` is an optional predicate (no arguments) limiting caching to some requests.
+    Place it below @conditional, so 304s are answered before the cache is consulted.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapped(*args, **kwargs):
+            if not response_cache.is_enabled() or (when is not None and not when()):
+                return view(*args, **kwargs)
+
+            key = response_cache.make_key(request.path, request.args)
+            entry = response_cache.get(key)
+            if entry is not None:
+                response = current_app.response_class(entry['body'], status=200, mimetype=entry['mimetype'])
+                response.headers['X-Cache'] = 'HIT'
+                return response
+
+            # Read before the view reads any data: if a write invalidates this response's tags
+            # while it is being built, put() sees that and does not store the old body
+            generation = response_cache.current_generation()
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200 and response.is_json:
+                response_cache.put(key, response.get_data(), response.mimetype, tags(response.get_json(), **kwargs), generation)
+                response.headers['X-Cache'] = 'MISS'
+            return response
+        return wrapped
+    return decorator
@@ -0,0 +1,82 @@
+# backend/app/json_provider.py
+# JSON provider for jsonify(): orjson when it is installed, plus pre-encoded JSON fragments
+
+import json
+import re
+import secrets
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError: # Optional dependency: the standard library encoder is used without it
+    orjson = None
+
+# Keyword arguments the orjson path can honour (Flask passes compact separators outside debug mode)
+COMPACT_SEPARATORS = (',', ':')
+
+
+class RawJSON:
+    """
+    An already encoded JSON value (bytes or str). Put it anywhere in a jsonify() payload
+    and it is copied into the output as is, e.g. a cached recipe document
+    (see models/recipe_documents.py), instead of being decoded and encoded again.
+    """
+    __slots__ = ('encoded',)
+
+    def __init__(self, encoded):
+        self.encoded = encoded.decode('utf-8') if isinstance(encoded, bytes) else encoded
+
+    def __repr__(self):
+        return f"RawJSON({self.encoded[:40]!r})"
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Same output rules as Flask's default provider (sorted keys, RFC 822 dates, dataclasses...),
+    but encodes with orjson when available and the app has JSON_USE_ORJSON on. Falls back to
+    the standard library for the pretty-printed debug output or custom dump arguments.
+    """
+
+    def __init__(self, app):
+        super().__init__(app)
+        self.use_orjson = orjson is not None and app.config.get('JSON_USE_ORJSON', True)
+
+    def dumps(self, obj, **kwargs):
+        fragments = []
+        nonce = None
+
+        def default(value):
+            nonlocal nonce
+            if isinstance(value, RawJSON):
+                # Stand-in string, swapped for the fragment once the surrounding JSON is encoded
+                if nonce is None:
+                    nonce = secrets.token_hex(8)
+                fragments.append(value.encoded)
+                return f"@raw-json:{nonce}:{len(fragments) - 1}@"
+            return self.default(value)
+
+        if self.use_orjson and kwargs.keys() <= {'separators'} and kwargs.get('separators', COMPACT_SEPARATORS) == COMPACT_SEPARATORS:
+            # Datetimes pass through to `default`, so they keep Flask's RFC 822 format
+            options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+            if self.sort_keys:
+                options |= orjson.OPT_SORT_KEYS
+            encoded = orjson.dumps(obj, default=default, option=options).decode('utf-8')
+        else:
+            kwargs.setdefault("default", default)
+            kwargs.setdefault("ensure_ascii", self.ensure_ascii)
+            kwargs.setdefault("sort_keys", self.sort_keys)
+            encoded = json.dumps(obj, **kwargs)
+
+        if fragments:
+            encoded = re.sub(f'"@raw-json:{nonce}:(\\d+)@"', lambda match: fragments[int(match.group(1))], encoded)
+        return encoded
+
+    def loads(self, s, **kwargs):
+        if self.use_orjson and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+
+def init_app(app):
+    """Installs the provider on the app (jsonify, request.get_json, app.json)."""
+    app.json = FastJSONProvider(app)
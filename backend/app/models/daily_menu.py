@@ -3,14 +3,52 @@
 
 import sqlite3
 import json
+import calendar
+import hashlib
 from flask import current_app, g
 from datetime import date
 
 # Assuming get_db and close_db are managed in recipe.py or a shared db module
 # If they are specific to recipe.py, we might need to import them or redefine them here.
 # For now, assume they are accessible via g and current_app context.
-from .recipe import get_db # Import get_db only if recipe_to_dict is not needed elsewhere here
-import base64 # Needed for encoding image data
+from .recipe import get_db, get_read_db, begin_write, get_image_bytes # Import get_db only if recipe_to_dict is not needed elsewhere here
+from . import image_derivatives
+from . import image_store
+from . import response_cache
+from . import menu_repository
+from . import shopping_list
+import base64 # Needed for encoding inline thumbnails
+
+# Inline image modes accepted by get_menu_details (None = URLs only)
+INLINE_IMAGE_MODES = ('thumb',)
+
+# Meal types allowed by daily_menu_recipes.meal_type, in the order a day is served
+MEAL_TYPES = ('早餐', '午餐', '晚餐', '夜宵', '小吃', '其他')
+
+
+def recipe_image_url(recipe_id, content_hash=None):
+    """
+    URL of a recipe's primary image. The content hash is added as a version parameter,
+    so the URL changes whenever the image does and browsers can cache it indefinitely.
+    """
+    url = f"/api/recipes/{recipe_id}/image"
+    return f"{url}?v={content_hash}" if content_hash else url
+
+def inline_thumbnail(image_id, content_hash, image_size, max_bytes):
+    """
+    Returns (bytes, mime_type) of the image to embed in a menu response, or (None, None).
+    Prefers the JPEG thumb derivative; falls back to the original only if it is within max_bytes.
+    Anything larger is left to the client to fetch (and cache) by URL.
+    """
+    if content_hash:
+        thumb_path = image_derivatives.find_derivative(content_hash, 'thumb', 'image/jpeg')
+        if thumb_path:
+            return image_store.read_image(thumb_path), 'image/jpeg'
+    if image_size and image_size <= max_bytes:
+        image_data = get_image_bytes(image_id)
+        if image_data:
+            return image_data, image_store.sniff_mime_type(image_data)
+    return None, None
 
 def daily_menu_to_dict(row):
     """Converts a sqlite3.Row object for a daily_menu into a dictionary."""
@@ -31,172 +69,155 @@ def daily_menu_recipe_to_dict(row):
 
 def get_menu_versions_by_date(date_str):
     """Retrieves all menu versions for a specific date."""
-    db = get_db()
-    cursor = db.execute(
-        "SELECT * FROM daily_menus WHERE menu_date = ? ORDER BY version ASC",
-        (date_str,)
-    )
-    versions = cursor.fetchall()
-    return [daily_menu_to_dict(row) for row in versions]
+    return [daily_menu_to_dict(row) for row in menu_repository.load_versions(get_read_db(), date_str)]
 
-def get_menu_details(menu_id):
-    """Retrieves all recipes and their meal types for a specific daily_menu_id, including the primary image data."""
-    db = get_db()
-    cursor = db.execute(
-        """
-        SELECT
-            dmr.id, dmr.daily_menu_id, dmr.recipe_id, dmr.meal_type,
-            r.name as recipe_name,
-            r.description as recipe_description,
-            r.ingredients,
-            r.cook_time_minutes,
-            r.difficulty,
-            r.tags,
-            -- Subquery to get the first image data for the recipe
-            (SELECT ri.image_data
-             FROM recipe_images ri
-             WHERE ri.recipe_id = r.id
-             ORDER BY ri.id ASC -- Or order by is_primary DESC, id ASC if you have a primary flag
-             LIMIT 1
-            ) as recipe_image_data
-        FROM daily_menu_recipes dmr
-        JOIN recipes r ON dmr.recipe_id = r.id
-        WHERE dmr.daily_menu_id = ?
-        ORDER BY dmr.id ASC
-        """,
-        (menu_id,)
-    )
-    recipes = cursor.fetchall()
-
-    # Convert rows to dictionaries, handling potential None for image data
-    result_list = []
-    for row in recipes:
-        recipe_dict = dict(row)
-        # Ensure image data is properly handled (e.g., if it's None or needs encoding)
-        # Assuming image_data is stored as BLOB and needs Base64 encoding for JSON/frontend
-        if recipe_dict.get('recipe_image_data'):
-             # If image_data is BLOB, encode it to Base64 string
-             # import base64 # Moved import to top level
-             recipe_dict['recipe_image_data'] = base64.b64encode(recipe_dict['recipe_image_data']).decode('utf-8')
-        else:
-             recipe_dict['recipe_image_data'] = None # Explicitly set to None if no image found
-
-        # Convert tags string back to list if stored as JSON string or comma-separated
-        if recipe_dict.get('tags') and isinstance(recipe_dict['tags'], str):
-            try:
-                # Assuming tags are stored as a JSON string in the DB
-                tags_list = json.loads(recipe_dict['tags'])
-                # Further check if it's actually a list after loading
-                recipe_dict['tags'] = tags_list if isinstance(tags_list, list) else recipe_dict['tags'].split(',')
-            except json.JSONDecodeError:
-                 # Fallback if it's not JSON, try splitting by comma
-                 recipe_dict['tags'] = [tag.strip() for tag in recipe_dict['tags'].split(',') if tag.strip()]
-            except Exception:
-                 # Fallback for any other error
-                 recipe_dict['tags'] = []
-        elif not recipe_dict.get('tags'):
+def menu_content_hash(dishes):
+    """
+    Content hash of a menu version: SHA-256 of its ordered [(recipe_id, meal_type), ...] list.
+    Recipe ids are never reused (AUTOINCREMENT), so a hash can only ever match the same dishes.
+    """
+    payload = json.dumps([[recipe_id, meal_type] for recipe_id, meal_type in dishes],
+                         ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def menu_recipe_to_dict(row, inline_images=None):
+    """
+    Converts a menu recipe row (see menu_repository.MENU_RECIPES_SQL) into a dictionary.
+    Each recipe carries `recipe_image_url` / `recipe_image_hash` pointing at its primary image
+    instead of the image bytes. With inline_images='thumb', the thumb derivative (or the original,
+    if it is small enough) is also embedded as Base64 in `recipe_image_data`.
+    """
+    recipe_dict = dict(row)
+    image_id = recipe_dict.pop('recipe_image_id')
+    image_size = recipe_dict.pop('recipe_image_size')
+    recipe_dict['recipe_image_url'] = recipe_image_url(recipe_dict['recipe_id'], recipe_dict['recipe_image_hash']) if image_id else None
+
+    recipe_dict['recipe_image_data'] = None
+    if inline_images == 'thumb' and image_id:
+        inline_max_bytes = current_app.config.get('MENU_INLINE_IMAGE_MAX_BYTES', 0)
+        image_data, mime_type = inline_thumbnail(image_id, recipe_dict['recipe_image_hash'], image_size, inline_max_bytes)
+        if image_data:
+            recipe_dict['recipe_image_data'] = base64.b64encode(image_data).decode('utf-8')
+            recipe_dict['recipe_image_mime_type'] = mime_type
+
+    # Convert tags string back to list if stored as JSON string or comma-separated
+    if recipe_dict.get('tags') and isinstance(recipe_dict['tags'], str):
+        try:
+            # Assuming tags are stored as a JSON string in the DB
+            tags_list = json.loads(recipe_dict['tags'])
+            # Further check if it's actually a list after loading
+            recipe_dict['tags'] = tags_list if isinstance(tags_list, list) else recipe_dict['tags'].split(',')
+        except json.JSONDecodeError:
+             # Fallback if it's not JSON, try splitting by comma
+             recipe_dict['tags'] = [tag.strip() for tag in recipe_dict['tags'].split(',') if tag.strip()]
+        except Exception:
+             # Fallback for any other error
              recipe_dict['tags'] = []
+    elif not recipe_dict.get('tags'):
+         recipe_dict['tags'] = []
+    return recipe_dict
 
+def menu_to_dict(version_row, recipe_rows, inline_images=None):
+    """{'version_info': {...}, 'recipes': [...]} for a version row and its recipe rows."""
+    return {
+        "version_info": daily_menu_to_dict(version_row),
+        "recipes": [menu_recipe_to_dict(row, inline_images) for row in recipe_rows],
+    }
 
-        result_list.append(recipe_dict)
+def get_menu_details(menu_id, inline_images=None):
+    """Retrieves all recipes and their meal types for a specific daily_menu_id (see menu_recipe_to_dict)."""
+    rows = menu_repository.load_recipes(get_read_db(), [menu_id])[menu_id]
+    return [menu_recipe_to_dict(row, inline_images) for row in rows]
 
-    return result_list
+def get_menu_version(menu_id, inline_images=None):
+    """The {'version_info', 'recipes'} of one menu version (two queries), or None if it does not exist."""
+    version_row, recipe_rows = menu_repository.load_menu(get_read_db(), menu_id)
+    if version_row is None:
+        return None
+    return menu_to_dict(version_row, recipe_rows, inline_images)
 
-def get_latest_menu_by_date(date_str):
-    """Retrieves the details of the latest menu version for a specific date."""
-    db = get_db()
-    # Find the latest version ID for the given date
-    cursor = db.execute(
-        "SELECT id FROM daily_menus WHERE menu_date = ? ORDER BY version DESC LIMIT 1",
-        (date_str,)
-    )
-    latest_version = cursor.fetchone()
+def get_menu_by_date(date_str, inline_images=None):
+    """
+    The menu view of a date in two queries: (latest menu, versions). The latest menu is
+    {'version_info', 'recipes'} or None if nothing was saved; versions is a list of version dicts.
+    """
+    versions, latest_recipes = menu_repository.load_date(get_read_db(), date_str)
+    if not versions:
+        return None, []
+    return menu_to_dict(versions[-1], latest_recipes, inline_images), [daily_menu_to_dict(row) for row in versions]
 
-    if latest_version:
-        latest_menu_id = latest_version['id']
-        details = get_menu_details(latest_menu_id)
-        # Also return the version info itself
-        version_info = daily_menu_to_dict(db.execute("SELECT * FROM daily_menus WHERE id = ?", (latest_menu_id,)).fetchone())
-        return {"version_info": version_info, "recipes": details}
-    else:
-        return None # No menu found for this date
+def get_latest_menu_by_date(date_str, inline_images=None):
+    """Retrieves the details of the latest menu version for a specific date."""
+    latest_menu, _ = get_menu_by_date(date_str, inline_images)
+    return latest_menu # None if no menu found for this date
 
 def save_menu(date_str, recipes_with_type, overwrite=False):
+    """
+    Saves a new menu version for a given date (see save_menu_version).
+    Returns the ID of the newly created daily_menu record or None on failure.
+    """
+    saved_menu = save_menu_version(date_str, recipes_with_type, overwrite)
+    return saved_menu['version_info']['id'] if saved_menu else None
+
+def save_menu_version(date_str, recipes_with_type, overwrite=False):
     """
     Saves a new menu version for a given date.
-    If overwrite is True, it replaces version 1.
+    If overwrite is True, it replaces version 1 (or creates it), keeping its id.
     If overwrite is False, it adds a new version.
     `recipes_with_type` is a list of dicts: [{"recipe_id": int, "meal_type": str}]
-    Returns the ID of the newly created daily_menu record or None on failure.
+    Returns the saved menu ({'version_info', 'recipes'}, read back inside the write transaction,
+    so callers need no second round-trip) or None on failure.
     """
     db = get_db()
-    cursor = None
-    new_version_number = 1
 
     try:
-        # Start transaction
-        db.execute("BEGIN")
+        # Start the transaction holding the write lock: the content lookup, the version row
+        # and its dishes below are written as one unit, never interleaved with another worker's save
+        begin_write(db)
 
-        # Check existing versions for the date
-        cursor = db.execute(
-            "SELECT MAX(version) as max_version FROM daily_menus WHERE menu_date = ?",
-            (date_str,)
-        )
-        result = cursor.fetchone()
-        max_version = result['max_version'] if result and result['max_version'] is not None else 0
+        # Versions with the same dishes share one stored copy of them (copy-on-write:
+        # stored rows are never changed while other versions point at them)
+        dishes = [
+            (item['recipe_id'], item.get('meal_type', '其他'))
+            for item in recipes_with_type or [] if 'recipe_id' in item # Basic validation
+        ]
+        content_hash = menu_content_hash(dishes)
+        content_menu_id = menu_repository.find_content_menu(db, content_hash)
 
         if overwrite:
-            # If overwriting, we target version 1.
-            # We might need to delete existing version 1 and its recipes first,
-            # or handle this via UNIQUE constraint failure (simpler for now).
-            # Let's assume overwrite means "create version 1, potentially replacing".
-            # For simplicity, let's just try to insert version 1. If it fails due to UNIQUE,
-            # it means version 1 exists. A more robust approach might delete first.
-            new_version_number = 1
-            # Consider deleting existing version 1 recipes if replacing:
-            # cursor = db.execute("SELECT id FROM daily_menus WHERE menu_date = ? AND version = 1", (date_str,))
-            # existing_v1 = cursor.fetchone()
-            # if existing_v1:
-            #     db.execute("DELETE FROM daily_menu_recipes WHERE daily_menu_id = ?", (existing_v1['id'],))
-            #     db.execute("DELETE FROM daily_menus WHERE id = ?", (existing_v1['id'],))
-
-        elif max_version > 0:
-            # If not overwriting and versions exist, increment the version number
-            new_version_number = max_version + 1
-        # else: new_version_number remains 1 (first version for the date)
-
-        # Insert the new menu version record
-        cursor = db.execute(
-            "INSERT INTO daily_menus (menu_date, version) VALUES (?, ?)",
-            (date_str, new_version_number)
-        )
-        new_daily_menu_id = cursor.lastrowid
-
-        if not new_daily_menu_id:
-            raise sqlite3.Error("Failed to insert into daily_menus table.")
-
-        # Insert recipes for the new menu version
-        if recipes_with_type: # Ensure there are recipes to insert
-            recipes_data = [
-                (new_daily_menu_id, item['recipe_id'], item.get('meal_type', '其他'))
-                for item in recipes_with_type if 'recipe_id' in item # Basic validation
-            ]
-            if recipes_data: # Check if there's valid data after filtering
-                db.executemany(
-                    "INSERT INTO daily_menu_recipes (daily_menu_id, recipe_id, meal_type) VALUES (?, ?, ?)",
-                    recipes_data
-                )
+            # Create or replace version 1 in place (same id), then swap out its old dishes
+            version = menu_repository.upsert_first_version(db, date_str, content_hash, content_menu_id)
+            if version is None:
+                # Version 1 already has exactly these dishes: nothing to write
+                new_daily_menu_id = db.execute(
+                    "SELECT id FROM daily_menus WHERE menu_date = ? AND version = 1", (date_str,)
+                ).fetchone()['id']
+            else:
+                new_daily_menu_id = version['id']
+                menu_repository.release_contents(db, new_daily_menu_id)
+        else:
+            # Add a new version after the latest one (version 1 if it is the first for the date)
+            version = menu_repository.insert_next_version(db, date_str, content_hash, content_menu_id)
+            new_daily_menu_id = version['id']
+
+        # Insert recipes for the new menu version, unless an identical version already holds them
+        if version is not None and dishes and content_menu_id is None:
+            menu_repository.insert_contents(db, new_daily_menu_id, dishes)
+
+        # Read the saved version back while still holding the write lock (same connection,
+        # two queries), so the caller gets exactly what was committed
+        version_row, recipe_rows = menu_repository.load_menu(db, new_daily_menu_id)
 
         # Commit transaction
         db.commit()
-        current_app.logger.info(f"Successfully saved menu version {new_version_number} for date {date_str} (ID: {new_daily_menu_id}).")
-        return new_daily_menu_id
+        response_cache.invalidate(response_cache.menu_date_tag(date_str), response_cache.MENU_DATES_TAG)
+        current_app.logger.info(f"Successfully saved menu version {version_row['version']} for date {date_str} (ID: {new_daily_menu_id}).")
+        return menu_to_dict(version_row, recipe_rows)
 
     except sqlite3.IntegrityError as e:
-        # Handle potential UNIQUE constraint violation if trying to overwrite improperly
+        # Version numbers cannot collide any more; this is a dish referencing a missing recipe
         db.rollback()
-        current_app.logger.error(f"Integrity error saving menu for {date_str} (version {new_version_number}): {e}", exc_info=True)
-        # This might happen if trying to insert version 1 when it already exists and overwrite logic wasn't robust enough
+        current_app.logger.error(f"Integrity error saving menu for {date_str}: {e}", exc_info=True)
         return None # Indicate failure
     except sqlite3.Error as e:
         db.rollback()
@@ -210,7 +231,7 @@ def save_menu(date_str, recipes_with_type, overwrite=False):
 
 def get_dates_with_menus():
     """Retrieves a distinct list of dates ('YYYY-MM-DD') that have saved menus."""
-    db = get_db()
+    db = get_read_db()
     cursor = db.execute(
         "SELECT DISTINCT menu_date FROM daily_menus ORDER BY menu_date DESC"
     )
@@ -223,23 +244,14 @@ def get_dates_with_menus_in_month(year, month):
     Retrieves a distinct list of dates ('YYYY-MM-DD') within a specific year
     and month that have saved menus.
     """
-    db = get_db()
-    # Format month with leading zero if needed for comparison with strftime('%m')
-    month_str = f"{month:02d}"
-    year_str = str(year)
+    db = get_read_db()
+    # Compare the stored 'YYYY-MM-DD' strings against the month's first and last day,
+    # so the date index is used (strftime() on the column would scan every menu row)
+    last_day = calendar.monthrange(year, month)[1]
+    start_date, end_date = f"{year:04d}-{month:02d}-01", f"{year:04d}-{month:02d}-{last_day:02d}"
 
     try:
-        cursor = db.execute(
-            """
-            SELECT DISTINCT menu_date
-            FROM daily_menus
-            WHERE strftime('%Y', menu_date) = ? AND strftime('%m', menu_date) = ?
-            ORDER BY menu_date ASC
-            """,
-            (year_str, month_str)
-        )
-        dates = cursor.fetchall()
-        return [row['menu_date'] for row in dates]
+        return menu_repository.load_dates_between(db, start_date, end_date)
     except sqlite3.Error as e:
         # Log the error for debugging
         current_app.logger.error(f"Database error fetching menu dates for {year}-{month}: {e}", exc_info=True)
@@ -250,3 +262,50 @@ def get_dates_with_menus_in_month(year, month):
         current_app.logger.error(f"Unexpected error fetching menu dates for {year}-{month}: {e}", exc_info=True)
         # Re-raise the exception to be handled by the route
         raise e
+
+def get_menu_calendar(start_date, end_date):
+    """
+    Per-day summaries of the menus between two 'YYYY-MM-DD' dates (inclusive), in one query:
+    [{'date', 'version_count', 'latest_menu_id', 'dish_count', 'meal_types'}, ...] for each day
+    that has a menu. Dish count and meal types describe the latest version of the day.
+    """
+    days = []
+    for row in menu_repository.load_calendar(get_read_db(), start_date, end_date):
+        meal_types = set(row['meal_types'].split(',')) if row['meal_types'] else set()
+        days.append({
+            "date": row['menu_date'],
+            "version_count": row['version_count'],
+            "latest_menu_id": row['latest_menu_id'],
+            "dish_count": row['dish_count'],
+            "meal_types": [meal_type for meal_type in MEAL_TYPES if meal_type in meal_types],
+        })
+    return days
+
+def get_menu_diff(base_id, target_id):
+    """
+    What changed from one menu version to another, without loading either menu in full:
+    {'base', 'target' (version dicts), 'identical', 'added', 'removed'}, where 'added' and
+    'removed' list {'recipe_id', 'recipe_name', 'meal_type', 'count'} per changed dish.
+    Returns None if either version does not exist.
+    """
+    base, target, rows = menu_repository.load_diff(get_read_db(), base_id, target_id)
+    if base is None:
+        return None
+    added, removed = [], []
+    for row in rows:
+        change = {"recipe_id": row['recipe_id'], "recipe_name": row['recipe_name'], "meal_type": row['meal_type']}
+        if row['target_count'] > row['base_count']:
+            added.append(dict(change, count=row['target_count'] - row['base_count']))
+        else:
+            removed.append(dict(change, count=row['base_count'] - row['target_count']))
+    return {
+        "base": daily_menu_to_dict(base),
+        "target": daily_menu_to_dict(target),
+        "identical": not rows,
+        "added": added,
+        "removed": removed,
+    }
+
+def get_shopping_list(start_date, end_date):
+    """Aggregated ingredients of the latest menu of every date between two 'YYYY-MM-DD' dates (see shopping_list)."""
+    return shopping_list.build_shopping_list(get_read_db(), start_date, end_date)
@@ -0,0 +1,163 @@
+# backend/app/models/db_pool.py
+# Reuses warm SQLite connections per worker thread instead of connecting on every request
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+from urllib.parse import quote
+from collections import OrderedDict
+
+# Idle connections are kept per thread (sqlite3 connections must stay on their thread), one per
+# database file and mode. A gunicorn sync worker therefore keeps one warm read-only connection
+# (GET handlers) and one read-write connection (the writer) per database.
+MAX_IDLE_PER_THREAD = 4
+# PRAGMAs that change the database file rather than the connection; read-only connections skip them
+FILE_PRAGMAS = ('journal_mode',)
+PRAGMA_NAME_PATTERN = re.compile(r'^[a-z_]+$')
+
+_local = threading.local()
+_stats_lock = threading.Lock()
+_stats = {
+    "created": 0, # New connections (connect + PRAGMAs + schema load on first query)
+    "reused": 0, # Requests served by an idle connection
+    "released": 0, # Connections handed back at teardown
+    "discarded": 0, # Connections closed instead of kept (broken, pool full, forked process)
+    "write_retries": 0, # BEGIN IMMEDIATE attempts that found another writer and backed off
+}
+
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def _idle_connections():
+    """This thread's idle connections: (database, read_only) -> (pid, connection)."""
+    idle = getattr(_local, 'idle', None)
+    if idle is None:
+        idle = _local.idle = OrderedDict()
+    return idle
+
+
+def apply_pragmas(db, pragmas):
+    """Applies a PRAGMA profile ({name: value}, see Config.SQLITE_PRAGMAS) to a connection."""
+    for name, value in (pragmas or {}).items():
+        if not PRAGMA_NAME_PATTERN.match(name):
+            raise ValueError(f"Invalid PRAGMA name: {name!r}")
+        db.execute(f"PRAGMA {name} = {value}")
+
+
+def connect(database, read_only=False):
+    """
+    Opens a connection. Read-only connections use a `mode=ro` URI, so SQLite refuses any
+    write and never takes the write lock; they raise sqlite3.OperationalError if the
+    database file does not exist yet.
+    """
+    if read_only:
+        return sqlite3.connect(f"file:{quote(os.path.abspath(database))}?mode=ro", uri=True, detect_types=sqlite3.PARSE_DECLTYPES)
+    return sqlite3.connect(database, detect_types=sqlite3.PARSE_DECLTYPES)
+
+
+def acquire(database, pragmas=None, on_connect=None, read_only=False):
+    """
+    Returns an idle connection to `database` from this thread's pool, or opens a new one.
+    New connections get the PRAGMA profile and are then passed to on_connect(db)
+    (row factory, SQL functions). Read-only connections also get `query_only`.
+    Hand the connection back with release(), passing the same read_only flag.
+    """
+    idle = _idle_connections()
+    entry = idle.pop((database, read_only), None)
+    if entry is not None:
+        pid, db = entry
+        # Never use a connection inherited through fork (e.g. gunicorn --preload)
+        if pid == os.getpid():
+            _count("reused")
+            return db
+        _count("discarded")
+
+    db = connect(database, read_only)
+    if read_only:
+        pragmas = {name: value for name, value in (pragmas or {}).items() if name not in FILE_PRAGMAS}
+        pragmas['query_only'] = 'ON'
+    apply_pragmas(db, pragmas)
+    if on_connect is not None:
+        on_connect(db)
+    _count("created")
+    return db
+
+
+def release(database, db, read_only=False):
+    """
+    Hands a connection back to this thread's pool. An open transaction (left over by an
+    error) is rolled back first, so the next request starts clean.
+    """
+    try:
+        if db.in_transaction:
+            db.rollback()
+    except sqlite3.Error:
+        db.close()
+        _count("discarded")
+        return
+
+    idle = _idle_connections()
+    previous = idle.pop((database, read_only), None)
+    if previous is not None:
+        previous[1].close()
+        _count("discarded")
+    idle[(database, read_only)] = (os.getpid(), db)
+    # Tests and CLI runs may touch many database files: keep only the most recent ones
+    while len(idle) > MAX_IDLE_PER_THREAD:
+        _, (_, oldest) = idle.popitem(last=False)
+        oldest.close()
+        _count("discarded")
+    _count("released")
+
+
+def is_busy_error(error):
+    """True for the errors SQLite raises when another connection holds the lock."""
+    message = str(error).lower()
+    return isinstance(error, sqlite3.OperationalError) and ('locked' in message or 'busy' in message)
+
+
+def begin_immediate(db, retries=3, backoff=0.05):
+    """
+    Starts a write transaction with BEGIN IMMEDIATE, i.e. takes the database's single write
+    lock up front instead of at the first INSERT. Writers from all workers queue here (each
+    attempt waits up to busy_timeout), and a transaction that got the lock can no longer fail
+    halfway with "database is locked". If busy_timeout runs out, retries with exponential
+    backoff plus jitter before giving up. Does nothing if a transaction is already open.
+    """
+    if db.in_transaction:
+        return
+    for attempt in range(retries + 1):
+        try:
+            db.execute("BEGIN IMMEDIATE")
+            return
+        except sqlite3.OperationalError as e:
+            if not is_busy_error(e) or attempt == retries:
+                raise
+            _count("write_retries")
+            time.sleep(backoff * (2 ** attempt) * (1 + random.random()))
+
+
+def close_idle():
+    """Closes this thread's idle connections (e.g. before replacing the database file)."""
+    idle = _idle_connections()
+    while idle:
+        _, (_, db) = idle.popitem()
+        db.close()
+
+
+def get_stats():
+    """Counters of this worker process (each gunicorn worker has its own pool)."""
+    with _stats_lock:
+        stats = dict(_stats)
+    requests = stats["created"] + stats["reused"]
+    stats.update({
+        "pid": os.getpid(),
+        "idle_in_thread": len(_idle_connections()),
+        "reuse_ratio": round(stats["reused"] / requests, 4) if requests else None,
+    })
+    return stats
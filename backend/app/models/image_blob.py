@@ -0,0 +1,71 @@
+# backend/app/models/image_blob.py
+# Streams legacy image BLOBs (recipe_images.image_data) with incremental BLOB I/O
+import io
+import sqlite3
+from . import db_pool
+
+READ_CHUNK_SIZE = 64 * 1024 # Bytes per read when a response streams a BLOB
+
+
+class BlobReader(io.RawIOBase):
+    """
+    Read-only, seekable file object over one BLOB (sqlite3.Blob, from Connection.blobopen).
+    It owns the connection the BLOB was opened on and closes both together, so it can be
+    handed to a streamed response that outlives the request's own database connections.
+    """
+
+    def __init__(self, db, blob):
+        super().__init__()
+        self._db = db
+        self._blob = blob
+        self.length = len(blob)
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self._blob.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        self._blob.seek(offset, whence)
+        return self._blob.tell()
+
+    def tell(self):
+        return self._blob.tell()
+
+    def close(self):
+        if not self.closed:
+            try:
+                self._blob.close()
+            finally:
+                self._db.close()
+        super().close()
+
+
+def open_image_blob(database, image_id):
+    """
+    Opens the image_data BLOB of a recipe_images row for incremental reading, on a dedicated
+    read-only connection. Returns a BlobReader (close it when done), or None if the row has no
+    BLOB. On Python < 3.11 (no Connection.blobopen) the BLOB is read whole into a BytesIO.
+    """
+    db = db_pool.connect(database, read_only=True)
+    try:
+        row = db.execute("SELECT length(image_data) FROM recipe_images WHERE id = ?", (image_id,)).fetchone()
+        if row is None or row[0] is None:
+            db.close()
+            return None
+        if not hasattr(db, 'blobopen'):
+            data = db.execute("SELECT image_data FROM recipe_images WHERE id = ?", (image_id,)).fetchone()[0]
+            db.close()
+            reader = io.BytesIO(data)
+            reader.length = len(data)
+            return reader
+        return BlobReader(db, db.blobopen('recipe_images', 'image_data', image_id, readonly=True))
+    except sqlite3.Error:
+        db.close()
+        raise
@@ -0,0 +1,136 @@
+# backend/app/models/image_derivatives.py
+# Resized copies (thumb / card / full) of stored recipe images, in WebP and JPEG
+import os
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from flask import current_app
+
+try:
+    from PIL import Image, ImageOps
+except ImportError: # Pillow is optional: without it only the original upload is served
+    Image = None
+
+# Longest edge in pixels of each derivative size (2x the size the frontend displays it at).
+# Images smaller than a size are never upscaled.
+DERIVATIVE_SIZES = {
+    'thumb': 320, # Menu lists and MiniRecipeCard
+    'card': 640, # RecipeCard tiles
+    'full': 1600, # Recipe detail page
+}
+# Every size is written in both formats; WebP is served to browsers that accept it
+DERIVATIVE_FORMATS = {
+    'image/webp': ('webp', 'WEBP', {'quality': 80, 'method': 4}),
+    'image/jpeg': ('jpg', 'JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+# Derivatives live next to the originals, so the nginx X-Accel-Redirect location covers them too
+DERIVATIVE_DIR = 'derivatives'
+
+_executor = None
+
+
+def is_available():
+    """True if Pillow is installed and derivatives can be generated."""
+    return Image is not None
+
+
+def derivative_path_for(content_hash, size, mime_type):
+    """Relative path of a derivative inside the image store, e.g. 'derivatives/ab/cd/abcd...-thumb.webp'."""
+    extension = DERIVATIVE_FORMATS[mime_type][0]
+    return os.path.join(DERIVATIVE_DIR, content_hash[:2], content_hash[2:4], f"{content_hash}-{size}.{extension}")
+
+
+def find_derivative(content_hash, size, mime_type):
+    """
+    Returns the storage path of a derivative if it has been generated, otherwise None
+    (still being processed, Pillow not installed, or the original could not be decoded).
+    """
+    storage_path = derivative_path_for(content_hash, size, mime_type)
+    if os.path.exists(os.path.join(current_app.config['IMAGE_STORE_PATH'], storage_path)):
+        return storage_path
+    return None
+
+
+def _write_atomic(image, target_path, pil_format, options):
+    """Saves a Pillow image under a temporary name and renames it into place."""
+    target_dir = os.path.dirname(target_path)
+    os.makedirs(target_dir, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=target_dir, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            image.save(f, format=pil_format, **options)
+        os.replace(temp_path, target_path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def render_derivatives(store_path, storage_path, content_hash):
+    """
+    Generates every size/format derivative for one stored image.
+    Runs in a worker process, so it only takes plain arguments and does not use the app context.
+    Existing derivatives are skipped (they are named by content hash and never change).
+    Returns the list of storage paths that were written.
+    """
+    written = []
+    with Image.open(os.path.join(store_path, storage_path)) as source:
+        # Apply the EXIF rotation from phone cameras before resizing
+        source = ImageOps.exif_transpose(source)
+        has_alpha = source.mode in ('RGBA', 'LA') or (source.mode == 'P' and 'transparency' in source.info)
+        rgba = source.convert('RGBA') if has_alpha else None
+        rgb = source.convert('RGB')
+        if rgba is not None:
+            # JPEG has no transparency: flatten onto a white background
+            rgb = Image.new('RGB', rgba.size, (255, 255, 255))
+            rgb.paste(rgba, mask=rgba.getchannel('A'))
+
+        for size, max_edge in DERIVATIVE_SIZES.items():
+            for mime_type, (_, pil_format, options) in DERIVATIVE_FORMATS.items():
+                target = derivative_path_for(content_hash, size, mime_type)
+                target_path = os.path.join(store_path, target)
+                if os.path.exists(target_path):
+                    continue
+                base = rgba if (rgba is not None and pil_format == 'WEBP') else rgb
+                resized = base.copy()
+                resized.thumbnail((max_edge, max_edge), Image.LANCZOS)
+                _write_atomic(resized, target_path, pil_format, options)
+                written.append(target)
+    return written
+
+
+def get_executor(max_workers):
+    """Lazily creates the process pool shared by all requests of this (gunicorn) worker."""
+    global _executor
+    if _executor is None:
+        # 'spawn' so the pool never inherits locks held by other threads of the web server
+        _executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn'))
+    return _executor
+
+
+def schedule_derivatives(content_hash, storage_path):
+    """
+    Queues derivative generation for a stored image and returns immediately.
+    With IMAGE_DERIVATIVE_WORKERS = 0 the work is done synchronously (tests, CLI backfill).
+    Until the derivatives exist, the image endpoint keeps serving the original.
+    Returns the Future, the list of written paths (synchronous mode), or None if Pillow is missing.
+    """
+    logger = current_app.logger
+    if not is_available():
+        logger.warning("Pillow is not installed; image derivatives are not generated.")
+        return None
+
+    store_path = current_app.config['IMAGE_STORE_PATH']
+    max_workers = current_app.config.get('IMAGE_DERIVATIVE_WORKERS', 0)
+    if not max_workers:
+        return render_derivatives(store_path, storage_path, content_hash)
+
+    future = get_executor(max_workers).submit(render_derivatives, store_path, storage_path, content_hash)
+
+    def log_failure(done):
+        # Runs in the executor's callback thread (no app context), so use the captured logger
+        if done.exception() is not None:
+            logger.error(f"Generating image derivatives for {content_hash} failed: {done.exception()}")
+
+    future.add_done_callback(log_failure)
+    return future
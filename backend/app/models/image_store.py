@@ -0,0 +1,169 @@
+# backend/app/models/image_store.py
+# Content-addressed on-disk storage for recipe images
+import io
+import os
+import struct
+import hashlib
+import tempfile
+from flask import current_app
+
+UPLOAD_CHUNK_SIZE = 64 * 1024 # Bytes copied (and hashed) per read when streaming into the store
+SNIFF_BYTES = 16 # Enough for every magic number in sniff_mime_type
+# image_dimensions() only needs the header; JPEG frame headers can sit behind large EXIF blocks
+DIMENSIONS_HEADER_BYTES = 256 * 1024
+
+# Magic bytes -> mime type. The upload's file name is never trusted for the type.
+MIME_EXTENSIONS = {
+    'image/jpeg': 'jpg',
+    'image/png': 'png',
+    'image/gif': 'gif',
+    'image/webp': 'webp',
+}
+
+
+class ImageTooLargeError(ValueError):
+    """Raised by save_image_stream when an upload exceeds its size limit."""
+
+    def __init__(self, max_bytes):
+        super().__init__(f"Image exceeds the size limit of {max_bytes} bytes.")
+        self.max_bytes = max_bytes
+
+
+def sniff_mime_type(data):
+    """Detects the image type from the first bytes of the file. Returns None if unknown."""
+    if data.startswith(b'\xff\xd8\xff'):
+        return 'image/jpeg'
+    if data.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'image/png'
+    if data[:6] in (b'GIF87a', b'GIF89a'):
+        return 'image/gif'
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'image/webp'
+    return None
+
+
+def image_dimensions(data, mime_type):
+    """
+    Reads (width, height) from the image header without decoding the image.
+    Returns (None, None) if the header cannot be parsed.
+    """
+    try:
+        if mime_type == 'image/png':
+            return struct.unpack('>II', data[16:24])
+        if mime_type == 'image/gif':
+            return struct.unpack('<HH', data[6:10])
+        if mime_type == 'image/webp':
+            chunk = data[12:16]
+            if chunk == b'VP8 ':
+                width, height = struct.unpack('<HH', data[26:30])
+                return width & 0x3fff, height & 0x3fff
+            if chunk == b'VP8L':
+                bits = int.from_bytes(data[21:25], 'little')
+                return (bits & 0x3fff) + 1, ((bits >> 14) & 0x3fff) + 1
+            if chunk == b'VP8X':
+                return int.from_bytes(data[24:27], 'little') + 1, int.from_bytes(data[27:30], 'little') + 1
+        if mime_type == 'image/jpeg':
+            # Walk the JPEG segments until a start-of-frame marker
+            index = 2
+            while index + 9 < len(data):
+                if data[index] != 0xff:
+                    index += 1
+                    continue
+                marker = data[index + 1]
+                if 0xc0 <= marker <= 0xcf and marker not in (0xc4, 0xc8, 0xcc):
+                    height, width = struct.unpack('>HH', data[index + 5:index + 9])
+                    return width, height
+                segment_length = struct.unpack('>H', data[index + 2:index + 4])[0]
+                index += 2 + segment_length
+    except struct.error:
+        pass
+    return None, None
+
+
+def store_root():
+    """Directory that holds the stored image files."""
+    return current_app.config['IMAGE_STORE_PATH']
+
+
+def storage_path_for(content_hash, mime_type):
+    """Relative path of an image inside the store, e.g. 'ab/cd/abcd....jpg'."""
+    extension = MIME_EXTENSIONS.get(mime_type, 'bin')
+    return os.path.join(content_hash[:2], content_hash[2:4], f"{content_hash}.{extension}")
+
+
+def absolute_path(storage_path):
+    """Absolute file system path for a storage path returned by save_image."""
+    return os.path.join(store_root(), storage_path)
+
+
+def save_image(image_data):
+    """
+    Writes image bytes into the store, named by their SHA-256 hash (see save_image_stream).
+    Returns the metadata dict stored in recipe_images.
+    Raises ValueError if the data is not a supported image type.
+    """
+    return save_image_stream(io.BytesIO(image_data))
+
+
+def save_image_stream(stream, max_bytes=None):
+    """
+    Copies an image from a binary file object (e.g. an upload) into the store, chunk by chunk,
+    hashing as it goes; only the header is kept in memory. The type is sniffed from the first
+    chunk, before anything is written. The copy goes to a temporary file in the store and is
+    renamed to its content hash, so readers never see a partially written image and identical
+    uploads share a single file.
+    Returns the metadata dict stored in recipe_images.
+    Raises ValueError if the data is not a supported image type, ImageTooLargeError (a ValueError)
+    as soon as more than `max_bytes` have been read.
+    """
+    chunk = stream.read(UPLOAD_CHUNK_SIZE)
+    mime_type = sniff_mime_type(chunk)
+    if mime_type is None:
+        raise ValueError("Unsupported image format.")
+
+    root = store_root()
+    os.makedirs(root, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=root, suffix='.tmp')
+    digest = hashlib.sha256()
+    byte_size = 0
+    header = bytearray()
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            while chunk:
+                byte_size += len(chunk)
+                if max_bytes is not None and byte_size > max_bytes:
+                    raise ImageTooLargeError(max_bytes)
+                digest.update(chunk)
+                if len(header) < DIMENSIONS_HEADER_BYTES:
+                    header += chunk[:DIMENSIONS_HEADER_BYTES - len(header)]
+                f.write(chunk)
+                chunk = stream.read(UPLOAD_CHUNK_SIZE)
+
+        content_hash = digest.hexdigest()
+        storage_path = storage_path_for(content_hash, mime_type)
+        target_path = absolute_path(storage_path)
+        if os.path.exists(target_path):
+            os.remove(temp_path) # Already stored by an earlier upload
+        else:
+            os.makedirs(os.path.dirname(target_path), exist_ok=True)
+            os.replace(temp_path, target_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    width, height = image_dimensions(bytes(header), mime_type)
+    return {
+        "content_hash": content_hash,
+        "mime_type": mime_type,
+        "byte_size": byte_size,
+        "width": width,
+        "height": height,
+        "storage_path": storage_path,
+    }
+
+
+def read_image(storage_path):
+    """Reads a stored image fully into memory (only for small images / internal use)."""
+    with open(absolute_path(storage_path), 'rb') as f:
+        return f.read()
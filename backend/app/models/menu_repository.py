@@ -0,0 +1,234 @@
+# backend/app/models/menu_repository.py
+# Set-based loading of daily menus (version rows and menu recipe rows, a query each) and the
+# single-statement writes behind saving a version
+
+# Recipe rows of menu versions, with the metadata (no bytes) of each recipe's primary image.
+# A version that shares its contents (content_menu_id) reads the rows of the version owning them.
+# The primary image of every recipe in the menus is resolved once, in a grouped subquery,
+# instead of one correlated lookup per menu row.
+MENU_RECIPES_SQL = """
+    WITH menus AS (
+        SELECT id, COALESCE(content_menu_id, id) AS content_id
+        FROM daily_menus
+        WHERE id IN ({placeholders})
+    ),
+    menu_rows AS (
+        SELECT dmr.id, m.id AS daily_menu_id, dmr.recipe_id, dmr.meal_type
+        FROM menus m
+        JOIN daily_menu_recipes dmr ON dmr.daily_menu_id = m.content_id
+    ),
+    primary_images AS (
+        SELECT recipe_id, MAX(id) AS image_id
+        FROM recipe_images
+        WHERE is_primary = 1 AND recipe_id IN (SELECT recipe_id FROM menu_rows)
+        GROUP BY recipe_id
+    )
+    SELECT
+        dmr.id, dmr.daily_menu_id, dmr.recipe_id, dmr.meal_type,
+        r.name as recipe_name,
+        r.description as recipe_description,
+        r.ingredients,
+        r.cook_time_minutes,
+        r.difficulty,
+        r.tags,
+        ri.id as recipe_image_id,
+        ri.content_hash as recipe_image_hash,
+        ri.mime_type as recipe_image_mime_type,
+        ri.byte_size as recipe_image_size
+    FROM menu_rows dmr
+    JOIN recipes r ON dmr.recipe_id = r.id
+    LEFT JOIN primary_images pi ON pi.recipe_id = dmr.recipe_id
+    LEFT JOIN recipe_images ri ON ri.id = pi.image_id
+    ORDER BY dmr.daily_menu_id, dmr.id
+"""
+
+# Per-day summaries of a date range in one statement: the range predicate on menu_date is
+# answered by the date index (no function applied to the column), the latest version of each
+# day is joined back through UNIQUE(menu_date, version), and its recipes are counted per day.
+CALENDAR_SQL = """
+    WITH days AS (
+        SELECT menu_date, COUNT(*) AS version_count, MAX(version) AS latest_version
+        FROM daily_menus
+        WHERE menu_date BETWEEN ? AND ?
+        GROUP BY menu_date
+    )
+    SELECT
+        d.menu_date, d.version_count,
+        dm.id AS latest_menu_id,
+        COUNT(dmr.id) AS dish_count,
+        GROUP_CONCAT(DISTINCT dmr.meal_type) AS meal_types
+    FROM days d
+    JOIN daily_menus dm ON dm.menu_date = d.menu_date AND dm.version = d.latest_version
+    LEFT JOIN daily_menu_recipes dmr ON dmr.daily_menu_id = COALESCE(dm.content_menu_id, dm.id)
+    GROUP BY d.menu_date
+    ORDER BY d.menu_date
+"""
+
+# Dishes whose count differs between two contents (version ids owning the rows), with the
+# recipe name: one grouped pass over both row sets instead of loading and comparing two menus
+DIFF_SQL = """
+    WITH sides AS (
+        SELECT recipe_id, meal_type, 1 AS in_base, 0 AS in_target
+        FROM daily_menu_recipes WHERE daily_menu_id = ?
+        UNION ALL
+        SELECT recipe_id, meal_type, 0 AS in_base, 1 AS in_target
+        FROM daily_menu_recipes WHERE daily_menu_id = ?
+    )
+    SELECT s.recipe_id, s.meal_type, r.name AS recipe_name,
+           SUM(s.in_base) AS base_count, SUM(s.in_target) AS target_count
+    FROM sides s
+    JOIN recipes r ON r.id = s.recipe_id
+    GROUP BY s.recipe_id, s.meal_type
+    HAVING SUM(s.in_base) != SUM(s.in_target)
+    ORDER BY s.recipe_id, s.meal_type
+"""
+
+
+def content_id(version):
+    """Id of the version whose daily_menu_recipes rows hold the given version row's dishes."""
+    return version['content_menu_id'] or version['id']
+
+
+def find_content_menu(db, content_hash):
+    """Id of the version owning the rows of a content (by hash), or None if it is not stored yet."""
+    row = db.execute(
+        "SELECT id FROM daily_menus WHERE content_hash = ? AND content_menu_id IS NULL ORDER BY id LIMIT 1",
+        (content_hash,)
+    ).fetchone()
+    return row['id'] if row else None
+
+
+def load_versions(db, date_str):
+    """All version rows of a date, oldest first (answered by the UNIQUE(menu_date, version) index)."""
+    return db.execute(
+        "SELECT * FROM daily_menus WHERE menu_date = ? ORDER BY version ASC",
+        (date_str,)
+    ).fetchall()
+
+
+def load_version(db, menu_id):
+    """One version row by id, or None."""
+    return db.execute("SELECT * FROM daily_menus WHERE id = ?", (menu_id,)).fetchone()
+
+
+def load_recipes(db, menu_ids):
+    """Returns {menu_id: [recipe rows in the order they were added]} for the given versions."""
+    menu_ids = list(dict.fromkeys(menu_ids))
+    recipes = {menu_id: [] for menu_id in menu_ids}
+    if not menu_ids:
+        return recipes
+    rows = db.execute(MENU_RECIPES_SQL.format(placeholders=', '.join('?' * len(menu_ids))), menu_ids)
+    for row in rows:
+        recipes[row['daily_menu_id']].append(row)
+    return recipes
+
+
+def load_date(db, date_str):
+    """
+    Everything the menu view of a date needs, in two queries: its version rows (oldest first)
+    and the recipe rows of the latest version. Returns (versions, latest_recipes);
+    versions is empty (and latest_recipes None) when nothing was saved for the date.
+    """
+    versions = load_versions(db, date_str)
+    if not versions:
+        return versions, None
+    latest_id = versions[-1]['id']
+    return versions, load_recipes(db, [latest_id])[latest_id]
+
+
+def load_menu(db, menu_id):
+    """One version in two queries: (version row, recipe rows), or (None, None) if it does not exist."""
+    version = load_version(db, menu_id)
+    if version is None:
+        return None, None
+    return version, load_recipes(db, [menu_id])[menu_id]
+
+
+def load_calendar(db, start_date, end_date):
+    """Summary rows (see CALENDAR_SQL) of every date in [start_date, end_date] that has a menu."""
+    return db.execute(CALENDAR_SQL, (start_date, end_date)).fetchall()
+
+
+def load_dates_between(db, start_date, end_date):
+    """Distinct dates in [start_date, end_date] that have a menu, ascending."""
+    rows = db.execute(
+        "SELECT DISTINCT menu_date FROM daily_menus WHERE menu_date BETWEEN ? AND ? ORDER BY menu_date ASC",
+        (start_date, end_date)
+    )
+    return [row['menu_date'] for row in rows]
+
+
+def load_diff(db, base_id, target_id):
+    """
+    Compares two versions: (base row, target row, diff rows; see DIFF_SQL), or (None, None, None)
+    if either does not exist. Versions sharing their contents are identical without reading any rows.
+    """
+    versions = {row['id']: row for row in db.execute(
+        "SELECT * FROM daily_menus WHERE id IN (?, ?)", (base_id, target_id)
+    )}
+    base, target = versions.get(base_id), versions.get(target_id)
+    if base is None or target is None:
+        return None, None, None
+    if content_id(base) == content_id(target):
+        return base, target, []
+    return base, target, db.execute(DIFF_SQL, (content_id(base), content_id(target))).fetchall()
+
+
+# Writes: each runs inside the caller's write transaction (begin_write), as one statement where it matters.
+
+# Appends the next version of a date. Numbering and insert are one statement, so two saves for
+# the same date can never pick the same number (no UNIQUE failure, nothing to retry).
+INSERT_NEXT_VERSION_SQL = """
+    INSERT INTO daily_menus (menu_date, version, content_hash, content_menu_id)
+    SELECT ?, COALESCE(MAX(version), 0) + 1, ?, ? FROM daily_menus WHERE menu_date = ?
+    RETURNING id, version
+"""
+
+# Creates or replaces version 1 of a date. Replacing dishes with the same dishes is skipped by the
+# DO UPDATE ... WHERE, in which case no row is returned.
+UPSERT_FIRST_VERSION_SQL = """
+    INSERT INTO daily_menus (menu_date, version, content_hash, content_menu_id) VALUES (?, 1, ?, ?)
+    ON CONFLICT (menu_date, version) DO UPDATE
+        SET content_hash = excluded.content_hash,
+            content_menu_id = excluded.content_menu_id,
+            created_at = CURRENT_TIMESTAMP
+        WHERE daily_menus.content_hash IS NOT excluded.content_hash
+    RETURNING id, version
+"""
+
+
+def insert_next_version(db, date_str, content_hash, content_menu_id):
+    """Adds a version after the date's latest one; returns its (id, version) row."""
+    return db.execute(INSERT_NEXT_VERSION_SQL, (date_str, content_hash, content_menu_id, date_str)).fetchone()
+
+
+def upsert_first_version(db, date_str, content_hash, content_menu_id):
+    """Creates or replaces version 1 of a date; returns its (id, version) row, or None if it already had these dishes."""
+    return db.execute(UPSERT_FIRST_VERSION_SQL, (date_str, content_hash, content_menu_id)).fetchone()
+
+
+def release_contents(db, menu_id):
+    """
+    Detaches the daily_menu_recipes rows of a version whose dishes are being replaced.
+    If other versions share them, they are handed to the oldest of those (copy-on-write: the
+    rows themselves never change); otherwise they are deleted.
+    """
+    heir = db.execute(
+        "SELECT id FROM daily_menus WHERE content_menu_id = ? ORDER BY id LIMIT 1", (menu_id,)
+    ).fetchone()
+    if heir is None:
+        db.execute("DELETE FROM daily_menu_recipes WHERE daily_menu_id = ?", (menu_id,))
+        return
+    db.execute("UPDATE daily_menu_recipes SET daily_menu_id = ? WHERE daily_menu_id = ?", (heir['id'], menu_id))
+    db.execute(
+        "UPDATE daily_menus SET content_menu_id = CASE id WHEN ? THEN NULL ELSE ? END WHERE content_menu_id = ?",
+        (heir['id'], heir['id'], menu_id)
+    )
+
+
+def insert_contents(db, menu_id, dishes):
+    """Stores a version's own rows, one bulk insert of [(recipe_id, meal_type), ...] in order."""
+    db.executemany(
+        "INSERT INTO daily_menu_recipes (daily_menu_id, recipe_id, meal_type) VALUES (?, ?, ?)",
+        [(menu_id, recipe_id, meal_type) for recipe_id, meal_type in dishes]
+    )
@@ -2,23 +2,81 @@
 # Recipe data model and database interaction functions
 import sqlite3
 import json
+import base64
 from flask import current_app, g
+from . import search
+from . import recipe_index
+from . import image_store
+from . import image_derivatives
+from . import response_cache
+from . import recipe_sampler
+from . import db_pool
+from . import recipe_query
+from . import recipe_indexes
+from . import recipe_documents
+
+def _setup_connection(db):
+    """Per-connection setup, done once per pooled connection."""
+    db.row_factory = sqlite3.Row # Return rows that behave like dicts
+    search.register_functions(db) # SQL functions used by the full-text search triggers
 
 def get_db():
-    """Connects to the specific database."""
+    """Connects to the specific database (a warm connection from the pool when possible)."""
     if 'db' not in g:
-        g.db = sqlite3.connect(
-            current_app.config['DATABASE'],
-            detect_types=sqlite3.PARSE_DECLTYPES
-        )
-        g.db.row_factory = sqlite3.Row # Return rows that behave like dicts
+        if current_app.config.get('SQLITE_POOL_ENABLED', True):
+            g.db = db_pool.acquire(current_app.config['DATABASE'], current_app.config.get('SQLITE_PRAGMAS'), _setup_connection)
+        else:
+            g.db = sqlite3.connect(
+                current_app.config['DATABASE'],
+                detect_types=sqlite3.PARSE_DECLTYPES
+            )
+            db_pool.apply_pragmas(g.db, current_app.config.get('SQLITE_PRAGMAS'))
+            _setup_connection(g.db)
     return g.db
 
+def get_read_db():
+    """
+    Connection for queries: read-only (`mode=ro`, `query_only`), so GET handlers never take
+    the write lock and, with WAL, keep reading while a writer holds it. Falls back to the
+    read-write connection when read-only connections are off or unavailable (in-memory
+    database, file not created yet). Code that reads its own uncommitted writes must keep
+    using the connection it wrote with.
+    """
+    if 'read_db' not in g:
+        database = current_app.config['DATABASE']
+        if (not current_app.config.get('SQLITE_READ_ONLY_CONNECTIONS', True)
+                or not current_app.config.get('SQLITE_POOL_ENABLED', True)
+                or database == ':memory:'):
+            return get_db()
+        try:
+            g.read_db = db_pool.acquire(database, current_app.config.get('SQLITE_PRAGMAS'), _setup_connection, read_only=True)
+        except sqlite3.OperationalError as e:
+            current_app.logger.warning(f"Read-only connection unavailable, using the writer: {e}")
+            return get_db()
+    return g.read_db
+
+def begin_write(db):
+    """
+    Starts a write transaction on the read-write connection with BEGIN IMMEDIATE
+    (see db_pool.begin_immediate); a no-op if one is already open. The caller commits.
+    """
+    db_pool.begin_immediate(
+        db,
+        retries=current_app.config.get('SQLITE_WRITE_RETRIES', 3),
+        backoff=current_app.config.get('SQLITE_WRITE_BACKOFF', 0.05)
+    )
+
 def close_db(e=None):
-    """Closes the database connection."""
+    """Returns the database connections to the pool (or closes them if pooling is off)."""
+    read_db = g.pop('read_db', None)
+    if read_db is not None:
+        db_pool.release(current_app.config['DATABASE'], read_db, read_only=True)
     db = g.pop('db', None)
     if db is not None:
-        db.close()
+        if current_app.config.get('SQLITE_POOL_ENABLED', True):
+            db_pool.release(current_app.config['DATABASE'], db)
+        else:
+            db.close()
 
 def init_db():
     """Clear existing data and create new tables."""
@@ -59,12 +117,13 @@ def init_db():
         UPDATE recipes SET updated_at = CURRENT_TIMESTAMP WHERE id = OLD.id;
     END;
 
-    CREATE INDEX IF NOT EXISTS idx_recipes_name ON recipes (name);
-    -- Indexing JSON tags might require specific SQLite JSON functions if complex queries are needed
-    -- CREATE INDEX IF NOT EXISTS idx_recipes_tags ON recipes (json_extract(tags, '$'));
+    -- Filter and sort indexes are managed by recipe_indexes.ensure_recipe_indexes (below)
+    -- Tags are indexed through the recipe_tags table (idx_recipes_tags), see schema_recipe_index.sql
     """
     db.executescript(schema)
-    print("Initialized the recipes table.")
+    # Statistics are gathered later (`flask ensure-indexes`), once the table has data
+    recipe_indexes.ensure_recipe_indexes(db, analyze=False)
+    print("Initialized the recipes table and its indexes.")
 
     # Initialize the recipe_images table from its schema file
     try:
@@ -79,6 +138,28 @@ def init_db():
     except Exception as e:
          print(f"Error initializing recipe_images table: {e}")
 
+    # Initialize the full-text search index (recipes_fts) and its sync triggers
+    try:
+        with current_app.open_resource('../data/schema_search.sql') as f:
+            search_schema = f.read().decode('utf8')
+            db.executescript(search_schema)
+        print("Initialized the recipes_fts search index.")
+    except FileNotFoundError:
+        print("Error: Could not find schema_search.sql. Make sure it's in the backend/data directory.")
+    except Exception as e:
+        print(f"Error initializing recipes_fts search index: {e}")
+
+    # Initialize the normalized lookup tables (recipe_ingredients, recipe_tags) derived from recipes
+    try:
+        with current_app.open_resource('../data/schema_recipe_index.sql') as f:
+            recipe_index_schema = f.read().decode('utf8')
+            db.executescript(recipe_index_schema)
+        print("Initialized the recipe_ingredients and recipe_tags tables.")
+    except FileNotFoundError:
+        print("Error: Could not find schema_recipe_index.sql. Make sure it's in the backend/data directory.")
+    except Exception as e:
+        print(f"Error initializing recipe_ingredients/recipe_tags tables: {e}")
+
     # Initialize the daily menu tables from its schema file
     try:
         with current_app.open_resource('../data/schema_daily_menus.sql') as f:
@@ -90,6 +171,28 @@ def init_db():
     except Exception as e:
         print(f"Error initializing daily_menu tables: {e}") # Corrected error message context
 
+    # Initialize the data version counters (HTTP cache validators); must run after all tables exist
+    try:
+        init_data_versions(db)
+        print("Initialized the data_versions table.")
+    except FileNotFoundError:
+        print("Error: Could not find schema_data_versions.sql. Make sure it's in the backend/data directory.")
+    except Exception as e:
+        print(f"Error initializing data_versions table: {e}")
+
+
+def init_data_versions(db):
+    """
+    Creates the data_versions table and its triggers, or refreshes them on an existing database.
+    Every run bumps all versions, which invalidates the ETags clients already hold,
+    and empties the response cache.
+    """
+    with current_app.open_resource('../data/schema_data_versions.sql') as f:
+        db.executescript(f.read().decode('utf8'))
+    db.commit()
+    # Same reasoning for the shared response cache: entries may predate the data or the code
+    response_cache.clear()
+
 
 def init_app(app):
     """Register database functions with the Flask app."""
@@ -104,18 +207,14 @@ def recipe_to_dict(row):
     if row is None:
         return None
     recipe_dict = dict(row)
-    try:
-        recipe_dict['ingredients'] = json.loads(recipe_dict['ingredients'])
-    except (json.JSONDecodeError, TypeError):
-        recipe_dict['ingredients'] = [] # Or handle error as appropriate
-    try:
-        recipe_dict['instructions'] = json.loads(recipe_dict['instructions'])
-    except (json.JSONDecodeError, TypeError):
-        recipe_dict['instructions'] = []
-    try:
-        recipe_dict['tags'] = json.loads(recipe_dict['tags'])
-    except (json.JSONDecodeError, TypeError):
-         recipe_dict['tags'] = [] # Or handle error as appropriate
+    # Projections (?fields=) leave some columns out; only decode what was selected
+    for field in ('ingredients', 'instructions', 'tags'):
+        if field not in recipe_dict:
+            continue
+        try:
+            recipe_dict[field] = json.loads(recipe_dict[field])
+        except (json.JSONDecodeError, TypeError):
+            recipe_dict[field] = [] # Or handle error as appropriate
     # Convert timestamps to ISO format string for JSON serialization
     if recipe_dict.get('created_at'):
         recipe_dict['created_at'] = recipe_dict['created_at'].isoformat()
@@ -123,139 +222,194 @@ def recipe_to_dict(row):
         recipe_dict['updated_at'] = recipe_dict['updated_at'].isoformat()
     return recipe_dict
 
-def get_all_recipes(filters=None, page=1, limit=8):
-    """Retrieves recipes with filtering and pagination."""
-    db = get_db()
-    base_query = "FROM recipes"
-    count_query = "SELECT COUNT(*) " + base_query
-    select_query = "SELECT * " + base_query
-    params = []
-    count_params = [] # Separate params for count query if needed
-
-    # --- Filtering ---
-    where_clauses = []
-    if filters:
-        # 搜索条件
-        if filters.get('search'):
-            where_clauses.append("(name LIKE ? OR description LIKE ?)")
-            term = f"%{filters['search']}%"
-            params.extend([term, term])
-            count_params.extend([term, term])
-
-        # 食材筛选 (逗号分隔的字符串)
-        if filters.get('ingredients'):
-            ingredient_terms = [term.strip() for term in filters['ingredients'].split(',') if term.strip()]
-            if ingredient_terms:
-                ingredient_conditions = []
-                for term in ingredient_terms:
-                    # Search for the ingredient name within the JSON string
-                    # This assumes ingredients are stored like: '[{"name": "鸡蛋", ...}, {"name": "番茄", ...}]'
-                    ingredient_conditions.append("ingredients LIKE ?")
-                    param = f'%"{term}"%' # Basic search for the ingredient name as a string literal within the JSON
-                    params.append(param)
-                    count_params.append(param)
-                # Require ALL ingredients to be present
-                where_clauses.append(f"({' AND '.join(ingredient_conditions)})")
-
-        # 标签筛选 (Revised using JSON functions)
-        tags_filter = filters.get('tags')
-        if tags_filter: # Check for non-None AND non-empty list
-            # filters['tags'] is a non-empty list of tags like ['tag1', 'tag2']
-            tag_conditions = []
-            for tag in tags_filter:
-                # Use json_each to check if the tag exists in the JSON array 'tags'
-                # This finds recipes where *any* of the provided tags match.
-                tag_conditions.append("EXISTS (SELECT 1 FROM json_each(recipes.tags) WHERE json_each.value = ?)")
-                params.append(tag.strip()) # Add the tag itself as a parameter
-                count_params.append(tag.strip())
-            if tag_conditions:
-                # Combine conditions with OR: find recipes matching *any* of the tags
-                current_app.logger.debug(f"Tag Condition: {tag_conditions}") 
-                where_clauses.append(f"({' OR '.join(tag_conditions)})")
-
-        # 难度筛选
-        if filters.get('difficulty'):
-            where_clauses.append("difficulty = ?")
-            params.append(filters['difficulty'])
-            count_params.append(filters['difficulty'])
-
-        # 菜系筛选
-        if filters.get('cuisine'):
-            where_clauses.append("cuisine = ?")
-            params.append(filters['cuisine'])
-            count_params.append(filters['cuisine'])
-
-        # 准备时间范围
-        if filters.get('prep_time_min') is not None:
-            where_clauses.append("prep_time_minutes >= ?")
-            params.append(filters['prep_time_min'])
-            count_params.append(filters['prep_time_min'])
-        if filters.get('prep_time_max') is not None:
-            where_clauses.append("prep_time_minutes <= ?")
-            params.append(filters['prep_time_max'])
-            count_params.append(filters['prep_time_max'])
-
-        # 烹饪时间范围
-        if filters.get('cook_time_min') is not None:
-            where_clauses.append("cook_time_minutes >= ?")
-            params.append(filters['cook_time_min'])
-            count_params.append(filters['cook_time_min'])
-        if filters.get('cook_time_max') is not None:
-            where_clauses.append("cook_time_minutes <= ?")
-            params.append(filters['cook_time_max'])
-            count_params.append(filters['cook_time_max'])
-
-        # 份量范围
-        if filters.get('servings_min') is not None:
-            where_clauses.append("servings >= ?")
-            params.append(filters['servings_min'])
-            count_params.append(filters['servings_min'])
-        if filters.get('servings_max') is not None:
-            where_clauses.append("servings <= ?")
-            params.append(filters['servings_max'])
-            count_params.append(filters['servings_max'])
+# Kept here for the cursor pagination below
+SORT_EXPRESSIONS = recipe_query.SORT_EXPRESSIONS
+CURSOR_KEY_EXPRESSIONS = recipe_query.CURSOR_KEY_EXPRESSIONS
 
-    if where_clauses:
-        where_sql = " WHERE " + " AND ".join(where_clauses)
-        count_query += where_sql
-        select_query += where_sql
-
-    # --- Get Total Count ---
-    count_cursor = db.execute(count_query, count_params)
-    total_items = count_cursor.fetchone()[0]
-
-    # --- Ordering ---
-    sort_by = filters.get('sort', 'created_at') if filters else 'created_at'
-    order = filters.get('order', 'desc').lower() if filters else 'desc'
-    if sort_by in ['name', 'created_at', 'updated_at', 'difficulty'] and order in ['asc', 'desc']:
-         select_query += f" ORDER BY {sort_by} {order.upper()}"
-    else:
-        select_query += " ORDER BY created_at DESC" # Default sort
 
-    # --- Pagination ---
+def _build_recipe_filters(filters):
+    """
+    Translates the API filters into SQL pieces shared by every recipe list query
+    (compiled by recipe_query). Returns (from_sql, where_sql, params, match_query);
+    where_sql is '' when unfiltered.
+    """
+    query = recipe_query.build(filters)
+    return query.compiled.from_sql, query.compiled.where_sql, query.params, query.match_query
+
+
+def _resolve_sort(filters, match_query):
+    """Returns (sort_name, direction, sort_expression) for a recipe list query."""
+    sort_name, direction = recipe_query.resolve_sort(filters, match_query)
+    return sort_name, direction, recipe_query.sort_expression(sort_name)
+
+
+def _list_rows_to_dicts(db, rows, fields, helper_columns):
+    """
+    Converts list query rows to recipe dicts, dropping helper columns (totals, cursor keys).
+    With a projection that includes ingredients, they are loaded for the whole page in one
+    query from recipe_ingredients.
+    """
+    recipes_page = []
+    for row in rows:
+        recipe_dict = recipe_to_dict(row)
+        for column in helper_columns:
+            recipe_dict.pop(column, None)
+        recipes_page.append(recipe_dict)
+    if fields is not None and 'ingredients' in fields:
+        ingredients = recipe_index.get_ingredients_by_recipe(db, [recipe['id'] for recipe in recipes_page])
+        for recipe in recipes_page:
+            recipe['ingredients'] = ingredients[recipe['id']]
+    return recipes_page
+
+
+def _list_rows_to_documents(db, rows, fields, helper_columns):
+    """
+    Like _list_rows_to_dicts, but returns encoded documents (RawJSON) from recipe_documents;
+    only the rows missing from the cache are converted and encoded.
+    """
+    version = recipe_sampler.recipes_version(db)
+    documents = [recipe_documents.get(version, row['id'], fields) for row in rows]
+    missing_rows = [row for row, document in zip(rows, documents) if document is None]
+    if missing_rows:
+        built = iter(_list_rows_to_dicts(db, missing_rows, fields, helper_columns))
+        documents = [document or recipe_documents.store(version, next(built), fields) for document in documents]
+    return documents
+
+
+def get_all_recipes(filters=None, page=1, limit=8, fields=None, documents=False):
+    """
+    Retrieves recipes with filtering and pagination.
+    The page and the total count come from one statement; the SQL text is compiled
+    once per filter shape by recipe_query. `fields` (see recipe_query.resolve_fields)
+    limits the columns, e.g. recipe_query.SUMMARY_FIELDS for list cards.
+    With documents=True the recipes are returned as encoded JSON (RawJSON) for jsonify().
+    """
+    db = get_read_db()
+    query = recipe_query.build(filters, fields)
     offset = (page - 1) * limit
-    select_query += " LIMIT ? OFFSET ?"
-    params.extend([limit, offset])
+    if current_app.debug:
+        current_app.logger.debug(
+            f"Recipe list query plan: {recipe_query.explain(db, query.compiled.page_sql, recipe_query.page_params(query, limit, offset))}"
+        )
 
-    # --- Fetch Recipes for the Page ---
-    cursor = db.execute(select_query, params)
-    recipes_page = cursor.fetchall()
+    rows = db.execute(query.compiled.page_sql, recipe_query.page_params(query, limit, offset)).fetchall()
+    if rows:
+        total_items = rows[0]['total_count']
+    elif offset:
+        # Past the last page there is no row to carry the total
+        total_items = db.execute(query.compiled.count_sql, query.params).fetchone()[0]
+    else:
+        total_items = 0
 
+    convert = _list_rows_to_documents if documents else _list_rows_to_dicts
+    recipes_page = convert(db, rows, fields, ('total_count',))
     # Return page data and total count
-    return ([recipe_to_dict(row) for row in recipes_page], total_items)
+    return (recipes_page, total_items)
+
+
+def encode_recipe_cursor(sort_name, direction, sort_key, recipe_id):
+    """Builds the opaque cursor token pointing just after the given row."""
+    payload = json.dumps({"s": sort_name, "d": direction, "k": sort_key, "id": recipe_id}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_recipe_cursor(token):
+    """Parses a cursor token. Raises ValueError if it is malformed."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+        return payload['s'], payload['d'], payload['k'], int(payload['id'])
+    except (ValueError, KeyError, TypeError, UnicodeError) as e:
+        raise ValueError(f"Invalid cursor: {e}") from e
+
+
+def get_recipes_by_cursor(filters=None, cursor=None, limit=8, include_total=False, fields=None, documents=False):
+    """
+    Retrieves one page of recipes using keyset (cursor) pagination.
+    Instead of LIMIT/OFFSET the page starts right after the (sort key, id) stored in
+    `cursor`, so deep pages cost the same as the first one. The total count is only
+    computed when `include_total` is set.
+    Returns (recipes, next_cursor, total_items); next_cursor is None on the last page
+    and total_items is None unless requested. `fields` and `documents` work as in get_all_recipes.
+    Raises ValueError for a bad cursor.
+    """
+    db = get_read_db()
+    query = recipe_query.build(filters, fields)
+    from_sql, where_sql, params = query.compiled.from_sql, query.compiled.where_sql, query.params
+    sort_name, direction, sort_expression = query.sort_name, query.direction, query.sort_expression
+    key_expression = CURSOR_KEY_EXPRESSIONS.get(sort_name, sort_expression)
+
+    total_items = None
+    if include_total:
+        count_query = "SELECT COUNT(*) " + from_sql + (" WHERE " + where_sql if where_sql else "")
+        total_items = db.execute(count_query, params).fetchone()[0]
+
+    where_clauses = [where_sql] if where_sql else []
+    page_params = list(params)
+    if cursor:
+        cursor_sort, cursor_direction, cursor_key, cursor_id = decode_recipe_cursor(cursor)
+        if cursor_sort != sort_name or cursor_direction != direction:
+            raise ValueError("Cursor does not match the requested sort order.")
+        comparison = '<' if direction == 'DESC' else '>'
+        # Compared on the sort expression itself (the raw column for timestamps), so the
+        # index on it can seek to the cursor instead of scanning the earlier rows
+        where_clauses.append(f"({sort_expression}, recipes.id) {comparison} (?, ?)")
+        page_params.extend([cursor_key, cursor_id])
+
+    select_query = f"SELECT {query.compiled.select_sql}, {key_expression} AS cursor_sort_key " + from_sql
+    if where_clauses:
+        select_query += " WHERE " + " AND ".join(where_clauses)
+    select_query += f" ORDER BY {sort_expression} {direction}, recipes.id {direction} LIMIT ?"
+    # Fetch one extra row to find out whether there is a next page
+    page_params.append(limit + 1)
+
+    rows = db.execute(select_query, page_params).fetchall()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last_row = rows[-1]
+        next_cursor = encode_recipe_cursor(sort_name, direction, last_row['cursor_sort_key'], last_row['id'])
+
+    convert = _list_rows_to_documents if documents else _list_rows_to_dicts
+    recipes_page = convert(db, rows, fields, ('cursor_sort_key',))
+    return recipes_page, next_cursor, total_items
 
 
 def get_recipe_by_id(recipe_id):
     """Retrieves a single recipe by its ID."""
-    db = get_db()
+    db = get_read_db()
     cursor = db.execute("SELECT * FROM recipes WHERE id = ?", (recipe_id,))
     recipe = cursor.fetchone()
     return recipe_to_dict(recipe)
 
 
-def get_random_recipes(count=3):
-    """Retrieves a specified number of random recipes."""
-    db = get_db()
+def get_recipe_document(recipe_id):
+    """A recipe as encoded JSON (RawJSON, see recipe_documents), or None if it does not exist."""
+    db = get_read_db()
+    version = recipe_sampler.recipes_version(db)
+    document = recipe_documents.get(version, recipe_id)
+    if document is not None:
+        return document
+    recipe = recipe_to_dict(db.execute("SELECT * FROM recipes WHERE id = ?", (recipe_id,)).fetchone())
+    return recipe_documents.store(version, recipe) if recipe is not None else None
+
+
+def get_tag_counts(limit=None):
+    """Retrieves every tag with the number of recipes using it (tag facet)."""
+    return recipe_index.get_tag_counts(get_read_db(), limit)
+
+
+# Filters accepted by get_random_recipes (a subset of the list filters)
+RANDOM_RECIPE_FILTERS = ('cuisine', 'difficulty', 'tags', 'cook_time_max')
+
+
+def get_random_recipes(count=3, filters=None, seed=None):
+    """
+    Retrieves a specified number of random recipes, optionally filtered by
+    cuisine, difficulty, tags (any of) and maximum cook time.
+    With a seed the pick is reproducible (e.g. the date for a "recipe of the day").
+    """
+    db = get_read_db()
     # Ensure count is a positive integer
     try:
         limit = int(count)
@@ -264,22 +418,30 @@ def get_random_recipes(count=3):
     except (ValueError, TypeError):
         limit = 3 # Default to 3 if conversion fails
 
-    # SQLite uses RANDOM() for random ordering
-    cursor = db.execute("SELECT * FROM recipes ORDER BY RANDOM() LIMIT ?", (limit,))
-    recipes = cursor.fetchall()
-    return [recipe_to_dict(row) for row in recipes]
+    # Pick the ids first (see recipe_sampler), then load only those rows
+    sample_filters = {key: value for key, value in (filters or {}).items() if key in RANDOM_RECIPE_FILTERS}
+    from_sql, where_sql, params, _ = _build_recipe_filters(sample_filters)
+    ids = recipe_sampler.sample_ids(db, limit, from_sql, where_sql, params, seed)
+    if not ids:
+        return []
+    cursor = db.execute(f"SELECT * FROM recipes WHERE id IN ({', '.join('?' for _ in ids)})", ids)
+    rows_by_id = {row['id']: row for row in cursor.fetchall()}
+    # Keep the sampled order
+    return [recipe_to_dict(rows_by_id[recipe_id]) for recipe_id in ids if recipe_id in rows_by_id]
 
 
-def add_recipe(data):
-    """Adds a new recipe (text data only) to the database."""
-    db = get_db()
-    # Image data is handled by add_recipe_image, not here.
+INSERT_RECIPE_SQL = """
+    INSERT INTO recipes (name, description, ingredients, instructions, image_url, tags, difficulty, cuisine, prep_time_minutes, cook_time_minutes, servings)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
 
-    # Prepare data for the recipes table.
+
+def _recipe_insert_values(data):
+    """The INSERT_RECIPE_SQL parameters for a recipe dict."""
     # Include image_url if it's provided as part of the text data (e.g., external URL)
     # Otherwise, it will be NULL initially.
     # Corrected tuple to match the 11 columns in the INSERT statement
-    recipe_data_tuple = (
+    return (
         data.get('name'),                       # 1. name
         data.get('description'),                # 2. description
         json.dumps(data.get('ingredients', [])), # 3. ingredients
@@ -293,18 +455,26 @@ def add_recipe(data):
         data.get('servings')                    # 11. servings
     )
 
+
+def add_recipe(data):
+    """Adds a new recipe (text data only) to the database."""
+    db = get_db()
+    # Image data is handled by add_recipe_image, not here.
+
+    # Prepare data for the recipes table.
+    recipe_data_tuple = _recipe_insert_values(data)
+
     cursor = None
     try:
+        begin_write(db)
         # Insert recipe text data
-        cursor = db.execute(
-            """
-            INSERT INTO recipes (name, description, ingredients, instructions, image_url, tags, difficulty, cuisine, prep_time_minutes, cook_time_minutes, servings)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """,
-            recipe_data_tuple
-        )
-        db.commit()
+        cursor = db.execute(INSERT_RECIPE_SQL, recipe_data_tuple)
         new_recipe_id = cursor.lastrowid
+        # Keep the lookup tables in the same transaction as the recipe row
+        recipe_index.sync_recipe_ingredients(db, new_recipe_id, data.get('ingredients', []))
+        recipe_index.sync_recipe_tags(db, new_recipe_id, data.get('tags', []))
+        db.commit()
+        response_cache.invalidate(response_cache.RECIPE_LIST_TAG)
         current_app.logger.info(f"Successfully added recipe text data (ID: {new_recipe_id}).")
         return new_recipe_id # Return the ID of the newly inserted recipe
 
@@ -322,6 +492,39 @@ def add_recipe(data):
         raise e # Re-raise to be caught by the route handler
 
 
+def add_recipes(recipes):
+    """
+    Adds a batch of already validated recipes in one transaction: one executemany for the
+    recipes rows and one per lookup table, instead of a commit per recipe as in add_recipe().
+    Returns the new recipe ids, in the order of `recipes`.
+    """
+    if not recipes:
+        return []
+    db = get_db()
+    try:
+        begin_write(db)
+        # We hold the write lock, so every id above the current maximum is one of ours
+        # (AUTOINCREMENT ids only grow, in insertion order)
+        last_id = db.execute("SELECT COALESCE(MAX(id), 0) FROM recipes").fetchone()[0]
+        db.executemany(INSERT_RECIPE_SQL, (_recipe_insert_values(data) for data in recipes))
+        new_ids = [row[0] for row in db.execute("SELECT id FROM recipes WHERE id > ? ORDER BY id", (last_id,))]
+        if len(new_ids) != len(recipes):
+            raise sqlite3.DatabaseError(f"Expected {len(recipes)} new recipe ids, found {len(new_ids)}.")
+        ingredient_batch = []
+        tag_batch = []
+        for recipe_id, data in zip(new_ids, recipes):
+            ingredient_batch.extend(recipe_index.ingredient_rows(recipe_id, data.get('ingredients', [])))
+            tag_batch.extend(recipe_index.tag_rows(recipe_id, data.get('tags', [])))
+        recipe_index.insert_index_rows(db, ingredient_batch, tag_batch)
+        db.commit()
+    except Exception as e:
+        current_app.logger.error(f"Error in add_recipes (batch of {len(recipes)}): {e}", exc_info=True)
+        db.rollback()
+        raise
+    response_cache.invalidate(response_cache.RECIPE_LIST_TAG)
+    return new_ids
+
+
 def update_recipe(recipe_id, data):
     """Updates an existing recipe."""
     db = get_db()
@@ -346,22 +549,87 @@ def update_recipe(recipe_id, data):
     # Rely on the database trigger to update updated_at
     query = f"UPDATE recipes SET {', '.join(set_clause)} WHERE id = ?"
 
+    begin_write(db)
     cursor = db.execute(query, params)
+    if cursor.rowcount > 0 and 'ingredients' in data:
+        recipe_index.sync_recipe_ingredients(db, recipe_id, data['ingredients'])
+    if cursor.rowcount > 0 and 'tags' in data:
+        recipe_index.sync_recipe_tags(db, recipe_id, data['tags'])
     db.commit()
+    if cursor.rowcount > 0:
+        response_cache.invalidate(response_cache.RECIPE_LIST_TAG, response_cache.recipe_tag(recipe_id))
     return cursor.rowcount > 0 # Return True if a row was updated
 
 
 def delete_recipe(recipe_id):
     """Deletes a recipe from the database."""
     db = get_db()
+    begin_write(db)
     cursor = db.execute("DELETE FROM recipes WHERE id = ?", (recipe_id,))
+    recipe_index.delete_recipe_index(db, recipe_id)
     db.commit()
+    if cursor.rowcount > 0:
+        response_cache.invalidate(response_cache.RECIPE_LIST_TAG, response_cache.recipe_tag(recipe_id))
     return cursor.rowcount > 0 # Return True if a row was deleted
 
 
+def get_recipe_primary_image(recipe_id):
+    """
+    Retrieves the metadata of the primary image for a given recipe ID, or None.
+    The image bytes are not loaded; use image_store.absolute_path(storage_path) to
+    reach the file. Rows not yet moved to the file store have storage_path None and
+    their bytes are available through get_recipe_primary_image_data.
+    """
+    db = get_read_db()
+    cursor = db.execute(
+        """
+        SELECT id, recipe_id, content_hash, mime_type, byte_size, width, height, storage_path, alt_text, uploaded_at
+        FROM recipe_images
+        WHERE recipe_id = ? AND is_primary = 1
+        ORDER BY id DESC LIMIT 1
+        """,
+        (recipe_id,)
+    )
+    image_row = cursor.fetchone()
+    return dict(image_row) if image_row else None
+
+
+def get_image_bytes(image_id):
+    """Loads the bytes of one recipe_images row, from the file store or the legacy BLOB."""
+    db = get_read_db()
+    image_row = db.execute(
+        "SELECT storage_path, image_data FROM recipe_images WHERE id = ?",
+        (image_id,)
+    ).fetchone()
+    if image_row is None:
+        return None
+    if image_row['storage_path']:
+        try:
+            return image_store.read_image(image_row['storage_path'])
+        except FileNotFoundError:
+            current_app.logger.error(f"Image file missing from store: {image_row['storage_path']} (image {image_id})")
+            return None
+    return image_row['image_data']
+
+
+def generate_image_derivatives(image_id):
+    """
+    Queues the thumb/card/full derivatives of a stored image (see image_derivatives).
+    Call it after the upload transaction is committed. Returns None for legacy BLOB rows.
+    """
+    db = get_read_db()
+    image_row = db.execute(
+        "SELECT content_hash, storage_path FROM recipe_images WHERE id = ?",
+        (image_id,)
+    ).fetchone()
+    if image_row is None or not image_row['storage_path']:
+        return None
+    return image_derivatives.schedule_derivatives(image_row['content_hash'], image_row['storage_path'])
+
+
 def get_recipe_primary_image_data(recipe_id):
-    """Retrieves the primary image data (BLOB) for a given recipe ID."""
-    db = get_db()
+    """Retrieves the legacy primary image data (BLOB) for a given recipe ID."""
+    db = get_read_db()
     cursor = db.execute(
         "SELECT image_data FROM recipe_images WHERE recipe_id = ? AND is_primary = 1",
         (recipe_id,)
@@ -376,16 +644,26 @@ def get_recipe_primary_image_data(recipe_id):
 def add_recipe_image(recipe_id, image_data, alt_text=None, is_primary=True):
     """
     Adds an image to the recipe_images table for a specific recipe.
+    The bytes are written to the content-addressed image store; only metadata
+    (hash, mime type, size, dimensions, storage path) is stored in the table.
     If is_primary is True, it first sets any existing primary image for that recipe to not primary.
-    """
-    """
-    Adds an image to the recipe_images table for a specific recipe.
-    If is_primary is True, it first sets any existing primary image for that recipe to not primary.
-    NOTE: This function now assumes it's called within an existing transaction
-          managed by the caller (e.g., add_recipe). It does not manage its own transaction.
+    image_data is either bytes or a binary file object (an upload), which is streamed into
+    the store in chunks and may be at most MAX_IMAGE_UPLOAD_BYTES long.
+    NOTE: This function does not commit. It joins the caller's transaction, or starts one
+          with BEGIN IMMEDIATE; the caller commits (commit_recipe_image) or rolls back.
+    Raises ValueError if image_data is not a supported image format,
+    image_store.ImageTooLargeError if an upload is over the size limit.
     """
     db = get_db() # Get the connection (which should be in a transaction state)
     cursor = None
+    # Write the file before touching the table. If the transaction is rolled back later
+    # the file simply stays unreferenced (it is content-addressed, so it is never wrong).
+    if hasattr(image_data, 'read'):
+        image_meta = image_store.save_image_stream(image_data, max_bytes=current_app.config['MAX_IMAGE_UPLOAD_BYTES'])
+    else:
+        image_meta = image_store.save_image(image_data)
+    # Take the write lock only now, so the file write does not hold up other writers
+    begin_write(db)
     # Removed try/except block and transaction management from here.
     # Errors will propagate up to the caller (add_recipe) to handle rollback.
 
@@ -399,12 +677,17 @@ def add_recipe_image(recipe_id, image_data, alt_text=None, is_primary=True):
     # Insert the new image record (Corrected indentation)
     cursor = db.execute(
         """
-        INSERT INTO recipe_images (recipe_id, image_data, alt_text, is_primary)
-            VALUES (?, ?, ?, ?)
+        INSERT INTO recipe_images (recipe_id, content_hash, mime_type, byte_size, width, height, storage_path, alt_text, is_primary)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
             """,
             (
                 recipe_id,
-                sqlite3.Binary(image_data), # Ensure data is treated as BLOB
+                image_meta['content_hash'],
+                image_meta['mime_type'],
+                image_meta['byte_size'],
+                image_meta['width'],
+                image_meta['height'],
+                image_meta['storage_path'],
                 alt_text,
                 1 if is_primary else 0
             )
@@ -421,5 +704,14 @@ def add_recipe_image(recipe_id, image_data, alt_text=None, is_primary=True):
     return new_image_id
 
 
+def commit_recipe_image(*recipe_ids):
+    """
+    Commits the transaction of add_recipe_image calls, then drops the cached menus that show
+    those recipes' images (after the commit, so they cannot be re-cached with the old image).
+    """
+    get_db().commit()
+    response_cache.invalidate(*(response_cache.recipe_image_tag(recipe_id) for recipe_id in recipe_ids))
+
+
 # --- No CLI Commands in this file ---
 # All CLI commands have been moved to cli_commands.py
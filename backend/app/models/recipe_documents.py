@@ -0,0 +1,52 @@
+# backend/app/models/recipe_documents.py
+# Per-process cache of encoded recipe JSON documents, spliced into responses as RawJSON
+import threading
+from collections import OrderedDict
+from flask import current_app
+from ..json_provider import RawJSON
+
+# A recipe document is the JSON of recipe_to_dict() (or of a ?fields= projection of it).
+# Building one means three json.loads, two isoformat() calls and encoding the result again,
+# so documents are kept encoded, per (database, recipe id, fields). Entries are only valid
+# for the recipes data version they were built at (data_versions, bumped by triggers on every
+# write from any worker); updated_at alone has one second resolution and could miss an edit.
+MAX_CACHED_DOCUMENTS = 5000
+
+_documents = OrderedDict() # (database, recipe_id, fields) -> (recipes version, RawJSON)
+_documents_lock = threading.Lock() # gunicorn may run threaded workers
+
+
+def _key(recipe_id, fields):
+    return (current_app.config['DATABASE'], recipe_id, fields)
+
+
+def get(version, recipe_id, fields=None):
+    """The cached document of a recipe as RawJSON, or None if missing or outdated."""
+    if version is None:
+        return None
+    key = _key(recipe_id, fields)
+    with _documents_lock:
+        cached = _documents.get(key)
+        if cached is None or cached[0] != version:
+            return None
+        _documents.move_to_end(key)
+        return cached[1]
+
+
+def store(version, recipe_dict, fields=None):
+    """Encodes a recipe dict once, caches it (when the version is known) and returns it as RawJSON."""
+    document = RawJSON(current_app.json.dumps(recipe_dict))
+    if version is None:
+        return document
+    with _documents_lock:
+        _documents[_key(recipe_dict['id'], fields)] = (version, document)
+        _documents.move_to_end(_key(recipe_dict['id'], fields))
+        while len(_documents) > MAX_CACHED_DOCUMENTS:
+            _documents.popitem(last=False)
+    return document
+
+
+def clear():
+    """Drops all cached documents of this process."""
+    with _documents_lock:
+        _documents.clear()
@@ -0,0 +1,160 @@
+# backend/app/models/recipe_index.py
+# Normalized lookup tables derived from the recipes JSON columns
+import json
+
+BACKFILL_BATCH_SIZE = 1000
+
+
+def ingredient_rows(recipe_id, ingredients):
+    """
+    Converts a recipe's ingredients (list of dicts, or its JSON string) into
+    (recipe_id, ingredient_name, quantity) rows. Entries without a name are skipped.
+    """
+    if isinstance(ingredients, str):
+        try:
+            ingredients = json.loads(ingredients)
+        except json.JSONDecodeError:
+            return []
+    if not isinstance(ingredients, list):
+        return []
+    rows = []
+    for ingredient in ingredients:
+        if not isinstance(ingredient, dict) or not ingredient.get('name'):
+            continue
+        name = str(ingredient['name']).strip()
+        if not name:
+            continue
+        quantity = ingredient.get('quantity')
+        rows.append((recipe_id, name, str(quantity) if quantity is not None else None))
+    return rows
+
+
+def tag_rows(recipe_id, tags):
+    """
+    Converts a recipe's tags (list of strings, or its JSON string) into
+    distinct (recipe_id, tag) rows. Blank tags are skipped.
+    """
+    if isinstance(tags, str):
+        try:
+            tags = json.loads(tags)
+        except json.JSONDecodeError:
+            return []
+    if not isinstance(tags, list):
+        return []
+    unique_tags = dict.fromkeys(str(tag).strip() for tag in tags if tag is not None)
+    return [(recipe_id, tag) for tag in unique_tags if tag]
+
+
+def sync_recipe_ingredients(db, recipe_id, ingredients):
+    """
+    Replaces the recipe_ingredients rows of one recipe.
+    Runs inside the caller's transaction; the caller commits or rolls back.
+    """
+    db.execute("DELETE FROM recipe_ingredients WHERE recipe_id = ?", (recipe_id,))
+    rows = ingredient_rows(recipe_id, ingredients)
+    if rows:
+        db.executemany(
+            "INSERT INTO recipe_ingredients (recipe_id, ingredient_name, quantity) VALUES (?, ?, ?)",
+            rows
+        )
+
+
+def sync_recipe_tags(db, recipe_id, tags):
+    """
+    Replaces the recipe_tags rows of one recipe.
+    Runs inside the caller's transaction; the caller commits or rolls back.
+    """
+    db.execute("DELETE FROM recipe_tags WHERE recipe_id = ?", (recipe_id,))
+    rows = tag_rows(recipe_id, tags)
+    if rows:
+        db.executemany("INSERT INTO recipe_tags (recipe_id, tag) VALUES (?, ?)", rows)
+
+
+def delete_recipe_index(db, recipe_id):
+    """Removes all derived rows of a recipe (caller manages the transaction)."""
+    db.execute("DELETE FROM recipe_ingredients WHERE recipe_id = ?", (recipe_id,))
+    db.execute("DELETE FROM recipe_tags WHERE recipe_id = ?", (recipe_id,))
+
+
+def ingredient_filter_clause(ingredient_names):
+    """
+    Builds a "must contain ALL of these ingredients" predicate on recipes.id.
+    Each name is an index lookup on idx_recipe_ingredients_name; the per-name
+    recipe id sets are intersected before being matched against recipes.
+    Returns (sql, params).
+    """
+    subqueries = ["SELECT recipe_id FROM recipe_ingredients WHERE ingredient_name = ?"] * len(ingredient_names)
+    return f"recipes.id IN ({' INTERSECT '.join(subqueries)})", list(ingredient_names)
+
+
+def tag_filter_clause(tags):
+    """
+    Builds a "has ANY of these tags" predicate on recipes.id, answered by
+    idx_recipes_tags without touching the recipes.tags JSON.
+    Returns (sql, params).
+    """
+    placeholders = ', '.join('?' * len(tags))
+    return f"recipes.id IN (SELECT recipe_id FROM recipe_tags WHERE tag IN ({placeholders}))", list(tags)
+
+
+def get_ingredients_by_recipe(db, recipe_ids):
+    """
+    Returns {recipe_id: [{'name': str, 'quantity': str}]} for the given recipes, in the order
+    the ingredients were entered. Cheaper than decoding recipes.ingredients for a list page.
+    """
+    ingredients = {recipe_id: [] for recipe_id in recipe_ids}
+    if not recipe_ids:
+        return ingredients
+    rows = db.execute(
+        f"""
+        SELECT recipe_id, ingredient_name, quantity FROM recipe_ingredients
+        WHERE recipe_id IN ({', '.join('?' * len(ingredients))})
+        ORDER BY recipe_id, rowid
+        """,
+        list(ingredients)
+    )
+    for row in rows:
+        ingredients[row[0]].append({"name": row[1], "quantity": row[2]})
+    return ingredients
+
+
+def get_tag_counts(db, limit=None):
+    """Returns [{'tag': str, 'count': int}] for all tags, most used first."""
+    query = "SELECT tag, COUNT(*) AS count FROM recipe_tags GROUP BY tag ORDER BY count DESC, tag ASC"
+    params = []
+    if limit:
+        query += " LIMIT ?"
+        params.append(limit)
+    return [{"tag": row['tag'], "count": row['count']} for row in db.execute(query, params)]
+
+
+def rebuild_recipe_index(db):
+    """(Re)creates the derived lookup tables and backfills them from the recipes table."""
+    from flask import current_app
+    with current_app.open_resource('../data/schema_recipe_index.sql') as f:
+        db.executescript(f.read().decode('utf8'))
+
+    recipe_count = 0
+    ingredient_batch = []
+    tag_batch = []
+    for row in db.execute("SELECT id, ingredients, tags FROM recipes ORDER BY id"):
+        ingredient_batch.extend(ingredient_rows(row['id'], row['ingredients']))
+        tag_batch.extend(tag_rows(row['id'], row['tags']))
+        recipe_count += 1
+        if len(ingredient_batch) + len(tag_batch) >= BACKFILL_BATCH_SIZE:
+            insert_index_rows(db, ingredient_batch, tag_batch)
+            ingredient_batch, tag_batch = [], []
+    insert_index_rows(db, ingredient_batch, tag_batch)
+    db.commit()
+    return recipe_count
+
+
+def insert_index_rows(db, ingredient_batch, tag_batch):
+    """Bulk inserts rows for both lookup tables (backfill and bulk import)."""
+    if ingredient_batch:
+        db.executemany(
+            "INSERT INTO recipe_ingredients (recipe_id, ingredient_name, quantity) VALUES (?, ?, ?)",
+            ingredient_batch
+        )
+    if tag_batch:
+        db.executemany("INSERT INTO recipe_tags (recipe_id, tag) VALUES (?, ?)", tag_batch)
@@ -0,0 +1,60 @@
+# backend/app/models/recipe_indexes.py
+# Managed index set for the filters and sort orders of the recipes API
+
+# Every index on the recipes table is declared here; ensure_recipe_indexes() creates missing ones,
+# recreates changed ones and drops recipes indexes that are no longer in the list.
+# SQLite appends the rowid (recipes.id) to every index, so an index on a sort column also
+# serves the "ORDER BY <column>, recipes.id" tie-breaker of the list queries.
+RECIPE_INDEXES = {
+    # Sort orders (GET /api/recipes?sort=...); created_at is also the default order
+    'idx_recipes_created_at': "CREATE INDEX idx_recipes_created_at ON recipes (created_at)",
+    'idx_recipes_updated_at': "CREATE INDEX idx_recipes_updated_at ON recipes (updated_at)",
+    'idx_recipes_name': "CREATE INDEX idx_recipes_name ON recipes (name)",
+    # Same expression as recipe_query.SORT_EXPRESSIONS['difficulty'], or SQLite will not use it
+    'idx_recipes_difficulty_sort': "CREATE INDEX idx_recipes_difficulty_sort ON recipes (COALESCE(difficulty, ''))",
+    # Equality filters, with the default sort behind them so a filtered first page needs no sort
+    'idx_recipes_difficulty': "CREATE INDEX idx_recipes_difficulty ON recipes (difficulty, created_at)",
+    'idx_recipes_cuisine': "CREATE INDEX idx_recipes_cuisine ON recipes (cuisine, created_at)",
+    # Range filters (min/max); the planner picks the most selective one (see ANALYZE below)
+    'idx_recipes_prep_time': "CREATE INDEX idx_recipes_prep_time ON recipes (prep_time_minutes)",
+    'idx_recipes_cook_time': "CREATE INDEX idx_recipes_cook_time ON recipes (cook_time_minutes)",
+    'idx_recipes_servings': "CREATE INDEX idx_recipes_servings ON recipes (servings)",
+}
+
+
+def _normalize_sql(sql):
+    return ' '.join((sql or '').split())
+
+
+def ensure_recipe_indexes(db, analyze=True):
+    """
+    Brings the indexes of the recipes table in line with RECIPE_INDEXES and refreshes the
+    planner statistics (ANALYZE), so range filters are matched with the right index.
+    Returns {'created': [...], 'rebuilt': [...], 'dropped': [...]}.
+    """
+    existing = {
+        row[0]: row[1]
+        for row in db.execute("SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = 'recipes'")
+    }
+    changes = {'created': [], 'rebuilt': [], 'dropped': []}
+
+    for name, sql in existing.items():
+        if sql is None:
+            continue # Automatic indexes (UNIQUE / PRIMARY KEY constraints) are not ours to manage
+        if name not in RECIPE_INDEXES:
+            db.execute(f"DROP INDEX {name}")
+            changes['dropped'].append(name)
+        elif _normalize_sql(sql) != _normalize_sql(RECIPE_INDEXES[name]):
+            db.execute(f"DROP INDEX {name}")
+            db.execute(RECIPE_INDEXES[name])
+            changes['rebuilt'].append(name)
+
+    for name, sql in RECIPE_INDEXES.items():
+        if name not in existing:
+            db.execute(sql)
+            changes['created'].append(name)
+
+    if analyze:
+        db.execute("ANALYZE recipes")
+    db.commit()
+    return changes
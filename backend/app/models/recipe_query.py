@@ -0,0 +1,204 @@
+# backend/app/models/recipe_query.py
+# Compiles recipe list filters into canonical SQL plus bind parameters
+from collections import namedtuple
+from functools import lru_cache
+from . import search
+from . import recipe_index
+
+# The SQL text only depends on the *shape* of a filter (which filters are present, how many
+# ingredients/tags, the sort), never on the values, which are always bound. So a handful of
+# statements serve every request, sqlite3's per-connection statement cache keeps them
+# prepared, and the compiled text is cached here as well.
+COMPILED_QUERY_CACHE_SIZE = 256
+
+# Sortable columns -> SQL expression used for ORDER BY and keyset comparisons.
+# difficulty is nullable, so it is coalesced to keep (key, id) comparisons well defined.
+SORT_EXPRESSIONS = {
+    'name': 'recipes.name',
+    'created_at': 'recipes.created_at',
+    'updated_at': 'recipes.updated_at',
+    'difficulty': "COALESCE(recipes.difficulty, '')",
+}
+# Timestamps are selected as text for cursors (not converted to datetime), so the cursor carries
+# the stored value and binds back against the raw column in the keyset comparison
+CURSOR_KEY_EXPRESSIONS = {
+    'created_at': 'CAST(recipes.created_at AS TEXT)',
+    'updated_at': 'CAST(recipes.updated_at AS TEXT)',
+}
+
+# Single-value filters, in the order their predicates (and bind parameters) appear
+SCALAR_FILTERS = (
+    ('difficulty', "recipes.difficulty = ?"), # 难度筛选
+    ('cuisine', "recipes.cuisine = ?"), # 菜系筛选
+    ('prep_time_min', "recipes.prep_time_minutes >= ?"), # 准备时间范围
+    ('prep_time_max', "recipes.prep_time_minutes <= ?"),
+    ('cook_time_min', "recipes.cook_time_minutes >= ?"), # 烹饪时间范围
+    ('cook_time_max', "recipes.cook_time_minutes <= ?"),
+    ('servings_min', "recipes.servings >= ?"), # 份量范围
+    ('servings_max', "recipes.servings <= ?"),
+)
+# Filters whose value may legitimately be 0, so presence is tested with `is not None`
+NUMERIC_FILTERS = {name for name, _ in SCALAR_FILTERS if name.endswith(('_min', '_max'))}
+
+# Fields a list request may ask for with ?fields=a,b (id is always returned)
+RECIPE_FIELDS = (
+    'id', 'name', 'description', 'ingredients', 'instructions', 'image_url', 'tags', 'difficulty',
+    'cuisine', 'prep_time_minutes', 'cook_time_minutes', 'servings', 'created_at', 'updated_at',
+)
+# ?fields=summary: what the recipe cards and the today menu need, i.e. everything but the instructions
+SUMMARY_FIELDS = tuple(field for field in RECIPE_FIELDS if field != 'instructions')
+# In a projection, ingredients are read from recipe_ingredients (name/quantity pairs) instead of
+# decoding the recipes.ingredients JSON, so they are not selected from the recipes table
+DERIVED_FIELDS = ('ingredients',)
+
+# Everything the SQL text depends on (fields is None for all columns)
+FilterShape = namedtuple('FilterShape', 'search ingredient_count tag_count scalars sort direction fields')
+# The statements of one shape. page_sql returns the total in every row (total_count column)
+# and takes the bind parameters from page_params()
+CompiledQuery = namedtuple('CompiledQuery', 'select_sql from_sql where_sql order_sql count_sql page_sql')
+# A compiled query with the values of one request
+RecipeQuery = namedtuple('RecipeQuery', 'compiled params match_query sort_name direction sort_expression')
+
+
+def _unique_terms(values):
+    """Strips and deduplicates terms, keeping their order."""
+    return list(dict.fromkeys(value.strip() for value in values if value and value.strip()))
+
+
+def resolve_sort(filters, match_query):
+    """
+    Returns (sort_name, direction) for a recipe list query.
+    Searching without an explicit sort orders by relevance (bm25 is lower for better matches).
+    """
+    sort_by = filters.get('sort', 'created_at') if filters else 'created_at'
+    order = (filters.get('order') or 'desc').lower() if filters else 'desc'
+    if match_query and not filters.get('sort'):
+        return 'relevance', 'ASC'
+    if sort_by in SORT_EXPRESSIONS and order in ['asc', 'desc']:
+        return sort_by, order.upper()
+    return 'created_at', 'DESC' # Default sort
+
+
+def sort_expression(sort_name):
+    """SQL expression of a sort name returned by resolve_sort."""
+    return search.RANK_EXPRESSION if sort_name == 'relevance' else SORT_EXPRESSIONS[sort_name]
+
+
+def resolve_fields(fields):
+    """
+    Parses the ?fields= parameter: empty for all columns, 'summary', or a comma separated
+    list of RECIPE_FIELDS. Returns a tuple of fields in canonical order (None for all).
+    Raises ValueError for unknown fields.
+    """
+    if not fields:
+        return None
+    if fields == 'summary':
+        return SUMMARY_FIELDS
+    requested = set(_unique_terms(fields.split(',')))
+    unknown = sorted(requested - set(RECIPE_FIELDS))
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    requested.add('id')
+    return tuple(field for field in RECIPE_FIELDS if field in requested)
+
+
+def select_list(fields):
+    """SQL select list of a field tuple from resolve_fields."""
+    if fields is None:
+        return "recipes.*"
+    return ", ".join(f"recipes.{field}" for field in fields if field not in DERIVED_FIELDS)
+
+
+def normalize(filters, fields=None):
+    """
+    Splits API filters into their shape and the bind parameters, in the order the
+    compiled SQL expects them. `fields` is a tuple from resolve_fields.
+    Returns (shape, params, match_query).
+    """
+    filters = filters or {}
+    params = []
+
+    # 搜索条件 (full-text index over name, description, ingredient names and instructions)
+    match_query = search.build_match_query(filters.get('search'))
+    if match_query:
+        params.append(match_query)
+
+    # 食材筛选 (逗号分隔的字符串); deduplicated so the same filter always has the same shape
+    ingredient_terms = _unique_terms(filters['ingredients'].split(',')) if filters.get('ingredients') else []
+    params.extend(ingredient_terms)
+
+    # 标签筛选 (served from the recipe_tags index)
+    tag_terms = _unique_terms(filters['tags']) if filters.get('tags') else []
+    params.extend(tag_terms)
+
+    scalars = []
+    for name, _ in SCALAR_FILTERS:
+        value = filters.get(name)
+        if (value is not None) if name in NUMERIC_FILTERS else value:
+            scalars.append(name)
+            params.append(value)
+
+    sort_name, direction = resolve_sort(filters, match_query)
+    shape = FilterShape(bool(match_query), len(ingredient_terms), len(tag_terms), tuple(scalars), sort_name, direction, fields)
+    return shape, params, match_query
+
+
+@lru_cache(maxsize=COMPILED_QUERY_CACHE_SIZE)
+def compile_shape(shape):
+    """Builds the SQL statements of a filter shape (cached: the number of shapes is small)."""
+    from_sql = "FROM recipes"
+    where_clauses = []
+    if shape.search:
+        from_sql += " JOIN recipes_fts ON recipes_fts.rowid = recipes.id"
+        where_clauses.append("recipes_fts MATCH ?")
+    if shape.ingredient_count:
+        # Require ALL ingredients to be present (intersection over the recipe_ingredients index)
+        where_clauses.append(recipe_index.ingredient_filter_clause(['?'] * shape.ingredient_count)[0])
+    if shape.tag_count:
+        # Find recipes matching *any* of the tags
+        where_clauses.append(recipe_index.tag_filter_clause(['?'] * shape.tag_count)[0])
+    predicates = dict(SCALAR_FILTERS)
+    where_clauses.extend(predicates[name] for name in shape.scalars)
+
+    where_sql = " AND ".join(where_clauses)
+    where_part = f" WHERE {where_sql}" if where_sql else ""
+    # The id tie-breaker keeps pages stable when many rows share a sort value
+    order_sql = f"ORDER BY {sort_expression(shape.sort)} {shape.direction}, recipes.id {shape.direction}"
+    # Count and page in one statement. The total is a non-correlated scalar subquery, which
+    # SQLite evaluates once (from a covering index where possible); unlike COUNT(*) OVER (),
+    # which materializes and sorts every matching row, it lets the page itself be read in
+    # index order and stop after LIMIT rows. The subquery's placeholders come first.
+    select_sql = select_list(shape.fields)
+    page_sql = (
+        f"SELECT {select_sql}, (SELECT COUNT(*) {from_sql}{where_part}) AS total_count "
+        f"{from_sql}{where_part} {order_sql} LIMIT ? OFFSET ?"
+    )
+    return CompiledQuery(
+        select_sql=select_sql,
+        from_sql=from_sql,
+        where_sql=where_sql,
+        order_sql=order_sql,
+        count_sql=f"SELECT COUNT(*) {from_sql}{where_part}",
+        page_sql=page_sql,
+    )
+
+
+def build(filters, fields=None):
+    """Compiles API filters (and a field projection) into a RecipeQuery (statements + bind parameters)."""
+    shape, params, match_query = normalize(filters, fields)
+    return RecipeQuery(compile_shape(shape), params, match_query, shape.sort, shape.direction, sort_expression(shape.sort))
+
+
+def page_params(query, limit, offset):
+    """Bind parameters of query.compiled.page_sql: filters for the total, filters for the page, LIMIT, OFFSET."""
+    return query.params + query.params + [limit, offset]
+
+
+def explain(db, sql, params=()):
+    """Returns the EXPLAIN QUERY PLAN lines of a statement (e.g. 'SEARCH recipes USING INDEX ...')."""
+    return [row[3] for row in db.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+
+
+def cache_info():
+    """Hit/miss counters of the compiled statement cache."""
+    return compile_shape.cache_info()._asdict()
@@ -0,0 +1,106 @@
+# backend/app/models/recipe_sampler.py
+# Random recipe sampling without sorting the table (ORDER BY RANDOM())
+import random
+import sqlite3
+import threading
+from array import array
+from collections import OrderedDict
+from flask import current_app
+
+# Filtered samples draw from a cached, sorted array of matching ids. The arrays are kept per
+# process and thrown away when the recipes version (data_versions, bumped by triggers on
+# every write from any worker) changes.
+MAX_CACHED_ID_ARRAYS = 32
+# Unfiltered samples probe random ids between MIN(id) and MAX(id) instead; a few rounds are
+# enough unless many ids were deleted, in which case the id array is used after all.
+MAX_PROBE_ROUNDS = 4
+
+_id_arrays = OrderedDict() # (database, from_sql, where_sql, params) -> (recipes version, array of ids)
+_id_arrays_lock = threading.Lock() # gunicorn may run threaded workers
+
+
+def recipes_version(db):
+    """Current recipes data version, or None if the data_versions table is missing (no caching then)."""
+    try:
+        row = db.execute("SELECT version FROM data_versions WHERE name = 'recipes'").fetchone()
+    except sqlite3.OperationalError:
+        return None
+    return row[0] if row else None
+
+
+def get_id_array(db, from_sql, where_sql, params):
+    """Sorted ids of all recipes matching the filter, from the cache when still current."""
+    version = recipes_version(db)
+    key = (current_app.config['DATABASE'], from_sql, where_sql, tuple(params))
+    with _id_arrays_lock:
+        cached = _id_arrays.get(key)
+        if cached is not None and version is not None and cached[0] == version:
+            _id_arrays.move_to_end(key)
+            return cached[1]
+
+    where_part = f"WHERE {where_sql}" if where_sql else ""
+    ids = array('q', (row[0] for row in db.execute(f"SELECT DISTINCT recipes.id {from_sql} {where_part} ORDER BY recipes.id", params)))
+
+    if version is not None:
+        with _id_arrays_lock:
+            _id_arrays[key] = (version, ids)
+            _id_arrays.move_to_end(key)
+            while len(_id_arrays) > MAX_CACHED_ID_ARRAYS:
+                _id_arrays.popitem(last=False)
+    return ids
+
+
+def probe_ids(db, rng, count):
+    """
+    Picks `count` distinct existing ids by probing random ids in the rowid range
+    (two index lookups for the bounds plus one IN query per round).
+    Returns None if the ids are too sparse to find enough in MAX_PROBE_ROUNDS rounds.
+    """
+    low, high = db.execute("SELECT MIN(id), MAX(id) FROM recipes").fetchone()
+    if low is None:
+        return []
+    span = high - low + 1
+    if count * 2 > span:
+        return None # Asking for most of the table: the id array is cheaper
+
+    found = []
+    tried = set()
+    for _ in range(MAX_PROBE_ROUNDS):
+        needed = count - len(found)
+        candidates = []
+        # Ask for twice as many as missing to absorb gaps left by deleted recipes
+        while len(candidates) < needed * 2 and len(tried) < span:
+            candidate = rng.randint(low, high)
+            if candidate not in tried:
+                tried.add(candidate)
+                candidates.append(candidate)
+        if not candidates:
+            break
+        existing = {row[0] for row in db.execute(
+            f"SELECT id FROM recipes WHERE id IN ({', '.join('?' for _ in candidates)})", candidates
+        )}
+        # Keep the draw order, so a seeded sample is reproducible
+        found.extend(candidate for candidate in candidates if candidate in existing)
+        if len(found) >= count:
+            return found[:count]
+    return None
+
+
+def sample_ids(db, count, from_sql="FROM recipes", where_sql="", params=(), seed=None):
+    """
+    Returns up to `count` distinct random recipe ids matching the filter, in random order.
+    The same seed returns the same ids as long as the recipes don't change.
+    """
+    rng = random.Random(seed)
+    if not where_sql and from_sql == "FROM recipes":
+        ids = probe_ids(db, rng, count)
+        if ids is not None:
+            return ids
+
+    id_array = get_id_array(db, from_sql, where_sql, params)
+    if len(id_array) <= count:
+        ids = list(id_array)
+        rng.shuffle(ids)
+        return ids
+    # Sampling positions is O(count), whatever the size of the catalog
+    return [id_array[position] for position in rng.sample(range(len(id_array)), count)]
@@ -0,0 +1,94 @@
+# backend/app/models/recipe_transfer.py
+# Bulk import and export of the recipe catalogue as NDJSON (one JSON recipe per line)
+from flask import current_app
+from .. import validation
+from .recipe import get_read_db, add_recipes, recipe_to_dict
+
+EXPORT_BATCH_SIZE = 500 # Recipes read (and written out) per query
+MAX_REPORTED_ERRORS = 100 # Invalid lines beyond this are counted but not described
+
+# Content types of the export formats
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'json': 'application/json',
+}
+
+
+def parse_recipe_line(line):
+    """
+    Decodes and validates one NDJSON line (str or bytes).
+    A line is a recipe object as written by the export, or the {"recipeData": {...}} body
+    of POST /api/secure/recipes. id, created_at and updated_at are ignored on import.
+    Returns (validated recipe data, errors); errors is empty when the recipe can be inserted.
+    """
+    try:
+        recipe_data = current_app.json.loads(line)
+    except ValueError as e: # Invalid JSON or invalid UTF-8
+        return None, {"line": f"Invalid JSON: {e}"}
+    if isinstance(recipe_data, dict) and isinstance(recipe_data.get('recipeData'), dict):
+        recipe_data = recipe_data['recipeData']
+    if not isinstance(recipe_data, dict):
+        return None, {"line": "Each line must be a JSON object."}
+    return validation.validate_new_recipe(recipe_data)
+
+
+def import_recipes(lines, batch_size=None):
+    """
+    Imports recipes from an iterable of NDJSON lines (an open file, a request stream...),
+    reading one line at a time. Valid recipes are inserted with add_recipes() in batches of
+    `batch_size` (RECIPE_IMPORT_BATCH_SIZE), one transaction per batch; invalid lines are
+    skipped. A database error stops the import, and the batches committed before it stay.
+    Returns {'imported': int, 'failed': int, 'errors': [{'line': int, 'errors': {...}}]}.
+    """
+    batch_size = batch_size or current_app.config['RECIPE_IMPORT_BATCH_SIZE']
+    report = {'imported': 0, 'failed': 0, 'errors': []}
+    batch = []
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue # Blank lines (e.g. a trailing newline) are not records
+        recipe_data, errors = parse_recipe_line(line)
+        if errors:
+            report['failed'] += 1
+            if len(report['errors']) < MAX_REPORTED_ERRORS:
+                report['errors'].append({"line": line_number, "errors": errors})
+            continue
+        batch.append(recipe_data)
+        if len(batch) >= batch_size:
+            report['imported'] += len(add_recipes(batch))
+            batch = []
+    report['imported'] += len(add_recipes(batch))
+    current_app.logger.info(f"Imported {report['imported']} recipes ({report['failed']} invalid lines).")
+    return report
+
+
+def iter_recipe_batches(batch_size=EXPORT_BATCH_SIZE):
+    """
+    Yields all recipes as lists of recipe dicts, in id order. Each batch is its own
+    keyset query, so a slow reader never holds a read transaction open for the whole dump.
+    """
+    db = get_read_db()
+    last_id = 0
+    while True:
+        rows = db.execute("SELECT * FROM recipes WHERE id > ? ORDER BY id LIMIT ?", (last_id, batch_size)).fetchall()
+        if not rows:
+            return
+        yield [recipe_to_dict(row) for row in rows]
+        last_id = rows[-1]['id']
+
+
+def export_recipes(export_format='ndjson'):
+    """
+    Yields the catalogue as text chunks (one per batch of recipes): NDJSON lines, or a
+    single JSON array for export_format='json'. Only one batch is in memory at a time.
+    """
+    dumps = current_app.json.dumps
+    if export_format == 'json':
+        separator = '\n'
+        yield '['
+        for batch in iter_recipe_batches():
+            yield separator + ',\n'.join(dumps(recipe) for recipe in batch)
+            separator = ',\n'
+        yield '\n]\n'
+    else:
+        for batch in iter_recipe_batches():
+            yield ''.join(dumps(recipe) + '\n' for recipe in batch)
@@ -0,0 +1,355 @@
+# backend/app/models/response_cache.py
+# Response cache shared by all gunicorn workers, stored in its own SQLite file
+import time
+import sqlite3
+import threading
+from urllib.parse import urlencode
+from flask import current_app, g
+from . import db_pool
+
+# Entries are tagged with the data they were built from (e.g. 'recipe:12', 'menu_date:2024-05-01'),
+# so a write only drops the responses that can contain the changed data.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS response_cache (
+    key TEXT PRIMARY KEY, -- Normalized request path + query string
+    body BLOB NOT NULL,
+    mimetype TEXT NOT NULL,
+    byte_size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    last_used REAL NOT NULL, -- For LRU eviction
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_response_cache_expires_at ON response_cache (expires_at);
+CREATE INDEX IF NOT EXISTS idx_response_cache_last_used ON response_cache (last_used);
+
+CREATE TABLE IF NOT EXISTS response_cache_tags (
+    tag TEXT NOT NULL,
+    key TEXT NOT NULL REFERENCES response_cache (key) ON DELETE CASCADE,
+    PRIMARY KEY (tag, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_response_cache_tags_key ON response_cache_tags (key);
+
+-- Latest invalidation of each tag, numbered by one counter shared by all workers. A response is
+-- only stored if none of its tags was invalidated after its view started reading (see put())
+CREATE TABLE IF NOT EXISTS response_cache_invalidations (
+    tag TEXT PRIMARY KEY,
+    generation INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_response_cache_invalidations_generation ON response_cache_invalidations (generation);
+
+-- Counters shared by all workers: hits, misses, stores, evictions, expirations, invalidations
+CREATE TABLE IF NOT EXISTS response_cache_stats (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL DEFAULT 0
+);
+"""
+STAT_NAMES = ('hits', 'misses', 'stores', 'evictions', 'expirations', 'invalidations')
+
+# Data tags
+RECIPE_LIST_TAG = 'recipe_list' # Any response listing or counting recipes
+MENU_DATES_TAG = 'menu_dates' # Lists of dates that have menus
+
+
+def recipe_tag(recipe_id):
+    """Tag of responses containing a recipe's fields (detail, menus)."""
+    return f"recipe:{recipe_id}"
+
+
+def recipe_image_tag(recipe_id):
+    """Tag of responses referencing a recipe's primary image (menus)."""
+    return f"recipe_image:{recipe_id}"
+
+
+def menu_date_tag(date_str):
+    """Tag of responses containing the menus of one date."""
+    return f"menu_date:{date_str}"
+
+# Cache files whose schema has already been created by this process
+_initialized_paths = set()
+
+# Lookups are counted in this process and written to the cache file in batches (with the next
+# store, or at most every HIT_FLUSH_INTERVAL seconds), so hits don't queue on the file's write lock
+HIT_FLUSH_INTERVAL = 5
+_pending_lock = threading.Lock()
+_pending_lookups = {} # Cache file path -> {'hits': {key: [last_used, hits]}, 'stats': {...}, 'flushed_at': ...}
+
+
+def is_enabled():
+    """The cache is off when RESPONSE_CACHE_PATH is empty (the default in tests)."""
+    return bool(current_app.config.get('RESPONSE_CACHE_PATH'))
+
+
+def cache_pragmas():
+    """PRAGMA profile of cache connections."""
+    return {
+        'journal_mode': 'WAL', # Lets the workers read the cache while another one writes to it
+        'synchronous': 'OFF', # Losing cache entries on a crash is harmless
+        'foreign_keys': 'ON',
+        'busy_timeout': 500, # Short: a cache that has to wait is worse than no cache
+        'mmap_size': int(current_app.config.get('RESPONSE_CACHE_MMAP_SIZE', 0)),
+    }
+
+
+def _setup_cache_connection(db):
+    """Per-connection setup; creates the schema the first time this process opens the file."""
+    db.row_factory = sqlite3.Row
+    cache_path = current_app.config['RESPONSE_CACHE_PATH']
+    if cache_path not in _initialized_paths:
+        db.executescript(SCHEMA)
+        db.executemany("INSERT OR IGNORE INTO response_cache_stats (name) VALUES (?)", [(name,) for name in STAT_NAMES])
+        db.commit()
+        _initialized_paths.add(cache_path)
+
+
+def get_cache_db():
+    """Connection to the cache file for the current app context (pooled like the main database)."""
+    if 'response_cache_db' not in g:
+        g.response_cache_db = db_pool.acquire(current_app.config['RESPONSE_CACHE_PATH'], cache_pragmas(), _setup_cache_connection)
+    return g.response_cache_db
+
+
+def close_cache_db(e=None):
+    """Returns the cache connection to the pool."""
+    db = g.pop('response_cache_db', None)
+    if db is not None:
+        db_pool.release(current_app.config['RESPONSE_CACHE_PATH'], db)
+
+
+def init_app(app):
+    """Register the cache connection teardown with the Flask app."""
+    app.teardown_appcontext(close_cache_db)
+
+
+def make_key(path, args):
+    """
+    Cache key for a request: the path without trailing slash plus the query parameters,
+    sorted by name and value, with empty values dropped. So '?b=2&a=1' and '?a=1&b=2&c='
+    share one entry.
+    """
+    params = sorted(
+        (name, value)
+        for name in args
+        for value in args.getlist(name)
+        if value != ''
+    )
+    path = path.rstrip('/') or '/'
+    return f"{path}?{urlencode(params)}" if params else path
+
+
+def _bump(db, name, amount=1):
+    db.execute("UPDATE response_cache_stats SET value = value + ? WHERE name = ?", (amount, name))
+
+
+def _pending():
+    """Pending lookup counters of the current cache file (call with _pending_lock held)."""
+    return _pending_lookups.setdefault(current_app.config['RESPONSE_CACHE_PATH'], {
+        'hits': {}, 'stats': {'hits': 0, 'misses': 0}, 'flushed_at': time.monotonic(),
+    })
+
+
+def _count_lookup(key, now):
+    """Records a hit (key given) or a miss (key None); True if the counters are due to be written."""
+    with _pending_lock:
+        pending = _pending()
+        if key is None:
+            pending['stats']['misses'] += 1
+        else:
+            pending['stats']['hits'] += 1
+            key_hits = pending['hits'].setdefault(key, [now, 0])
+            key_hits[0] = now
+            key_hits[1] += 1
+        return time.monotonic() - pending['flushed_at'] >= HIT_FLUSH_INTERVAL
+
+
+def _take_lookups():
+    """Takes the pending counters out as (hits, stats); put them back with _restore_lookups if writing them fails."""
+    with _pending_lock:
+        pending = _pending()
+        taken = pending['hits'], pending['stats']
+        pending.update(hits={}, stats={'hits': 0, 'misses': 0}, flushed_at=time.monotonic())
+    return taken
+
+
+def _write_lookups(db, hits, stats):
+    """Writes taken hit/miss counters and last_used times into the current transaction of db."""
+    db.executemany(
+        "UPDATE response_cache SET last_used = MAX(last_used, ?), hits = hits + ? WHERE key = ?",
+        [(last_used, count, key) for key, (last_used, count) in hits.items()]
+    )
+    for name, amount in stats.items():
+        if amount:
+            _bump(db, name, amount)
+
+
+def _restore_lookups(hits, stats):
+    """Puts counters taken by _take_lookups back after a failed write."""
+    with _pending_lock:
+        pending = _pending()
+        for key, (last_used, count) in hits.items():
+            key_hits = pending['hits'].setdefault(key, [last_used, 0])
+            key_hits[0] = max(key_hits[0], last_used)
+            key_hits[1] += count
+        for name, amount in stats.items():
+            pending['stats'][name] += amount
+
+
+def flush_lookups():
+    """Writes this process's pending lookup counters to the cache file now."""
+    db = get_cache_db()
+    taken = _take_lookups()
+    try:
+        with db:
+            _write_lookups(db, *taken)
+    except sqlite3.Error as e:
+        _restore_lookups(*taken)
+        current_app.logger.warning(f"Response cache statistics update failed: {e}")
+
+
+def get(key):
+    """
+    Returns the cached entry (body, mimetype) for a key, or None on a miss.
+    Read-only: expired entries count as misses (put() removes them), and hits are counted in
+    this process and written in batches.
+    """
+    try:
+        db = get_cache_db()
+        now = time.time()
+        entry = db.execute(
+            "SELECT body, mimetype FROM response_cache WHERE key = ? AND expires_at > ?", (key, now)
+        ).fetchone()
+        if _count_lookup(key if entry is not None else None, now):
+            flush_lookups()
+        return entry
+    except sqlite3.Error as e:
+        current_app.logger.warning(f"Response cache read failed for {key}: {e}")
+        return None
+
+
+def current_generation():
+    """
+    The invalidation counter, read before a view builds a response to store (pass it to put()).
+    Returns None if it cannot be read; put() then stores nothing.
+    """
+    try:
+        return get_cache_db().execute(
+            "SELECT COALESCE(MAX(generation), 0) FROM response_cache_invalidations"
+        ).fetchone()[0]
+    except sqlite3.Error as e:
+        current_app.logger.warning(f"Response cache generation read failed: {e}")
+        return None
+
+
+def put(key, body, mimetype, tags, generation, ttl=None):
+    """
+    Stores a response body under a key with its data tags, evicting expired and least recently used entries.
+    `generation` is current_generation() from before the body was built: if any of the tags has been
+    invalidated since, the body may predate that write and is not stored.
+    """
+    if generation is None:
+        return
+    tags = set(tags)
+    ttl = ttl if ttl is not None else current_app.config.get('RESPONSE_CACHE_TTL', 300)
+    max_entries = current_app.config.get('RESPONSE_CACHE_MAX_ENTRIES', 1000)
+    taken = _take_lookups()
+    try:
+        db = get_cache_db()
+        now = time.time()
+        with db:
+            db.execute(
+                """
+                INSERT OR REPLACE INTO response_cache (key, body, mimetype, byte_size, created_at, expires_at, last_used)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                (key, body, mimetype, len(body), now, now + ttl, now)
+            )
+            db.executemany(
+                "INSERT OR IGNORE INTO response_cache_tags (tag, key) VALUES (?, ?)",
+                [(tag, key) for tag in tags]
+            )
+            # Checked after the insert took the write lock, so no invalidation can slip in between
+            stale = tags and db.execute(
+                f"SELECT 1 FROM response_cache_invalidations WHERE tag IN ({', '.join('?' for _ in tags)}) AND generation > ? LIMIT 1",
+                (*tags, generation)
+            ).fetchone()
+            if stale:
+                db.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+            else:
+                _bump(db, 'stores')
+            _write_lookups(db, *taken)
+
+            expired = db.execute("DELETE FROM response_cache WHERE expires_at <= ?", (now,)).rowcount
+            if expired:
+                _bump(db, 'expirations', expired)
+            entry_count = db.execute("SELECT COUNT(*) FROM response_cache").fetchone()[0]
+            if entry_count > max_entries:
+                # Evict a little more than needed so not every store has to evict
+                evict_count = entry_count - max_entries + max(1, max_entries // 10)
+                evicted = db.execute(
+                    "DELETE FROM response_cache WHERE key IN (SELECT key FROM response_cache ORDER BY last_used ASC LIMIT ?)",
+                    (evict_count,)
+                ).rowcount
+                _bump(db, 'evictions', evicted)
+    except sqlite3.Error as e:
+        _restore_lookups(*taken)
+        current_app.logger.warning(f"Response cache write failed for {key}: {e}")
+
+
+def invalidate(*tags):
+    """
+    Drops every cached response tagged with any of the given tags, and records the invalidation
+    so responses built from data read before it are not stored afterwards. Called by the model
+    functions that write, after their commit (add_recipe, update_recipe, delete_recipe,
+    commit_recipe_image, save_menu). Returns the number of dropped entries.
+    """
+    if not tags or not is_enabled():
+        return 0
+    try:
+        db = get_cache_db()
+        with db:
+            dropped = db.execute(
+                f"""
+                DELETE FROM response_cache WHERE key IN (
+                    SELECT key FROM response_cache_tags WHERE tag IN ({', '.join('?' for _ in tags)})
+                )
+                """,
+                tags
+            ).rowcount
+            generation = db.execute("SELECT COALESCE(MAX(generation), 0) + 1 FROM response_cache_invalidations").fetchone()[0]
+            db.executemany(
+                "INSERT OR REPLACE INTO response_cache_invalidations (tag, generation) VALUES (?, ?)",
+                [(tag, generation) for tag in set(tags)]
+            )
+            _bump(db, 'invalidations', dropped)
+        return dropped
+    except sqlite3.Error as e:
+        # Stale entries still expire after RESPONSE_CACHE_TTL
+        current_app.logger.error(f"Response cache invalidation failed for {tags}: {e}")
+        return 0
+
+
+def clear():
+    """Drops all cached responses (statistics are kept)."""
+    if not is_enabled():
+        return 0
+    db = get_cache_db()
+    with db:
+        return db.execute("DELETE FROM response_cache").rowcount
+
+
+def get_stats():
+    """Hit/miss counters of all workers plus the current size of the cache."""
+    if not is_enabled():
+        return {"enabled": False}
+    db = get_cache_db()
+    flush_lookups()
+    stats = {row['name']: row['value'] for row in db.execute("SELECT name, value FROM response_cache_stats")}
+    size = db.execute("SELECT COUNT(*) AS entries, COALESCE(SUM(byte_size), 0) AS bytes FROM response_cache").fetchone()
+    lookups = stats.get('hits', 0) + stats.get('misses', 0)
+    stats.update({
+        "enabled": True,
+        "entries": size['entries'],
+        "bytes": size['bytes'],
+        "hit_ratio": round(stats.get('hits', 0) / lookups, 4) if lookups else None,
+    })
+    return stats
@@ -0,0 +1,92 @@
+# backend/app/models/search.py
+# Full-text search support for recipes (SQLite FTS5)
+import re
+import json
+
+# CJK ideographs are written without spaces, so FTS5's unicode61 tokenizer would
+# treat a whole run like "麻婆豆腐" as one token. We index every ideograph as its
+# own token instead and turn multi-character query terms into phrase queries,
+# which gives substring matching for Chinese text on top of the regular index.
+CJK_CHAR_PATTERN = re.compile(r'([\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff])')
+# Token characters as unicode61 sees them (letters and numbers, not underscore)
+TOKEN_PATTERN = re.compile(r'[^\W_]+')
+
+# bm25 column weights, in the column order of the recipes_fts table:
+# name, description, ingredient_names, instruction_text
+BM25_WEIGHTS = (10.0, 4.0, 2.0, 1.0)
+RANK_EXPRESSION = f"bm25(recipes_fts, {', '.join(str(w) for w in BM25_WEIGHTS)})"
+
+
+def segment_text(text):
+    """Splits CJK runs into single-character tokens so FTS5 can index them."""
+    if not text:
+        return ''
+    return CJK_CHAR_PATTERN.sub(r' \1 ', str(text))
+
+
+def json_text(value):
+    """
+    Flattens a JSON array column into plain text for indexing.
+    Strings are used as-is, objects contribute their 'name' (ingredients).
+    Never raises, because it runs inside the recipes triggers.
+    """
+    if not value:
+        return ''
+    try:
+        items = json.loads(value)
+    except (json.JSONDecodeError, TypeError):
+        return str(value)
+    if isinstance(items, str):
+        return items
+    if not isinstance(items, list):
+        return ''
+    parts = []
+    for item in items:
+        if isinstance(item, str):
+            parts.append(item)
+        elif isinstance(item, dict) and item.get('name'):
+            parts.append(str(item['name']))
+    return ' '.join(parts)
+
+
+def register_functions(db):
+    """Registers the SQL functions used by the recipes_fts triggers on a connection."""
+    db.create_function('fts_segment', 1, segment_text, deterministic=True)
+    db.create_function('fts_json_text', 1, json_text, deterministic=True)
+
+
+def build_match_query(search):
+    """
+    Turns free text from the search box into an FTS5 MATCH expression.
+    Every whitespace separated word must match (AND); each word becomes a quoted
+    phrase so user input can never be parsed as FTS5 syntax, and gets a prefix
+    marker so partially typed words still match.
+    Returns None if the input has no searchable characters.
+    """
+    if not search:
+        return None
+    phrases = []
+    for word in search.split():
+        tokens = TOKEN_PATTERN.findall(segment_text(word))
+        if tokens:
+            phrases.append('"' + ' '.join(tokens) + '"*')
+    if not phrases:
+        return None
+    return ' AND '.join(phrases)
+
+
+def rebuild_search_index(db):
+    """(Re)creates the recipes_fts table and triggers, then indexes every recipe."""
+    from flask import current_app
+    with current_app.open_resource('../data/schema_search.sql') as f:
+        db.executescript(f.read().decode('utf8'))
+    db.execute(
+        """
+        INSERT INTO recipes_fts (rowid, name, description, ingredient_names, instruction_text)
+        SELECT id, fts_segment(name), fts_segment(description),
+               fts_segment(fts_json_text(ingredients)), fts_segment(fts_json_text(instructions))
+        FROM recipes
+        """
+    )
+    db.commit()
+    return db.execute("SELECT COUNT(*) FROM recipes_fts").fetchone()[0]
@@ -0,0 +1,138 @@
+# backend/app/models/shopping_list.py
+# Shopping list of a date range: the ingredients of every dish in the latest menu version of each day
+import re
+
+# One pass over the normalized ingredient table (recipe_ingredients, see schema_recipe_index.sql):
+# the latest version of each day (date index, as in the calendar query), its dishes (shared
+# contents included) and their ingredients, grouped by (name, quantity text). A recipe served
+# twice counts twice. Quantities are parsed afterwards, once per distinct text.
+SHOPPING_LIST_SQL = """
+    WITH latest AS (
+        SELECT menu_date, MAX(version) AS version
+        FROM daily_menus
+        WHERE menu_date BETWEEN ? AND ?
+        GROUP BY menu_date
+    )
+    SELECT
+        ri.ingredient_name, ri.quantity,
+        COUNT(*) AS uses,
+        GROUP_CONCAT(DISTINCT dmr.recipe_id) AS recipe_ids
+    FROM latest l
+    JOIN daily_menus dm ON dm.menu_date = l.menu_date AND dm.version = l.version
+    JOIN daily_menu_recipes dmr ON dmr.daily_menu_id = COALESCE(dm.content_menu_id, dm.id)
+    JOIN recipe_ingredients ri ON ri.recipe_id = dmr.recipe_id
+    GROUP BY ri.ingredient_name, ri.quantity
+    ORDER BY ri.ingredient_name, ri.quantity
+"""
+
+# Units that are merged after conversion to a common unit: unit -> (common unit, factor)
+UNIT_CONVERSIONS = {
+    '克': ('克', 1), 'g': ('克', 1),
+    '千克': ('克', 1000), '公斤': ('克', 1000), 'kg': ('克', 1000),
+    '斤': ('克', 500),
+    '毫升': ('毫升', 1), 'ml': ('毫升', 1),
+    '升': ('毫升', 1000), 'l': ('毫升', 1000),
+}
+
+# Counted units that are summed as they are
+COUNT_UNITS = (
+    '个', '只', '条', '根', '颗', '粒', '片', '段', '块', '小块', '瓣', '棵', '把', '张',
+    '包', '袋', '盒', '罐', '瓶', '碗', '杯', '勺', '汤匙', '茶匙', '大勺', '小勺',
+)
+
+CHINESE_DIGITS = {'零': 0, '〇': 0, '一': 1, '两': 2, '二': 2, '三': 3, '四': 4, '五': 5, '六': 6, '七': 7, '八': 8, '九': 9}
+CHINESE_MULTIPLIERS = {'十': 10, '百': 100, '千': 1000}
+
+# '2个', '1.5 kg', '1/2杯', '半只', '十二个', '两百克', optionally followed by a note in brackets
+# ('1茶匙（可选）'). Anything else after the amount ('500克左右', '3-4片') does not match.
+_UNITS = sorted({*UNIT_CONVERSIONS, *COUNT_UNITS}, key=len, reverse=True)
+QUANTITY_PATTERN = re.compile(
+    r'^\s*(\d+(?:\.\d+)?(?:/\d+)?|半|[零〇一两二三四五六七八九十百千]+)\s*'
+    r'(' + '|'.join(map(re.escape, _UNITS)) + r')?\s*(?:[（(][^）)]*[）)]\s*)?$',
+    re.IGNORECASE
+)
+
+
+def parse_chinese_number(text):
+    """
+    Value of a whole Chinese numeral ('三', '十二', '二十', '两百', '一百零五'), or None if it is not one.
+    """
+    total, digit, last_multiplier = 0, None, None
+    for char in text:
+        if CHINESE_DIGITS.get(char) == 0 and last_multiplier is not None and digit is None:
+            continue # '一百零五': the zero only marks the missing tens
+        if char in CHINESE_DIGITS:
+            if digit is not None:
+                return None # Two digits in a row ('二三')
+            digit = CHINESE_DIGITS[char]
+        else:
+            multiplier = CHINESE_MULTIPLIERS[char]
+            if last_multiplier is not None and multiplier >= last_multiplier or digit == 0:
+                return None # '十百', '零十'
+            # A leading '十' means one ten ('十二')
+            total += (1 if digit is None else digit) * multiplier
+            digit, last_multiplier = None, multiplier
+    return total + (digit or 0)
+
+
+def parse_quantity(text):
+    """
+    Splits a free text quantity into (amount, unit), converting mass and volume units to 克 / 毫升.
+    Returns None unless the text is an amount with a known unit (and at most a bracketed note):
+    '适量', '少许', '3-4片', '500克左右', ... are left to the caller as notes.
+    """
+    if not text:
+        return None
+    match = QUANTITY_PATTERN.match(text)
+    if not match:
+        return None
+    number, unit = match.groups()
+    unit = unit or ''
+    if number == '半':
+        amount = 0.5
+    elif number[0] in CHINESE_DIGITS or number[0] in CHINESE_MULTIPLIERS:
+        amount = parse_chinese_number(number)
+        if amount is None:
+            return None
+    elif '/' in number:
+        numerator, denominator = number.split('/')
+        if int(denominator) == 0:
+            return None
+        amount = int(numerator) / int(denominator)
+    else:
+        amount = float(number)
+    common_unit, factor = UNIT_CONVERSIONS.get(unit.lower(), (unit, 1))
+    return amount * factor, common_unit
+
+
+def format_amount(amount):
+    """Whole amounts as integers, others rounded to two decimals."""
+    return int(amount) if float(amount).is_integer() else round(amount, 2)
+
+
+def build_shopping_list(db, start_date, end_date):
+    """
+    Aggregates the ingredients of the latest menu version of every date in [start_date, end_date]:
+    [{'name', 'quantities': [{'amount', 'unit'}], 'notes': [...], 'recipe_ids': [...]}, ...] by name.
+    Parseable quantities are summed per unit; the others ('适量', ...) are listed once each in notes.
+    """
+    items = {}
+    for row in db.execute(SHOPPING_LIST_SQL, (start_date, end_date)):
+        item = items.setdefault(row['ingredient_name'], {"amounts": {}, "notes": [], "recipe_ids": set()})
+        item['recipe_ids'].update(int(recipe_id) for recipe_id in row['recipe_ids'].split(','))
+        parsed = parse_quantity(row['quantity'])
+        if parsed is not None:
+            amount, unit = parsed
+            item['amounts'][unit] = item['amounts'].get(unit, 0) + amount * row['uses']
+        elif row['quantity'] and row['quantity'] not in item['notes']:
+            item['notes'].append(row['quantity'])
+
+    return [
+        {
+            "name": name,
+            "quantities": [{"amount": format_amount(amount), "unit": unit} for unit, amount in item['amounts'].items()],
+            "notes": item['notes'],
+            "recipe_ids": sorted(item['recipe_ids']),
+        }
+        for name, item in items.items()
+    ]
@@ -4,6 +4,8 @@
 from flask import Blueprint, jsonify, request, abort, current_app
 from datetime import datetime
 from ..models import daily_menu as db_daily_menu # Import the new model functions
+from ..http_cache import conditional, cached
+from ..models import response_cache
 
 bp = Blueprint('daily_menus', __name__, url_prefix='/api/daily-menus')
 
@@ -15,21 +17,64 @@ def validate_date(date_str):
     except ValueError:
         return False
 
+# Data tags of a menu response for the response cache: its date and every recipe (and image) in it
+def menu_cache_tags(payload, **view_kwargs):
+    menu = payload.get('latest_menu') if 'latest_menu' in payload else payload
+    tags = []
+    if request.args.get('date'):
+        tags.append(response_cache.menu_date_tag(request.args['date']))
+    if menu:
+        tags.append(response_cache.menu_date_tag(menu['version_info']['menu_date']))
+        for recipe in menu['recipes']:
+            tags.append(response_cache.recipe_tag(recipe['recipe_id']))
+            tags.append(response_cache.recipe_image_tag(recipe['recipe_id']))
+    return tags
+
+# Helper function for the 'from'/'to' query parameters of range endpoints.
+# Returns (from, to, None) as zero-padded 'YYYY-MM-DD' strings (what the BETWEEN comparisons
+# in the queries rely on), or (None, None, error response).
+def parse_date_range():
+    start_str = request.args.get('from')
+    end_str = request.args.get('to')
+    if not start_str or not end_str:
+        return None, None, (jsonify({"message": "Missing 'from' or 'to' query parameter."}), 400)
+    if not validate_date(start_str) or not validate_date(end_str):
+        return None, None, (jsonify({"message": "Invalid date format. Please use YYYY-MM-DD."}), 400)
+
+    start_date = datetime.strptime(start_str, '%Y-%m-%d').date()
+    end_date = datetime.strptime(end_str, '%Y-%m-%d').date()
+    if start_date > end_date:
+        return None, None, (jsonify({"message": "'from' must not be after 'to'."}), 400)
+    max_days = current_app.config.get('MENU_CALENDAR_MAX_DAYS', 366)
+    if (end_date - start_date).days + 1 > max_days:
+        return None, None, (jsonify({"message": f"Date range too long (at most {max_days} days)."}), 400)
+    return start_date.isoformat(), end_date.isoformat(), None
+
+# Helper function to validate the optional 'inline_images' query parameter
+def validate_inline_images(inline_images):
+    return inline_images is None or inline_images in db_daily_menu.INLINE_IMAGE_MODES
+
 @bp.route('/', methods=['GET'], strict_slashes=False) # Allow access without trailing slash
+@conditional('daily_menus', 'recipes', 'recipe_images') # Menus embed recipe fields and image hashes
+@cached(menu_cache_tags)
 def get_daily_menu():
     """
     Get the latest menu details and all available versions for a specific date.
     Requires 'date' query parameter in 'YYYY-MM-DD' format.
+    Optional 'inline_images=thumb' embeds small recipe images as Base64 (default: image URLs only).
     """
     date_str = request.args.get('date')
+    inline_images = request.args.get('inline_images')
     if not date_str:
         return jsonify({"message": "Missing 'date' query parameter."}), 400
     if not validate_date(date_str):
         return jsonify({"message": "Invalid date format. Please use YYYY-MM-DD."}), 400
+    if not validate_inline_images(inline_images):
+        return jsonify({"message": "Invalid 'inline_images' parameter. Use 'thumb' or omit it."}), 400
 
     try:
-        latest_menu = db_daily_menu.get_latest_menu_by_date(date_str)
-        versions = db_daily_menu.get_menu_versions_by_date(date_str)
+        # Two queries in total: the date's versions, then the latest version's recipes
+        latest_menu, versions = db_daily_menu.get_menu_by_date(date_str, inline_images)
 
         # latest_menu will be None if no menu exists for the date
         # versions will be an empty list if no menu exists
@@ -44,6 +89,8 @@ def get_daily_menu():
 
 
 @bp.route('/dates', methods=['GET'])
+@conditional('daily_menus')
+@cached(lambda payload: [response_cache.MENU_DATES_TAG])
 def get_menu_dates():
     """Get a list of all dates that have at least one saved menu."""
     try:
@@ -56,6 +103,8 @@ def get_menu_dates():
 
 # New route to get dates with menus within a specific month
 @bp.route('/dates-in-month', methods=['GET'])
+@conditional('daily_menus')
+@cached(lambda payload: [response_cache.MENU_DATES_TAG])
 def get_menu_dates_in_month():
     """
     Get a list of dates within a specific year and month that have saved menus.
@@ -90,6 +139,50 @@ def get_menu_dates_in_month():
         abort(500, description=f"Internal server error fetching menu dates for {year}-{month}.")
 
 
+@bp.route('/calendar', methods=['GET'])
+@conditional('daily_menus')
+# Dish counts also change when a recipe is deleted (its menu rows cascade), hence the recipe list tag
+@cached(lambda payload: [response_cache.MENU_DATES_TAG, response_cache.RECIPE_LIST_TAG])
+def get_menu_calendar():
+    """
+    Get per-day menu summaries for a date range, for calendar views.
+    Requires 'from' and 'to' query parameters ('YYYY-MM-DD', inclusive), at most
+    MENU_CALENDAR_MAX_DAYS apart. Days without a menu are omitted.
+    """
+    start_date, end_date, error = parse_date_range()
+    if error:
+        return error
+
+    try:
+        days = db_daily_menu.get_menu_calendar(start_date, end_date)
+        return jsonify({"from": start_date, "to": end_date, "days": days})
+    except Exception as e:
+        current_app.logger.error(f"Error fetching menu calendar {start_date}..{end_date}: {e}", exc_info=True)
+        abort(500, description="Internal server error fetching the menu calendar.")
+
+
+@bp.route('/shopping-list', methods=['GET'])
+@conditional('daily_menus', 'recipes') # Ingredients come from the recipes
+# Any recipe edit can change an ingredient, so recipe writes (all of which invalidate the list tag) apply
+@cached(lambda payload: [response_cache.MENU_DATES_TAG, response_cache.RECIPE_LIST_TAG])
+def get_shopping_list():
+    """
+    Get the ingredients needed for the latest menu of every day in a date range, merged by name.
+    Requires 'from' and 'to' query parameters ('YYYY-MM-DD', inclusive), at most
+    MENU_CALENDAR_MAX_DAYS apart.
+    """
+    start_date, end_date, error = parse_date_range()
+    if error:
+        return error
+
+    try:
+        items = db_daily_menu.get_shopping_list(start_date, end_date)
+        return jsonify({"from": start_date, "to": end_date, "items": items})
+    except Exception as e:
+        current_app.logger.error(f"Error building shopping list {start_date}..{end_date}: {e}", exc_info=True)
+        abort(500, description="Internal server error building the shopping list.")
+
+
 @bp.route('/', methods=['POST'], strict_slashes=False) # Allow access without trailing slash
 def save_daily_menu():
     """
@@ -140,53 +233,75 @@ def save_daily_menu():
     #     return jsonify({"message": "Cannot save an empty menu."}), 400
 
     try:
-        # Call the model function to save the menu
-        new_menu_id = db_daily_menu.save_menu(date_str, validated_recipes, overwrite)
-
-        if new_menu_id:
-            # Fetch the newly created/updated menu details to return
-            # If overwriting, latest might be the one we just created (version 1)
-            # If adding new version, latest will be the one we just created
-            saved_menu_details = db_daily_menu.get_latest_menu_by_date(date_str) # This gets the *latest*, which should be the one just saved
+        # Call the model function to save the menu; it returns the saved version as read
+        # back inside its write transaction, so there is no second round-trip here
+        saved_menu = db_daily_menu.save_menu_version(date_str, validated_recipes, overwrite)
+
+        if saved_menu:
             return jsonify({
                 "message": "Menu saved successfully.",
-                "new_menu_id": new_menu_id,
-                "saved_menu": saved_menu_details # Return the saved menu details
+                "new_menu_id": saved_menu['version_info']['id'],
+                "saved_menu": saved_menu # Return the saved menu details
             }), 201 # HTTP status code for Created
         else:
-            # save_menu returned None, indicating failure (e.g., integrity error, db error)
-            # Check if it was an integrity error (likely trying to overwrite version 1 when overwrite=false)
-            # More specific error handling could be added here based on why save_menu failed
-             return jsonify({"message": "Failed to save menu. Possible reasons: database error, or trying to overwrite version 1 without 'overwrite=true'."}), 500
+            # save_menu_version returned None, indicating failure (e.g., a recipe that no longer
+            # exists, or a database error); version conflicts cannot happen, with or without overwrite
+             return jsonify({"message": "Failed to save menu. Possible reasons: database error, or a recipe in the menu no longer exists."}), 500
 
     except Exception as e:
         current_app.logger.error(f"Exception saving daily menu for date {date_str}: {e}", exc_info=True)
         abort(500, description=f"Internal server error saving menu for date {date_str}.")
 
 
+# Data tags of a diff response: the dates of both versions and the recipes that changed
+def menu_diff_cache_tags(payload):
+    tags = [response_cache.menu_date_tag(payload['base']['menu_date']),
+            response_cache.menu_date_tag(payload['target']['menu_date'])]
+    for change in payload['added'] + payload['removed']:
+        tags.append(response_cache.recipe_tag(change['recipe_id']))
+    return tags
+
+@bp.route('/diff', methods=['GET'])
+@conditional('daily_menus', 'recipes') # Changes carry recipe names
+@cached(menu_diff_cache_tags)
+def get_menu_diff():
+    """
+    Get the dishes added and removed between two menu versions (any dates).
+    Requires 'base' and 'target' query parameters (daily_menu ids).
+    """
+    base_id = request.args.get('base', type=int)
+    target_id = request.args.get('target', type=int)
+    if base_id is None or target_id is None:
+        return jsonify({"message": "Missing or invalid 'base' or 'target' query parameter (menu version ids)."}), 400
+
+    try:
+        diff = db_daily_menu.get_menu_diff(base_id, target_id)
+    except Exception as e:
+        current_app.logger.error(f"Error comparing menu versions {base_id} and {target_id}: {e}", exc_info=True)
+        abort(500, description="Internal server error comparing menu versions.")
+
+    if diff is None:
+        return jsonify({"message": f"Menu version {base_id} or {target_id} not found."}), 404
+    return jsonify(diff)
+
+
 # Optional: Endpoint to get a specific menu version by its ID
 @bp.route('/<int:menu_id>', methods=['GET'])
+@conditional('daily_menus', 'recipes', 'recipe_images')
+@cached(menu_cache_tags)
 def get_specific_menu_version(menu_id):
     """Get the details of a specific menu version by its daily_menu_id."""
-    try:
-        menu_details = db_daily_menu.get_menu_details(menu_id)
-        if not menu_details:
-            # If details are empty, check if the menu_id itself exists
-            version_info = db_daily_menu.daily_menu_to_dict(
-                db_daily_menu.get_db().execute("SELECT * FROM daily_menus WHERE id = ?", (menu_id,)).fetchone()
-            )
-            if version_info:
-                 # Menu version exists but has no recipes (maybe saved empty?)
-                 return jsonify({"version_info": version_info, "recipes": []})
-            else:
-                 abort(404, description=f"Menu version with id {menu_id} not found.")
-
-        # Need version info as well
-        version_info = db_daily_menu.daily_menu_to_dict(
-             db_daily_menu.get_db().execute("SELECT * FROM daily_menus WHERE id = ?", (menu_id,)).fetchone()
-        )
-        return jsonify({"version_info": version_info, "recipes": menu_details})
+    inline_images = request.args.get('inline_images')
+    if not validate_inline_images(inline_images):
+        return jsonify({"message": "Invalid 'inline_images' parameter. Use 'thumb' or omit it."}), 400
 
+    try:
+        # Version row and recipes in two queries (recipes is [] for a menu saved empty)
+        menu = db_daily_menu.get_menu_version(menu_id, inline_images)
     except Exception as e:
         current_app.logger.error(f"Error fetching menu version id {menu_id}: {e}", exc_info=True)
         abort(500, description=f"Internal server error fetching menu version {menu_id}.")
+
+    if menu is None:
+        return jsonify({"message": f"Menu version with id {menu_id} not found."}), 404
+    return jsonify(menu)
@@ -1,15 +1,25 @@
 # backend/app/routes/recipes.py
 # Routes for recipe related operations
 import os
-from flask import Blueprint, jsonify, request, abort, current_app
+from flask import Blueprint, jsonify, request, abort, current_app, send_file
 from werkzeug.utils import secure_filename
+from werkzeug.wsgi import wrap_file
 # Import specific functions for clarity or keep as is
 from ..models import recipe as db_recipe
+from ..models import image_store
+from ..models import image_derivatives
+from ..models import response_cache
+from ..models import recipe_query
+from ..models import image_blob
+from .. import validation
+from ..http_cache import conditional, cached, is_not_modified, not_modified_response, set_validators, IMMUTABLE, REVALIDATE
 
 bp = Blueprint('recipes', __name__, url_prefix='/api/recipes')
 limit_per_page = 8 # Default limit for pagination
 
 @bp.route('/', methods=['GET'])
+@conditional('recipes')
+@cached(lambda payload: [response_cache.RECIPE_LIST_TAG])
 def get_recipes():
     """Get a list of recipes, potentially filtered."""
     # Extract filter parameters from request query string
@@ -41,13 +51,25 @@ def get_recipes():
     # Keep pagination params even if they are default
     active_filters = {k: v for k, v in filters.items() if v is not None and k not in ['page', 'limit']}
 
+    # Optional projection: ?fields=summary (list cards) or ?fields=name,tags,... (id is always included)
+    try:
+        fields = recipe_query.resolve_fields(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+
+    # Opt-in keyset pagination for infinite scroll: pass `cursor` (empty for the first page)
+    if 'cursor' in request.args:
+        return get_recipes_by_cursor(active_filters, filters['limit'], fields)
+
     try:
         # Assuming db_recipe.get_all_recipes is updated to handle pagination
         # and returns a tuple: (list_of_recipes_for_page, total_item_count)
         recipes_page, total_items = db_recipe.get_all_recipes(
             filters=active_filters,
             page=filters['page'],
-            limit=filters['limit']
+            limit=filters['limit'],
+            fields=fields,
+            documents=True # Encoded once per recipe version, spliced into the response
         )
 
         total_pages = (total_items + filters['limit'] - 1) // filters['limit'] # Calculate total pages
@@ -67,11 +89,42 @@ def get_recipes():
         abort(500, description="Internal server error fetching recipes.")
 
 
+def get_recipes_by_cursor(active_filters, limit, fields=None):
+    """Cursor mode of GET /api/recipes: returns `next_cursor` instead of page numbers."""
+    cursor = request.args.get('cursor') or None
+    include_total = request.args.get('includeTotal', 'false').lower() == 'true'
+    try:
+        recipes_page, next_cursor, total_items = db_recipe.get_recipes_by_cursor(
+            filters=active_filters,
+            cursor=cursor,
+            limit=limit,
+            include_total=include_total,
+            fields=fields,
+            documents=True
+        )
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    except Exception as e:
+        current_app.logger.error(f"Error fetching recipes with cursor pagination: {e}", exc_info=True)
+        abort(500, description="Internal server error fetching recipes.")
+
+    pagination = {
+        "per_page": limit,
+        "next_cursor": next_cursor,
+        "has_more": next_cursor is not None
+    }
+    if include_total:
+        pagination["total_items"] = total_items
+    return jsonify({"data": recipes_page, "pagination": pagination})
+
+
 @bp.route('/<int:id>', methods=['GET'])
+@conditional('recipes')
+@cached(lambda payload, id: [response_cache.recipe_tag(id)])
 def get_recipe(id):
     """Get a specific recipe by its ID."""
     try:
-        recipe = db_recipe.get_recipe_by_id(id)
+        recipe = db_recipe.get_recipe_document(id)
         if recipe is None:
             abort(404, description=f"Recipe with id {id} not found.")     
         return jsonify({"data": recipe})
@@ -80,23 +133,59 @@ def get_recipe(id):
         abort(500, description=f"Internal server error fetching recipe {id}.")
 
 
+def is_seeded_request():
+    """Only seeded random picks are reproducible, so only those may be cached."""
+    return bool(request.args.get('seed'))
+
+
 @bp.route('/random', methods=['GET'])
+@conditional('recipes', when=is_seeded_request)
+@cached(lambda payload: [response_cache.RECIPE_LIST_TAG], when=is_seeded_request)
 def get_random_recipes_route():
-    """Get a specified number of random recipes."""
+    """
+    Get a specified number of random recipes.
+    Optional filters: cuisine, difficulty, tags (any of, repeatable) and cookTimeMax (minutes).
+    Optional 'seed' makes the pick reproducible, e.g. seed=2024-05-01 for a recipe of the day.
+    """
     count = request.args.get('count', 3, type=int)
     # Basic validation for count
     if count <= 0:
         count = 3
     count = min(count, 100)  # Limit to a maximum of 100 random recipes
 
+    filters = {
+        'cuisine': request.args.get('cuisine'),
+        'difficulty': request.args.get('difficulty'),
+        'tags': request.args.getlist('tags') if 'tags' in request.args else None,
+        'cook_time_max': request.args.get('cookTimeMax', type=int),
+    }
+    seed = request.args.get('seed') or None
+
     try:
-        recipes = db_recipe.get_random_recipes(count)
+        recipes = db_recipe.get_random_recipes(count, filters, seed)
         return jsonify({"data": recipes})
     except Exception as e:
         print(f"Error fetching random recipes: {e}")
         abort(500, description="Internal server error fetching random recipes.")
 
 
+@bp.route('/tags', methods=['GET'])
+@conditional('recipes')
+@cached(lambda payload: [response_cache.RECIPE_LIST_TAG])
+def get_tag_counts_route():
+    """Get all tags with the number of recipes per tag (for filter facets)."""
+    limit = request.args.get('limit', type=int)
+    if limit is not None and limit <= 0:
+        limit = None
+
+    try:
+        tag_counts = db_recipe.get_tag_counts(limit)
+        return jsonify({"data": tag_counts})
+    except Exception as e:
+        current_app.logger.error(f"Error fetching tag counts: {e}", exc_info=True)
+        abort(500, description="Internal server error fetching tag counts.")
+
+
 import json # Add json import at the top if not already present
 
 # --- Image Upload Route Helper --- (Keep existing ALLOWED_EXTENSIONS and allowed_file)
@@ -128,58 +217,8 @@ def create_recipe():
     # Image file is handled by a separate endpoint, not here.
 
 
-    # --- Detailed Validation (applied to recipe_data regardless of source) ---
-    errors = {}
-    # Required fields check
-    required_fields = ['name', 'ingredients', 'instructions']
-    for field in required_fields:
-        if field not in recipe_data:
-             errors[field] = f"Missing required field: {field}"
-        elif field in ['ingredients', 'instructions'] and (not isinstance(recipe_data[field], list) or not recipe_data[field]):
-             errors[field] = f"Required field '{field}' must be a non-empty list."
-        elif field not in ['ingredients', 'instructions'] and not recipe_data[field]: # For non-list fields like name
-             errors[field] = f"Required field '{field}' cannot be empty."
-
-    # Ingredients validation (only if field exists and basic check passed)
-    if 'ingredients' not in errors and 'ingredients' in recipe_data:
-        ingredient_errors = []
-        for index, ingredient in enumerate(recipe_data['ingredients']):
-            ing_errors = {}
-            if not isinstance(ingredient, dict):
-                ing_errors['general'] = f"Ingredient at index {index} must be an object."
-            else:
-                # Name is required for an ingredient
-                if 'name' not in ingredient or not ingredient['name']:
-                    ing_errors['name'] = f"Ingredient {index+1}: Name is required and cannot be empty."
-                # Quantity is optional
-            if ing_errors:
-                ingredient_errors.append({"index": index, "errors": ing_errors})
-        if ingredient_errors:
-             errors['ingredients'] = ingredient_errors
-
-    # Instructions validation (only if field exists and basic check passed)
-    if 'instructions' not in errors and 'instructions' in recipe_data:
-        instruction_errors = []
-        for index, instruction in enumerate(recipe_data['instructions']):
-            if not isinstance(instruction, str) or not instruction.strip():
-                instruction_errors.append({"index": index, "error": "Instruction must be a non-empty string."})
-        if instruction_errors:
-             errors['instructions'] = instruction_errors
-
-    # Optional fields validation (numeric checks if present and not None)
-    numeric_fields = ['prep_time_minutes', 'cook_time_minutes', 'servings']
-    for field in numeric_fields:
-        # Check within recipe_data
-        # Use .get() to avoid KeyError if field is missing (e.g., in JSON request)
-        field_value = recipe_data.get(field)
-        if field_value is not None: # Check for None explicitly, 0 is valid
-            try:
-                # Allow integers or floats
-                val = int(field_value) if str(field_value).isdigit() else float(field_value)
-                if val < 0:
-                     errors[field] = f"{field.replace('_', ' ').title()} cannot be negative."
-            except (ValueError, TypeError):
-                errors[field] = f"{field.replace('_', ' ').title()} must be a valid number if provided."
+    # --- Validation and normalization (same rules as the bulk import, see app/validation.py) ---
+    recipe_data, errors = validation.validate_new_recipe(recipe_data)
 
     if errors:
         # Return structured validation errors
@@ -243,56 +282,8 @@ def update_recipe(id):
     if existing_recipe is None:
         return jsonify({"message": f"Recipe with id {id} not found."}), 404
 
-    # --- Detailed Validation on recipe_data (fields are optional for update) ---
-    errors = {}
-    # Validate fields only if they are present in the recipe_data
-    if 'name' in recipe_data and not recipe_data['name']: # Name cannot be updated to empty
-        errors['name'] = "Name cannot be empty."
-
-    if 'ingredients' in recipe_data: # If ingredients are being updated
-        if not isinstance(recipe_data['ingredients'], list):
-             errors['ingredients'] = "Ingredients must be a list."
-        elif not recipe_data['ingredients']: # Allow updating to empty list? Or require at least one?
-             errors.setdefault('ingredients', []).append("Ingredients list cannot be empty if provided for update.")
-        else:
-            ingredient_errors = []
-            for index, ingredient in enumerate(recipe_data['ingredients']):
-                ing_errors = {}
-                if not isinstance(ingredient, dict):
-                    ing_errors['general'] = f"Ingredient at index {index} must be an object."
-                else:
-                    if 'name' not in ingredient or not ingredient['name']:
-                        ing_errors['name'] = f"Ingredient {index+1}: Name is required and cannot be empty."
-                    # Quantity is optional
-                if ing_errors:
-                    ingredient_errors.append({"index": index, "errors": ing_errors})
-            if ingredient_errors:
-                 errors['ingredients'] = ingredient_errors
-
-    if 'instructions' in recipe_data: # If instructions are being updated
-         if not isinstance(recipe_data['instructions'], list):
-             errors['instructions'] = "Instructions must be a list of strings."
-         elif not recipe_data['instructions']: # Allow updating to empty list?
-             errors.setdefault('instructions', []).append("Instructions list cannot be empty if provided for update.")
-         else:
-            instruction_errors = []
-            for index, instruction in enumerate(recipe_data['instructions']):
-                if not isinstance(instruction, str) or not instruction.strip():
-                    instruction_errors.append({"index": index, "error": "Instruction must be a non-empty string."})
-            if instruction_errors:
-                 errors['instructions'] = instruction_errors
-
-    # Optional fields validation (numeric checks if present and not None)
-    numeric_fields = ['prep_time_minutes', 'cook_time_minutes', 'servings']
-    for field in numeric_fields:
-        if field in recipe_data and recipe_data[field] is not None:
-            try:
-                val = float(recipe_data[field])
-                if val < 0:
-                     errors[field] = f"{field.replace('_', ' ').title()} cannot be negative."
-            except (ValueError, TypeError):
-                errors[field] = f"{field.replace('_', ' ').title()} must be a valid number if provided."
-
+    # --- Validation and normalization (fields are optional for update, see app/validation.py) ---
+    recipe_data, errors = validation.validate_recipe_update(recipe_data)
     if errors:
         return jsonify({"message": "Validation failed within 'recipeData'", "errors": errors}), 400
     # --- End Validation ---
@@ -359,23 +350,32 @@ def delete_recipe(id):
 
 @bp.route('/<int:id>/image', methods=['GET'])
 def get_recipe_image(id):
-    """Get the primary image for a recipe."""
-    try:
-        # Check recipe existence first
-        recipe = db_recipe.get_recipe_by_id(id)
-        if recipe is None:
-             return jsonify({"message": f"Recipe with id {id} not found."}), 404
+    """
+    Get the primary image for a recipe.
+    Optional 'size' query parameter (thumb, card, full) serves a resized derivative,
+    as WebP if the browser accepts it and JPEG otherwise. The original is served
+    while the derivatives are still being generated.
+    """
+    size = request.args.get('size')
+    if size is not None and size not in image_derivatives.DERIVATIVE_SIZES:
+        return jsonify({"message": f"Invalid 'size' parameter. Allowed sizes: {', '.join(image_derivatives.DERIVATIVE_SIZES)}."}), 400
 
-        image_data = db_recipe.get_recipe_primary_image_data(id)
-        if image_data is None:
+    try:
+        image = db_recipe.get_recipe_primary_image(id)
+        if image is None:
+             # Only look at the recipe to tell the two 404 cases apart
+             if db_recipe.get_recipe_by_id(id) is None:
+                 return jsonify({"message": f"Recipe with id {id} not found."}), 404
              # Use jsonify for consistency, even though it's a 404
              return jsonify({"message": f"No primary image found for recipe with id {id}."}), 404
 
-        # Return the image data as a binary response
-        # Assuming JPEG format, adjust if needed
-        # Determine content type based on stored data if possible, or default
-        # For simplicity, assuming JPEG for now. A better approach might store mime type.
-        return image_data, 200, {'Content-Type': 'image/jpeg'}
+        if image['storage_path']:
+            if size is None:
+                return send_stored_image(image)
+            return send_image_derivative(image, size)
+
+        # Legacy row whose bytes are still stored inline (before `flask migrate-images-to-store`)
+        return send_legacy_image(image)
     except Exception as e:
         current_app.logger.error(f"Exception fetching image for recipe {id}: {e}", exc_info=True) # Use logger
         error_message = str(e) # Or generic message
@@ -385,6 +385,88 @@ def get_recipe_image(id):
         abort(500, description=f"Internal server error fetching image: {error_message}")
 
 
+def send_image_derivative(image, size):
+    """Sends the requested derivative size of a stored image, falling back to the original."""
+    # Only an explicit image/webp counts: */* and image/* are also sent by browsers without WebP support
+    accepts_webp = any(value == 'image/webp' and quality > 0 for value, quality in request.accept_mimetypes)
+    mime_type = 'image/webp' if accepts_webp else 'image/jpeg'
+    derivative_path = image_derivatives.find_derivative(image['content_hash'], size, mime_type)
+    if derivative_path is None:
+        # Not generated (yet): serve the original, but don't let it be cached as the derivative
+        response = send_stored_image(image, versioned=False)
+    else:
+        extension = image_derivatives.DERIVATIVE_FORMATS[mime_type][0]
+        response = send_stored_image(dict(image, storage_path=derivative_path, mime_type=mime_type),
+                                     etag=f"{image['content_hash']}-{size}-{extension}")
+    response.vary.add('Accept')
+    return response
+
+
+def send_stored_image(image, versioned=True, etag=None):
+    """
+    Sends an image from the file store without reading it into Python memory.
+    With IMAGE_ACCEL_REDIRECT_PREFIX configured, nginx serves the file itself (X-Accel-Redirect);
+    otherwise send_file hands the open file to the WSGI server (sendfile under gunicorn).
+    The ETag is the content hash (or `etag` for derivatives), so a matching If-None-Match
+    is answered with 304 without touching the file.
+    versioned=False disables the long-lived caching of ?v= URLs (used for fallbacks).
+    """
+    etag = etag or image['content_hash']
+    # Versioned URLs (?v=<content hash>, as handed out in menu responses) never change content
+    if versioned and request.args.get('v') and request.args.get('v') == image['content_hash']:
+        cache_control = IMMUTABLE
+    else:
+        cache_control = REVALIDATE
+    if is_not_modified(etag):
+        return not_modified_response(etag, cache_control=cache_control)
+
+    accel_prefix = current_app.config.get('IMAGE_ACCEL_REDIRECT_PREFIX')
+    if accel_prefix:
+        response = current_app.response_class(status=200, mimetype=image['mime_type'])
+        response.headers['X-Accel-Redirect'] = accel_prefix.rstrip('/') + '/' + image['storage_path'].replace(os.sep, '/')
+        set_validators(response, etag, cache_control=cache_control)
+    else:
+        file_path = image_store.absolute_path(image['storage_path'])
+        if not os.path.exists(file_path):
+            current_app.logger.error(f"Image file missing from store: {file_path} (image {image['id']})")
+            response = jsonify({"message": f"No primary image found for recipe with id {image['recipe_id']}."})
+            response.status_code = 404
+            return response
+        # conditional=True also answers If-Modified-Since from the file's mtime
+        response = send_file(file_path, mimetype=image['mime_type'], conditional=True, etag=etag)
+        response.headers['Cache-Control'] = cache_control
+    return response
+
+
+def send_legacy_image(image):
+    """
+    Streams an image still stored as a BLOB with incremental BLOB I/O (image_blob.BlobReader):
+    the response reads READ_CHUNK_SIZE bytes at a time, and a Range request only reads its slice
+    (206 Partial Content). The bytes of a row never change (a new upload is a new row), so the
+    ETag is derived from the row id instead of hashing the whole BLOB.
+    """
+    etag = f"blob-{image['id']}"
+    if is_not_modified(etag):
+        return not_modified_response(etag)
+
+    reader = image_blob.open_image_blob(current_app.config['DATABASE'], image['id'])
+    if reader is None:
+        return jsonify({"message": f"No primary image found for recipe with id {image['recipe_id']}."}), 404
+    # Legacy rows have no stored mime type yet: sniff it from the first bytes
+    mime_type = image['mime_type'] or image_store.sniff_mime_type(reader.read(image_store.SNIFF_BYTES)) or 'application/octet-stream'
+    reader.seek(0)
+
+    # direct_passthrough: the WSGI server pulls chunks from the reader, which closes its BLOB and connection at the end
+    response = current_app.response_class(
+        wrap_file(request.environ, reader, buffer_size=image_blob.READ_CHUNK_SIZE),
+        mimetype=mime_type,
+        direct_passthrough=True
+    )
+    response.content_length = reader.length
+    set_validators(response, etag)
+    return response.make_conditional(request, accept_ranges=True, complete_length=reader.length)
+
+
 # --- Image Upload Route ---
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
 
@@ -411,29 +493,35 @@ def upload_recipe_image(id):
         return jsonify({"message": "No selected file."}), 400
 
     if file and allowed_file(file.filename):
-        # Read image data into memory as bytes
-        image_data = file.read()
+        # Only peek at the first bytes: the upload (already spooled to a temporary file by the
+        # multipart parser) is streamed into the image store in chunks by add_recipe_image
+        head = file.stream.read(image_store.SNIFF_BYTES)
+        file.stream.seek(0)
 
-        # Basic validation: Check if image_data is not empty
-        if not image_data:
+        # Basic validation: Check if the upload is not empty
+        if not head:
              return jsonify({"message": "Uploaded file is empty."}), 400
 
-        # Optional: Add size validation
-        # max_size = 5 * 1024 * 1024 # 5MB limit
-        # if len(image_data) > max_size:
-        #     return jsonify({"message": f"Image file size exceeds the limit ({max_size // 1024 // 1024}MB)."}), 400
+        # The stored mime type comes from the content, not from the file name
+        if image_store.sniff_mime_type(head) is None:
+             return jsonify({"message": "Uploaded file content is not a supported image type."}), 400
 
         try:
             # Call the model function to save the image data (BLOB)
             # Assuming add_recipe_image handles setting as primary or replacing existing
             # Get the database connection to manage the transaction
             db = db_recipe.get_db()
-            image_id = db_recipe.add_recipe_image(id, image_data, alt_text=file.filename, is_primary=True)
+            image_id = db_recipe.add_recipe_image(id, file.stream, alt_text=file.filename, is_primary=True)
 
             if image_id:
                  # Commit the transaction since add_recipe_image was successful
-                 db.commit()
+                 db_recipe.commit_recipe_image(id)
                  current_app.logger.info(f"Transaction committed for image upload (recipe {id}, image {image_id}).")
+                 # Resizing runs in the background process pool; the upload response does not wait for it
+                 try:
+                     db_recipe.generate_image_derivatives(image_id)
+                 except Exception as e:
+                     current_app.logger.error(f"Could not queue image derivatives for image {image_id}: {e}", exc_info=True)
                  # Optionally, update the recipe's main image_url field if it exists and is used
                  # db_recipe.update_recipe(id, {'image_url': f'/api/recipes/{id}/image'}) # Example if using URL
 
@@ -447,6 +535,10 @@ def upload_recipe_image(id):
                 current_app.logger.error(f"Failed to save image for recipe {id}: db_recipe.add_recipe_image returned no ID. Transaction rolled back.")
                 return jsonify({"message": "Failed to save image to database due to an unknown issue."}), 500
 
+        except image_store.ImageTooLargeError as e:
+            # Raised while copying into the store, before the database was touched
+            return jsonify({"message": f"Image file size exceeds the limit ({e.max_bytes // 1024 // 1024}MB)."}), 413
+
         except Exception as e:
             # Rollback the transaction on any exception during image saving
             db = db_recipe.get_db() # Ensure db is available for rollback
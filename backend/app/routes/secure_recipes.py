@@ -1,7 +1,7 @@
 # backend/app/routes/secure_recipes.py
 # Secure routes for recipe management (create, update, delete)
 
-from flask import Blueprint, jsonify, request, abort, current_app
+from flask import Blueprint, jsonify, request, abort, current_app, Response, stream_with_context
 from werkzeug.utils import secure_filename
 import json
 import sqlite3
@@ -11,6 +11,9 @@ from ..middleware import local_only, token_required, secure_api_required, genera
 
 # Import recipe model
 from ..models import recipe as db_recipe
+from ..models import image_store
+from ..models import recipe_transfer
+from .. import validation
 
 # Create blueprint with /api/secure prefix
 bp = Blueprint('secure_recipes', __name__, url_prefix='/api/secure')
@@ -77,58 +80,8 @@ def create_recipe():
 
     recipe_data = request_body['recipeData']
 
-    # --- Detailed Validation (applied to recipe_data regardless of source) ---
-    errors = {}
-    # Required fields check
-    required_fields = ['name', 'ingredients', 'instructions']
-    for field in required_fields:
-        if field not in recipe_data:
-             errors[field] = f"Missing required field: {field}"
-        elif field in ['ingredients', 'instructions'] and (not isinstance(recipe_data[field], list) or not recipe_data[field]):
-             errors[field] = f"Required field '{field}' must be a non-empty list."
-        elif field not in ['ingredients', 'instructions'] and not recipe_data[field]: # For non-list fields like name
-             errors[field] = f"Required field '{field}' cannot be empty."
-
-    # Ingredients validation (only if field exists and basic check passed)
-    if 'ingredients' not in errors and 'ingredients' in recipe_data:
-        ingredient_errors = []
-        for index, ingredient in enumerate(recipe_data['ingredients']):
-            ing_errors = {}
-            if not isinstance(ingredient, dict):
-                ing_errors['general'] = f"Ingredient at index {index} must be an object."
-            else:
-                # Name is required for an ingredient
-                if 'name' not in ingredient or not ingredient['name']:
-                    ing_errors['name'] = f"Ingredient {index+1}: Name is required and cannot be empty."
-                # Quantity is optional
-            if ing_errors:
-                ingredient_errors.append({"index": index, "errors": ing_errors})
-        if ingredient_errors:
-             errors['ingredients'] = ingredient_errors
-
-    # Instructions validation (only if field exists and basic check passed)
-    if 'instructions' not in errors and 'instructions' in recipe_data:
-        instruction_errors = []
-        for index, instruction in enumerate(recipe_data['instructions']):
-            if not isinstance(instruction, str) or not instruction.strip():
-                instruction_errors.append({"index": index, "error": "Instruction must be a non-empty string."})
-        if instruction_errors:
-             errors['instructions'] = instruction_errors
-
-    # Optional fields validation (numeric checks if present and not None)
-    numeric_fields = ['prep_time_minutes', 'cook_time_minutes', 'servings']
-    for field in numeric_fields:
-        # Check within recipe_data
-        # Use .get() to avoid KeyError if field is missing (e.g., in JSON request)
-        field_value = recipe_data.get(field)
-        if field_value is not None: # Check for None explicitly, 0 is valid
-            try:
-                # Allow integers or floats
-                val = int(field_value) if str(field_value).isdigit() else float(field_value)
-                if val < 0:
-                     errors[field] = f"{field.replace('_', ' ').title()} cannot be negative."
-            except (ValueError, TypeError):
-                errors[field] = f"{field.replace('_', ' ').title()} must be a valid number if provided."
+    # --- Validation and normalization (same rules as the bulk import, see app/validation.py) ---
+    recipe_data, errors = validation.validate_new_recipe(recipe_data)
 
     if errors:
         # Return structured validation errors
@@ -183,56 +136,8 @@ def update_recipe(id):
     if existing_recipe is None:
         return jsonify({"message": f"Recipe with id {id} not found."}), 404
 
-    # --- Detailed Validation on recipe_data (fields are optional for update) ---
-    errors = {}
-    # Validate fields only if they are present in the recipe_data
-    if 'name' in recipe_data and not recipe_data['name']: # Name cannot be updated to empty
-        errors['name'] = "Name cannot be empty."
-
-    if 'ingredients' in recipe_data: # If ingredients are being updated
-        if not isinstance(recipe_data['ingredients'], list):
-             errors['ingredients'] = "Ingredients must be a list."
-        elif not recipe_data['ingredients']: # Allow updating to empty list? Or require at least one?
-             errors.setdefault('ingredients', []).append("Ingredients list cannot be empty if provided for update.")
-        else:
-            ingredient_errors = []
-            for index, ingredient in enumerate(recipe_data['ingredients']):
-                ing_errors = {}
-                if not isinstance(ingredient, dict):
-                    ing_errors['general'] = f"Ingredient at index {index} must be an object."
-                else:
-                    if 'name' not in ingredient or not ingredient['name']:
-                        ing_errors['name'] = f"Ingredient {index+1}: Name is required and cannot be empty."
-                    # Quantity is optional
-                if ing_errors:
-                    ingredient_errors.append({"index": index, "errors": ing_errors})
-            if ingredient_errors:
-                 errors['ingredients'] = ingredient_errors
-
-    if 'instructions' in recipe_data: # If instructions are being updated
-         if not isinstance(recipe_data['instructions'], list):
-             errors['instructions'] = "Instructions must be a list of strings."
-         elif not recipe_data['instructions']: # Allow updating to empty list?
-             errors.setdefault('instructions', []).append("Instructions list cannot be empty if provided for update.")
-         else:
-            instruction_errors = []
-            for index, instruction in enumerate(recipe_data['instructions']):
-                if not isinstance(instruction, str) or not instruction.strip():
-                    instruction_errors.append({"index": index, "error": "Instruction must be a non-empty string."})
-            if instruction_errors:
-                 errors['instructions'] = instruction_errors
-
-    # Optional fields validation (numeric checks if present and not None)
-    numeric_fields = ['prep_time_minutes', 'cook_time_minutes', 'servings']
-    for field in numeric_fields:
-        if field in recipe_data and recipe_data[field] is not None:
-            try:
-                val = float(recipe_data[field])
-                if val < 0:
-                     errors[field] = f"{field.replace('_', ' ').title()} cannot be negative."
-            except (ValueError, TypeError):
-                errors[field] = f"{field.replace('_', ' ').title()} must be a valid number if provided."
-
+    # --- Validation and normalization (fields are optional for update, see app/validation.py) ---
+    recipe_data, errors = validation.validate_recipe_update(recipe_data)
     if errors:
         return jsonify({"message": "Validation failed within 'recipeData'", "errors": errors}), 400
     # --- End Validation ---
@@ -290,6 +195,55 @@ def delete_recipe(id):
         error_message = str(e)
         return jsonify({"message": f"Internal server error deleting recipe {id}.", "error": error_message}), 500
 
+# --- Bulk Import / Export (NDJSON) ---
+
+# Accepted request content types for the import (one JSON recipe per line)
+IMPORT_CONTENT_TYPES = {'application/x-ndjson', 'application/jsonl', 'application/json-seq'}
+
+@bp.route('/recipes/import', methods=['POST'])
+@secure_api_required  # Requires both local machine and valid token
+def import_recipes():
+    """
+    Import recipes from an NDJSON body (secure endpoint).
+    The body is read line by line from the request stream; each line is validated like
+    POST /recipes, valid lines are inserted in batches and invalid ones are reported by line number.
+    """
+    if request.mimetype not in IMPORT_CONTENT_TYPES:
+        return jsonify({"message": "Request must be application/x-ndjson (one JSON recipe per line)."}), 415
+    # The body is streamed, so a catalogue may be larger than the MAX_CONTENT_LENGTH meant for uploads
+    request.max_content_length = current_app.config['RECIPE_IMPORT_MAX_BYTES']
+
+    try:
+        report = recipe_transfer.import_recipes(request.stream)
+    except sqlite3.Error as e:
+        # Batches committed before the error stay imported
+        current_app.logger.error(f"Database error during recipe import: {e}", exc_info=True)
+        return jsonify({"message": "Internal server error importing recipes.", "error": str(e)}), 500
+
+    return jsonify({
+        "message": f"Imported {report['imported']} recipes, {report['failed']} lines failed validation.",
+        "data": report
+    })
+
+@bp.route('/recipes/export', methods=['GET'])
+@secure_api_required  # Requires both local machine and valid token
+def export_recipes():
+    """
+    Export all recipes (secure endpoint), streamed batch by batch.
+    ?format=ndjson (default, can be fed back to /recipes/import) or ?format=json (one array).
+    """
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in recipe_transfer.EXPORT_FORMATS:
+        return jsonify({"message": f"Invalid format. Allowed formats: {', '.join(recipe_transfer.EXPORT_FORMATS)}."}), 400
+
+    # stream_with_context keeps the app context (and its database connection) for the generator
+    response = Response(
+        stream_with_context(recipe_transfer.export_recipes(export_format)),
+        mimetype=recipe_transfer.EXPORT_FORMATS[export_format]
+    )
+    response.headers['Content-Disposition'] = f'attachment; filename="recipes.{export_format}"'
+    return response
+
 # --- Image Upload for Secure Endpoints ---
 
 # Define allowed file extensions
@@ -317,23 +271,34 @@ def upload_recipe_image(id):
         return jsonify({"message": "No selected file."}), 400
 
     if file and allowed_file(file.filename):
-        # Read image data into memory as bytes
-        image_data = file.read()
+        # Only peek at the first bytes: the upload (already spooled to a temporary file by the
+        # multipart parser) is streamed into the image store in chunks by add_recipe_image
+        head = file.stream.read(image_store.SNIFF_BYTES)
+        file.stream.seek(0)
 
-        # Basic validation: Check if image_data is not empty
-        if not image_data:
+        # Basic validation: Check if the upload is not empty
+        if not head:
              return jsonify({"message": "Uploaded file is empty."}), 400
 
+        # The stored mime type comes from the content, not from the file name
+        if image_store.sniff_mime_type(head) is None:
+             return jsonify({"message": "Uploaded file content is not a supported image type."}), 400
+
         try:
             # Call the model function to save the image data (BLOB)
             # Get the database connection to manage the transaction
             db = db_recipe.get_db()
-            image_id = db_recipe.add_recipe_image(id, image_data, alt_text=file.filename, is_primary=True)
+            image_id = db_recipe.add_recipe_image(id, file.stream, alt_text=file.filename, is_primary=True)
 
             if image_id:
                  # Commit the transaction since add_recipe_image was successful
-                 db.commit()
+                 db_recipe.commit_recipe_image(id)
                  current_app.logger.info(f"Transaction committed for image upload (recipe {id}, image {image_id}).")
+                 # Resizing runs in the background process pool; the upload response does not wait for it
+                 try:
+                     db_recipe.generate_image_derivatives(image_id)
+                 except Exception as e:
+                     current_app.logger.error(f"Could not queue image derivatives for image {image_id}: {e}", exc_info=True)
 
                  return jsonify({
                      "message": "Image uploaded successfully",
@@ -345,6 +310,10 @@ def upload_recipe_image(id):
                 current_app.logger.error(f"Failed to save image for recipe {id}: db_recipe.add_recipe_image returned no ID. Transaction rolled back.")
                 return jsonify({"message": "Failed to save image to database due to an unknown issue."}), 500
 
+        except image_store.ImageTooLargeError as e:
+            # Raised while copying into the store, before the database was touched
+            return jsonify({"message": f"Image file size exceeds the limit ({e.max_bytes // 1024 // 1024}MB)."}), 413
+
         except Exception as e:
             # Rollback the transaction on any exception during image saving
             db = db_recipe.get_db() # Ensure db is available for rollback
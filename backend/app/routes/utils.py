@@ -1,8 +1,12 @@
 # backend/app/routes/utils.py
 # Utility routes
 
-from flask import Blueprint, current_app, send_file, abort
+from flask import Blueprint, current_app, send_file, abort, jsonify
 import os
+from ..models import response_cache
+from ..models import db_pool
+from ..models import recipe_query
+from ..models.recipe import get_db, get_read_db
 
 bp = Blueprint('utils', __name__, url_prefix='/api')
 
@@ -15,7 +19,49 @@ def download_database():
         # Construct the path to the database file relative to the current file's location
         # This assumes the instance folder is at backend/instance relative to the project root
         database_path = os.path.join(os.path.dirname(__file__), '..', '..', 'instance', 'database.db')
+        # In WAL mode recent commits may still live in database.db-wal; fold them into the file first
+        get_db().execute("PRAGMA wal_checkpoint(TRUNCATE)")
         return send_file(database_path, as_attachment=True)
     except Exception as e:
         current_app.logger.error(f"Error downloading database: {e}", exc_info=True)
         abort(500, description="Internal server error downloading database.")
+
+
+@bp.route('/cache-stats', methods=['GET'])
+def get_cache_stats():
+    """
+    Hit/miss counters and size of the shared response cache (summed over all workers).
+    """
+    try:
+        return jsonify({"data": response_cache.get_stats()})
+    except Exception as e:
+        current_app.logger.error(f"Error reading response cache stats: {e}", exc_info=True)
+        abort(500, description="Internal server error reading cache statistics.")
+
+
+@bp.route('/db-pool-stats', methods=['GET'])
+def get_db_pool_stats():
+    """
+    Connection pool counters of the worker that handles the request, plus the
+    PRAGMA values actually in effect on its read-write and read-only connections.
+    """
+    try:
+        db = get_db()
+        pragmas = {
+            name: db.execute(f"PRAGMA {name}").fetchone()[0]
+            for name in (current_app.config.get('SQLITE_PRAGMAS') or {})
+        }
+        read_db = get_read_db()
+        read_pragmas = {
+            name: read_db.execute(f"PRAGMA {name}").fetchone()[0]
+            for name in list(current_app.config.get('SQLITE_PRAGMAS') or {}) + ['query_only']
+        }
+        return jsonify({"data": dict(
+            db_pool.get_stats(),
+            pragmas=pragmas,
+            read_pragmas=read_pragmas,
+            compiled_queries=recipe_query.cache_info() # Recipe list statements compiled per filter shape
+        )})
+    except Exception as e:
+        current_app.logger.error(f"Error reading connection pool stats: {e}", exc_info=True)
+        abort(500, description="Internal server error reading connection pool statistics.")
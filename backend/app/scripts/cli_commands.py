@@ -6,7 +6,18 @@ import click
 from flask import current_app
 from flask.cli import with_appcontext
 # Import database functions from the models module
-from ..models.recipe import get_db, close_db, init_db
+from ..models.recipe import get_db, close_db, init_db, add_recipe_image, commit_recipe_image, init_data_versions, begin_write
+from ..models.daily_menu import menu_content_hash
+from ..models.image_store import save_image
+from ..models import image_derivatives
+from ..models.search import rebuild_search_index
+from ..models.recipe_index import rebuild_recipe_index
+from ..models import response_cache
+from ..models.recipe_indexes import ensure_recipe_indexes
+from ..models import recipe_transfer
+from ..models.menu_repository import find_content_menu
+from .index_benchmark import run_index_benchmark
+from .validation_benchmark import run_validation_benchmark
 
 # Define the path to the image file relative to the project root (backend folder)
 # Go up two levels from scripts to backend, then down to data/seed_images
@@ -48,7 +59,7 @@ def seed_recipe_images():
         return
 
     # 3. Insert image data for each recipe
-    inserted_count = 0
+    inserted_ids = []
     skipped_count = 0
     for recipe_id in recipe_ids:
         try:
@@ -60,17 +71,10 @@ def seed_recipe_images():
                 skipped_count += 1
                 continue
 
-            # Insert the image data
+            # Insert the image (the file is content-addressed, so all recipes share one copy)
             alt_text = f"Image for recipe {recipe_id}" # Basic alt text
-            is_primary = 1 # Assume this is the primary image
-            db.execute(
-                """
-                INSERT INTO recipe_images (recipe_id, image_data, alt_text, is_primary)
-                VALUES (?, ?, ?, ?)
-                """,
-                (recipe_id, image_data, alt_text, is_primary)
-            )
-            inserted_count += 1
+            add_recipe_image(recipe_id, image_data, alt_text=alt_text, is_primary=True)
+            inserted_ids.append(recipe_id)
         except sqlite3.IntegrityError as e:
              print(f"Integrity error inserting image for recipe_id {recipe_id}: {e}. Skipping.")
              skipped_count += 1
@@ -79,10 +83,10 @@ def seed_recipe_images():
             skipped_count += 1 # Count as skipped if error occurs
 
     # 4. Commit changes
-    if inserted_count > 0:
+    if inserted_ids:
         try:
-            db.commit()
-            print(f"Successfully inserted {inserted_count} images.")
+            commit_recipe_image(*inserted_ids)
+            print(f"Successfully inserted {len(inserted_ids)} images.")
         except Exception as e:
             print(f"Error committing changes: {e}")
             # Consider rolling back if needed, though individual errors were skipped
@@ -97,6 +101,149 @@ def seed_recipe_images():
     close_db()
 
 
+def migrate_images_to_store():
+    """
+    Moves image BLOBs out of recipe_images into the content-addressed image store.
+    Upgrades the table to the metadata schema first if needed, then VACUUMs so the
+    database file shrinks back to metadata size. Safe to run repeatedly.
+    """
+    db = get_db()
+    db_path = current_app.config['DATABASE']
+    size_before = os.path.getsize(db_path) if os.path.exists(db_path) else 0
+
+    columns = {row['name'] for row in db.execute("PRAGMA table_info(recipe_images)")}
+    if not columns:
+        print("No recipe_images table found. Run `flask init-db` first.")
+        return
+    if 'content_hash' not in columns:
+        # image_data was declared NOT NULL, which cannot be altered in place: rebuild the table
+        print("Upgrading recipe_images table to the metadata schema...")
+        with current_app.open_resource('../data/schema_images.sql') as f:
+            images_schema = f.read().decode('utf8')
+        db.executescript(
+            "BEGIN;"
+            "DROP INDEX IF EXISTS idx_recipe_images_recipe_id;"
+            "ALTER TABLE recipe_images RENAME TO recipe_images_legacy;"
+            + images_schema +
+            "INSERT INTO recipe_images (id, recipe_id, image_data, alt_text, is_primary, uploaded_at)"
+            "  SELECT id, recipe_id, image_data, alt_text, is_primary, uploaded_at FROM recipe_images_legacy;"
+            "DROP TABLE recipe_images_legacy;"
+            "COMMIT;"
+        )
+
+    image_ids = [row['id'] for row in db.execute("SELECT id FROM recipe_images WHERE image_data IS NOT NULL")]
+    print(f"Found {len(image_ids)} images stored in the database.")
+    moved_count = 0
+    skipped_count = 0
+    for image_id in image_ids:
+        # Load one BLOB at a time to keep memory bounded
+        image_data = db.execute("SELECT image_data FROM recipe_images WHERE id = ?", (image_id,)).fetchone()['image_data']
+        try:
+            image_meta = save_image(bytes(image_data))
+        except ValueError:
+            print(f"Image {image_id} is not a recognized image format. Leaving it in the database.")
+            skipped_count += 1
+            continue
+        db.execute(
+            """
+            UPDATE recipe_images
+            SET content_hash = ?, mime_type = ?, byte_size = ?, width = ?, height = ?, storage_path = ?, image_data = NULL
+            WHERE id = ?
+            """,
+            (image_meta['content_hash'], image_meta['mime_type'], image_meta['byte_size'],
+             image_meta['width'], image_meta['height'], image_meta['storage_path'], image_id)
+        )
+        moved_count += 1
+        if moved_count % 100 == 0:
+            db.commit()
+    db.commit()
+    print(f"Moved {moved_count} images to {current_app.config['IMAGE_STORE_PATH']}.")
+    if skipped_count > 0:
+        print(f"Skipped {skipped_count} images with unrecognized content.")
+
+    # Give the freed BLOB pages back to the file system
+    db.execute("VACUUM")
+    size_after = os.path.getsize(db_path) if os.path.exists(db_path) else 0
+    print(f"Database size: {size_before // 1024} KB -> {size_after // 1024} KB.")
+
+
+def migrate_menu_versions():
+    """
+    Upgrades daily_menus to copy-on-write contents: adds the content_hash / content_menu_id
+    columns if needed, hashes every version saved before them, and makes versions with the
+    same dishes share the rows of the first one (their own copies are deleted).
+    Safe to run repeatedly; only versions without a content hash are processed.
+    """
+    db = get_db()
+    columns = {row['name'] for row in db.execute("PRAGMA table_info(daily_menus)")}
+    if not columns:
+        print("No daily_menus table found. Run `flask init-db` first.")
+        return
+    if 'content_hash' not in columns:
+        print("Adding content columns to the daily_menus table...")
+        db.execute("ALTER TABLE daily_menus ADD COLUMN content_hash TEXT")
+        db.execute("ALTER TABLE daily_menus ADD COLUMN content_menu_id INTEGER REFERENCES daily_menus (id)")
+        db.commit()
+    # Creates the content hash index (everything else in the schema already exists)
+    with current_app.open_resource('../data/schema_daily_menus.sql') as f:
+        db.executescript(f.read().decode('utf8'))
+
+    begin_write(db)
+    # Versions sharing another's rows keep sharing them (their hash is only cleared by a recipe delete)
+    menu_ids = [row['id'] for row in db.execute("SELECT id FROM daily_menus WHERE content_hash IS NULL AND content_menu_id IS NULL ORDER BY id")]
+    print(f"Found {len(menu_ids)} menu versions without a content hash.")
+    shared_count = 0
+    freed_rows = 0
+    for menu_id in menu_ids:
+        dishes = [
+            (row['recipe_id'], row['meal_type'])
+            for row in db.execute("SELECT recipe_id, meal_type FROM daily_menu_recipes WHERE daily_menu_id = ? ORDER BY id", (menu_id,))
+        ]
+        content_hash = menu_content_hash(dishes)
+        content_menu_id = find_content_menu(db, content_hash)
+        if content_menu_id is not None:
+            freed_rows += db.execute("DELETE FROM daily_menu_recipes WHERE daily_menu_id = ?", (menu_id,)).rowcount
+            shared_count += 1
+        db.execute(
+            "UPDATE daily_menus SET content_hash = ?, content_menu_id = ? WHERE id = ?",
+            (content_hash, content_menu_id, menu_id)
+        )
+    db.commit()
+    # Cached menu responses predate the new version fields
+    response_cache.clear()
+    print(f"{shared_count} of {len(menu_ids)} versions now share an identical version's dishes ({freed_rows} rows removed).")
+
+
+def generate_missing_image_derivatives():
+    """
+    Generates the thumb/card/full derivatives for every stored image that is missing some.
+    Runs synchronously (one image at a time) instead of through the upload process pool.
+    """
+    if not image_derivatives.is_available():
+        print("Pillow is not installed. Install it (pip install Pillow) to generate image derivatives.")
+        return
+    db = get_db()
+    store_path = current_app.config['IMAGE_STORE_PATH']
+    # Identical uploads share one stored file, so each content hash is processed once
+    rows = db.execute(
+        "SELECT content_hash, MIN(storage_path) AS storage_path FROM recipe_images "
+        "WHERE storage_path IS NOT NULL GROUP BY content_hash"
+    ).fetchall()
+    generated_count = 0
+    failed_count = 0
+    for row in rows:
+        try:
+            written = image_derivatives.render_derivatives(store_path, row['storage_path'], row['content_hash'])
+            if written:
+                generated_count += 1
+        except Exception as e:
+            print(f"Error generating derivatives for {row['storage_path']}: {e}")
+            failed_count += 1
+    print(f"Generated derivatives for {generated_count} of {len(rows)} stored images.")
+    if failed_count > 0:
+        print(f"Failed to generate derivatives for {failed_count} images.")
+
+
 def seed_recipes():
     """Seeds the recipes table from seed_data.sql."""
     db = get_db()
@@ -108,6 +255,11 @@ def seed_recipes():
             seed_sql = f.read()
             db.executescript(seed_sql)
         print(f"Executed seed_data.sql successfully from {seed_data_path}.")
+        # seed_data.sql inserts straight into recipes, so derive the lookup tables afterwards
+        rebuild_recipe_index(db)
+        print("Rebuilt the recipe lookup tables for the seeded recipes.")
+        # The seed script writes around the model functions, so their cache invalidation never ran
+        response_cache.clear()
     except FileNotFoundError:
         print(f"Error: Could not find seed_data.sql at {seed_data_path}. Make sure it's in the backend/data directory.")
     except Exception as e:
@@ -140,3 +292,179 @@ def seed_images_command():
     print("Starting image seeding process...")
     seed_recipe_images()
     print("Image seeding process finished.")
+
+
+@click.command('migrate-images-to-store')
+@with_appcontext
+def migrate_images_to_store_command():
+    """Moves image BLOBs from the database into the image file store."""
+    print("Starting image migration...")
+    try:
+        migrate_images_to_store()
+    except sqlite3.Error as e:
+        print(f"Error migrating images: {e}")
+    print("Image migration finished.")
+
+
+@click.command('migrate-menu-versions')
+@with_appcontext
+def migrate_menu_versions_command():
+    """Hashes menu versions and lets identical versions share their stored dishes."""
+    print("Starting menu version migration...")
+    try:
+        migrate_menu_versions()
+    except sqlite3.Error as e:
+        print(f"Error migrating menu versions: {e}")
+    print("Menu version migration finished.")
+
+
+@click.command('generate-image-derivatives')
+@with_appcontext
+def generate_image_derivatives_command():
+    """Generates missing thumb/card/full derivatives for all stored images."""
+    print("Starting image derivative generation...")
+    generate_missing_image_derivatives()
+    print("Image derivative generation finished.")
+
+
+@click.command('init-data-versions')
+@with_appcontext
+def init_data_versions_command():
+    """Creates or refreshes the data version counters used for HTTP caching (ETags)."""
+    print("Starting data version setup...")
+    try:
+        init_data_versions(get_db())
+        print("Data version counters are up to date; previously issued ETags are invalidated.")
+    except FileNotFoundError:
+        print("Error: Could not find schema_data_versions.sql. Make sure it's in the backend/data directory.")
+    except sqlite3.Error as e:
+        print(f"Error setting up data versions: {e}")
+    print("Data version setup finished.")
+
+
+@click.command('clear-response-cache')
+@with_appcontext
+def clear_response_cache_command():
+    """Drops all entries from the shared response cache."""
+    if not response_cache.is_enabled():
+        print("The response cache is disabled (RESPONSE_CACHE_PATH is empty).")
+        return
+    try:
+        cleared_count = response_cache.clear()
+        print(f"Cleared {cleared_count} cached responses.")
+    except sqlite3.Error as e:
+        print(f"Error clearing response cache: {e}")
+
+
+@click.command('ensure-indexes')
+@with_appcontext
+def ensure_indexes_command():
+    """Creates, updates or drops recipes indexes to match the managed set, then runs ANALYZE."""
+    print("Starting recipe index check...")
+    try:
+        changes = ensure_recipe_indexes(get_db())
+        for action in ('created', 'rebuilt', 'dropped'):
+            for name in changes[action]:
+                print(f"  {action}: {name}")
+        if not any(changes.values()):
+            print("All recipe indexes are up to date.")
+        print("Refreshed the query planner statistics (ANALYZE).")
+    except sqlite3.Error as e:
+        print(f"Error updating recipe indexes: {e}")
+    print("Recipe index check finished.")
+
+
+@click.command('benchmark-recipe-indexes')
+@click.option('--recipes', 'recipe_count', default=50000, show_default=True, help='Number of generated recipes.')
+@click.option('--repeat', default=5, show_default=True, help='Runs per query (the median is reported).')
+@with_appcontext
+def benchmark_recipe_indexes_command(recipe_count, repeat):
+    """Checks on a generated database that every recipe filter/sort path uses an index."""
+    print(f"Generating {recipe_count} recipes in a temporary database...")
+    results = run_index_benchmark(recipe_count, repeat=repeat)
+    failed_count = 0
+    for result in results:
+        status = "OK  " if result['ok'] else "FAIL"
+        failed_count += 0 if result['ok'] else 1
+        print(f"{status} {result['milliseconds']:8.2f} ms  {result['label']}")
+        for line in result['plan']:
+            print(f"              {line}")
+    print(f"{len(results) - failed_count} of {len(results)} query paths use an index.")
+    if failed_count:
+        raise SystemExit(1)
+
+
+@click.command('benchmark-validation')
+@click.option('--recipes', 'recipe_count', default=10000, show_default=True, help='Validations per run.')
+@click.option('--ingredients', 'ingredient_count', default=30, show_default=True, help='Ingredients per recipe.')
+@click.option('--instructions', 'instruction_count', default=20, show_default=True, help='Instruction steps per recipe.')
+@click.option('--repeat', default=5, show_default=True, help='Runs per case (the median is reported).')
+@with_appcontext
+def benchmark_validation_command(recipe_count, ingredient_count, instruction_count, repeat):
+    """Measures the per-recipe cost of the compiled recipe validators."""
+    print(f"Validating {recipe_count} recipes with {ingredient_count} ingredients and {instruction_count} steps each...")
+    results = run_validation_benchmark(recipe_count, ingredient_count, instruction_count, repeat)
+    for result in results:
+        print(f"{result['microseconds']:10.2f} us/recipe  {result['label']}")
+
+
+@click.command('import-recipes')
+@click.argument('source', type=click.File('r', encoding='utf-8'))
+@click.option('--batch-size', type=int, default=None, help='Recipes per transaction (default: RECIPE_IMPORT_BATCH_SIZE).')
+@with_appcontext
+def import_recipes_command(source, batch_size):
+    """Imports recipes from an NDJSON file (one JSON recipe per line, '-' for stdin)."""
+    print(f"Starting recipe import from {source.name}...")
+    try:
+        report = recipe_transfer.import_recipes(source, batch_size=batch_size)
+    except sqlite3.Error as e:
+        print(f"Error importing recipes: {e}. Batches committed before the error were kept.")
+        return
+    for failure in report['errors']:
+        print(f"  line {failure['line']}: {failure['errors']}")
+    if report['failed'] > len(report['errors']):
+        print(f"  ... and {report['failed'] - len(report['errors'])} more invalid lines.")
+    print(f"Imported {report['imported']} recipes; skipped {report['failed']} invalid lines.")
+    print("Recipe import finished.")
+
+
+@click.command('export-recipes')
+@click.argument('target', type=click.File('w', encoding='utf-8'), default='-')
+@click.option('--format', 'export_format', type=click.Choice(list(recipe_transfer.EXPORT_FORMATS)), default='ndjson', show_default=True)
+@with_appcontext
+def export_recipes_command(target, export_format):
+    """Writes all recipes to an NDJSON (or JSON) file, or to stdout by default."""
+    for chunk in recipe_transfer.export_recipes(export_format):
+        target.write(chunk)
+    # Progress goes to stderr, so `flask export-recipes > recipes.ndjson` stays clean
+    click.echo(f"Exported recipes to {target.name}.", err=True)
+
+
+@click.command('rebuild-search-index')
+@with_appcontext
+def rebuild_search_index_command():
+    """(Re)creates the full-text search index and indexes all recipes."""
+    print("Starting search index rebuild...")
+    try:
+        indexed_count = rebuild_search_index(get_db())
+        print(f"Indexed {indexed_count} recipes.")
+    except FileNotFoundError:
+        print("Error: Could not find schema_search.sql. Make sure it's in the backend/data directory.")
+    except sqlite3.Error as e:
+        print(f"Error rebuilding search index: {e}")
+    print("Search index rebuild finished.")
+
+
+@click.command('backfill-recipe-index')
+@with_appcontext
+def backfill_recipe_index_command():
+    """(Re)creates the recipe lookup tables (recipe_ingredients, recipe_tags) from the recipes table."""
+    print("Starting recipe lookup table backfill...")
+    try:
+        recipe_count = rebuild_recipe_index(get_db())
+        print(f"Backfilled lookup rows for {recipe_count} recipes.")
+    except FileNotFoundError:
+        print("Error: Could not find schema_recipe_index.sql. Make sure it's in the backend/data directory.")
+    except sqlite3.Error as e:
+        print(f"Error backfilling recipe lookup tables: {e}")
+    print("Recipe lookup table backfill finished.")
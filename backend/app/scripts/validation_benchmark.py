@@ -0,0 +1,59 @@
+# backend/app/scripts/validation_benchmark.py
+# Measures the per-recipe cost of the compiled recipe validators on large payloads
+import json
+import statistics
+import time
+
+from .. import validation
+from ..models import recipe_transfer
+
+
+def generate_payload(ingredient_count, instruction_count, invalid=False):
+    """A recipeData dict with the given list sizes; `invalid` breaks every list item and number."""
+    return {
+        "name": "Benchmark recipe",
+        "description": "Generated for the validation benchmark",
+        "ingredients": [
+            {"name": "" if invalid else f"Ingredient {index}", "quantity": f"{index} g"}
+            for index in range(ingredient_count)
+        ],
+        "instructions": ["" if invalid else f"Step {index}: stir for a while." for index in range(instruction_count)],
+        "tags": ["家常", "快手"],
+        "difficulty": "简单",
+        "cuisine": "川菜",
+        "prep_time_minutes": "-5" if invalid else "15",
+        "cook_time_minutes": 30,
+        "servings": 2,
+    }
+
+
+def time_per_recipe(function, payload, recipe_count, repeat):
+    """Median cost of one call in microseconds, over `repeat` runs of `recipe_count` calls."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(recipe_count):
+            function(payload)
+        timings.append((time.perf_counter() - start) * 1_000_000 / recipe_count)
+    return statistics.median(timings)
+
+
+def run_validation_benchmark(recipe_count=10000, ingredient_count=30, instruction_count=20, repeat=5):
+    """
+    Times the create/update validators and the full NDJSON line path (decode + validate)
+    on generated payloads. Needs an app context (the import decodes with app.json).
+    Returns a list of result dicts (label, microseconds).
+    """
+    valid = generate_payload(ingredient_count, instruction_count)
+    invalid = generate_payload(ingredient_count, instruction_count, invalid=True)
+    line = json.dumps(valid, ensure_ascii=False)
+    cases = [
+        ('create, valid', validation.validate_new_recipe, valid),
+        ('create, every item invalid', validation.validate_new_recipe, invalid),
+        ('update, valid', validation.validate_recipe_update, valid),
+        ('import line (decode + create)', recipe_transfer.parse_recipe_line, line),
+    ]
+    return [
+        {"label": label, "microseconds": time_per_recipe(function, payload, recipe_count, repeat)}
+        for label, function, payload in cases
+    ]
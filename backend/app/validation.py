@@ -0,0 +1,187 @@
+# backend/app/validation.py
+# Schema-driven validation of recipe data, shared by both recipe blueprints and the bulk import
+
+import math
+
+# Every field a recipe may carry, and how it is checked. Fields not listed here are dropped
+# from the validated data (they were ignored by the model functions anyway).
+RECIPE_SCHEMA = {
+    'name': 'text',
+    'description': 'any',
+    'ingredients': 'ingredients',
+    'instructions': 'instructions',
+    'image_url': 'any',
+    'tags': 'any',
+    'difficulty': 'any',
+    'cuisine': 'any',
+    'prep_time_minutes': 'number',
+    'cook_time_minutes': 'number',
+    'servings': 'number',
+}
+REQUIRED_FIELDS = ['name', 'ingredients', 'instructions']
+
+# Error messages of the list checks, as the create and update endpoints have always worded them
+CREATE_MESSAGES = {
+    'missing': "Missing required field: {field}",
+    'empty_text': "Required field '{field}' cannot be empty.",
+    'not_list': "Required field '{field}' must be a non-empty list.",
+    'empty_list': "Required field '{field}' must be a non-empty list.",
+}
+UPDATE_MESSAGES = {
+    'empty_text': "Name cannot be empty.",
+    'not_list': {'ingredients': "Ingredients must be a list.", 'instructions': "Instructions must be a list of strings."},
+    'empty_list': ["{title} list cannot be empty if provided for update."],
+}
+
+
+def _format(message, field):
+    """Fills a message template (str, per-field dict or list of str) for one field."""
+    if isinstance(message, dict):
+        return message[field]
+    if isinstance(message, list):
+        return [_format(item, field) for item in message]
+    return message.format(field=field, title=field.title())
+
+
+# --- Field checks ---
+# Each _compile_* function runs once per field and validator; the check it returns takes
+# the value and returns (normalized value, error). error is None when the value is valid.
+# 'any' fields have no check at all: the validator copies them as they are.
+
+def _compile_text(field, messages):
+    empty_error = _format(messages['empty_text'], field)
+
+    def check(value):
+        if not value:
+            return None, empty_error
+        return value, None
+    return check
+
+
+def _ingredient_errors(ingredients):
+    """Per-item errors of an ingredient list (only built once the fast pass found a bad item)."""
+    errors = []
+    for index, ingredient in enumerate(ingredients):
+        if not isinstance(ingredient, dict):
+            errors.append({"index": index, "errors": {"general": f"Ingredient at index {index} must be an object."}})
+        elif not ingredient.get('name'):
+            # Name is required for an ingredient, quantity is optional
+            errors.append({"index": index, "errors": {"name": f"Ingredient {index+1}: Name is required and cannot be empty."}})
+    return errors
+
+
+def _instruction_errors(instructions):
+    """Per-item errors of an instruction list."""
+    return [
+        {"index": index, "error": "Instruction must be a non-empty string."}
+        for index, instruction in enumerate(instructions)
+        if not isinstance(instruction, str) or not instruction.strip()
+    ]
+
+
+def _compile_ingredients(field, messages):
+    not_list_error = _format(messages['not_list'], field)
+    empty_error = _format(messages['empty_list'], field)
+
+    def check(value):
+        if not isinstance(value, list):
+            return None, not_list_error
+        if not value:
+            return None, empty_error
+        # Fast pass without building anything; the error report is only assembled if it fails
+        for ingredient in value:
+            if not isinstance(ingredient, dict) or not ingredient.get('name'):
+                return None, _ingredient_errors(value)
+        return value, None
+    return check
+
+
+def _compile_instructions(field, messages):
+    not_list_error = _format(messages['not_list'], field)
+    empty_error = _format(messages['empty_list'], field)
+
+    def check(value):
+        if not isinstance(value, list):
+            return None, not_list_error
+        if not value:
+            return None, empty_error
+        for instruction in value:
+            if not isinstance(instruction, str) or not instruction.strip():
+                return None, _instruction_errors(value)
+        return value, None
+    return check
+
+
+def _compile_number(field, messages):
+    label = field.replace('_', ' ').title()
+    negative_error = f"{label} cannot be negative."
+    invalid_error = f"{label} must be a valid number if provided."
+
+    def check(value):
+        if value is None: # None clears the field, 0 is valid
+            return None, None
+        if isinstance(value, str):
+            # Numeric strings (e.g. from form fields) are stored as numbers
+            try:
+                value = int(value) if value.isdigit() else float(value)
+            except ValueError:
+                return None, invalid_error
+        elif isinstance(value, bool) or not isinstance(value, (int, float)):
+            return None, invalid_error
+        if isinstance(value, float) and not math.isfinite(value):
+            return None, invalid_error
+        if value < 0:
+            return None, negative_error
+        return value, None
+    return check
+
+
+FIELD_COMPILERS = {
+    'any': None,
+    'text': _compile_text,
+    'ingredients': _compile_ingredients,
+    'instructions': _compile_instructions,
+    'number': _compile_number,
+}
+
+
+def compile_validator(partial=False):
+    """
+    Builds a validator for recipe data from RECIPE_SCHEMA. The per-field checks and their
+    error messages are prepared here, once; the returned function only walks the plan.
+    partial=False (create): the REQUIRED_FIELDS must be present.
+    partial=True (update): every field is optional, only the fields present are checked.
+    The validator returns (validated data, errors): the known fields with numbers normalized,
+    and a dict of errors keyed by field name (empty when the data is valid).
+    """
+    messages = UPDATE_MESSAGES if partial else CREATE_MESSAGES
+    plan = tuple(
+        (field, field in REQUIRED_FIELDS and not partial, FIELD_COMPILERS[kind] and FIELD_COMPILERS[kind](field, messages))
+        for field, kind in RECIPE_SCHEMA.items()
+    )
+    missing_errors = {field: _format(CREATE_MESSAGES['missing'], field) for field in REQUIRED_FIELDS}
+
+    def validate(recipe_data):
+        validated = {}
+        errors = {}
+        for field, required, check in plan:
+            if field not in recipe_data:
+                if required:
+                    errors[field] = missing_errors[field]
+                continue
+            if check is None:
+                validated[field] = recipe_data[field]
+                continue
+            value, error = check(recipe_data[field])
+            if error is None:
+                validated[field] = value
+            else:
+                errors[field] = error
+        return validated, errors
+    return validate
+
+
+# Compiled once at import; used by POST/PUT in routes/recipes.py and routes/secure_recipes.py
+# and by the NDJSON import (models/recipe_transfer.py)
+validate_new_recipe = compile_validator()
+validate_recipe_update = compile_validator(partial=True)
@@ -6,12 +6,21 @@ CREATE TABLE IF NOT EXISTS daily_menus (
     menu_date TEXT NOT NULL, -- Store date as 'YYYY-MM-DD'
     version INTEGER NOT NULL, -- Version number for the menu on that date, starting from 1
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    -- Copy-on-write contents: versions with the same dishes (same content_hash) share the
+    -- daily_menu_recipes rows of the first such version instead of storing their own copy
+    content_hash TEXT, -- SHA-256 of the ordered (recipe_id, meal_type) list, see daily_menu.menu_content_hash
+    content_menu_id INTEGER REFERENCES daily_menus (id), -- Version whose rows this one shares (NULL: its own rows)
     UNIQUE(menu_date, version) -- Ensure uniqueness for a given date and version
 );
 
 -- Index for faster date lookups
 CREATE INDEX IF NOT EXISTS idx_daily_menus_date ON daily_menus (menu_date);
 
+-- Finds the version that owns the rows of a given content (see `flask migrate-menu-versions`)
+CREATE INDEX IF NOT EXISTS idx_daily_menus_content_hash ON daily_menus (content_hash) WHERE content_menu_id IS NULL;
+-- Finds the versions sharing a version's rows before those are replaced (daily_menu.save_menu_version)
+CREATE INDEX IF NOT EXISTS idx_daily_menus_content_menu_id ON daily_menus (content_menu_id) WHERE content_menu_id IS NOT NULL;
+
 -- Table to store recipes included in a specific menu version and their meal type
 CREATE TABLE IF NOT EXISTS daily_menu_recipes (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -25,3 +34,17 @@ CREATE TABLE IF NOT EXISTS daily_menu_recipes (
 -- Indexes for faster lookups based on menu or recipe
 CREATE INDEX IF NOT EXISTS idx_daily_menu_recipes_menu_id ON daily_menu_recipes (daily_menu_id);
 CREATE INDEX IF NOT EXISTS idx_daily_menu_recipes_recipe_id ON daily_menu_recipes (recipe_id);
+
+-- Deleting a recipe cascades into the dishes above, so the stored contents no longer match their
+-- content_hash. Forget the hash of the affected versions (owners and the versions sharing their
+-- rows) so a later save of the old dish list is not matched to them (daily_menu.save_menu_version)
+CREATE TRIGGER IF NOT EXISTS daily_menus_forget_content_on_recipe_delete
+BEFORE DELETE ON recipes
+FOR EACH ROW
+BEGIN
+    UPDATE daily_menus SET content_hash = NULL
+    WHERE content_hash IS NOT NULL AND (
+        id IN (SELECT daily_menu_id FROM daily_menu_recipes WHERE recipe_id = OLD.id)
+        OR content_menu_id IN (SELECT daily_menu_id FROM daily_menu_recipes WHERE recipe_id = OLD.id)
+    );
+END;
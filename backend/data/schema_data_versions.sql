@@ -0,0 +1,98 @@
+-- Schema for the data version counters used as HTTP cache validators (ETag / Last-Modified)
+-- Every write to a table bumps the counter of its scope through the triggers below, so
+-- app/http_cache.py can answer conditional requests by reading one small row instead of
+-- regenerating the response. Safe to run repeatedly (see the `init-data-versions` CLI command).
+
+CREATE TABLE IF NOT EXISTS data_versions (
+    name TEXT PRIMARY KEY, -- Scope: 'recipes', 'recipe_images' or 'daily_menus'
+    version INTEGER NOT NULL,
+    updated_at TEXT NOT NULL -- UTC, 'YYYY-MM-DD HH:MM:SS.SSS'
+);
+
+-- Counters start at a random value, so a recreated database never reissues an old ETag
+INSERT OR IGNORE INTO data_versions (name, version, updated_at) VALUES
+    ('recipes', abs(random() % 1000000000000), strftime('%Y-%m-%d %H:%M:%f', 'now')),
+    ('recipe_images', abs(random() % 1000000000000), strftime('%Y-%m-%d %H:%M:%f', 'now')),
+    ('daily_menus', abs(random() % 1000000000000), strftime('%Y-%m-%d %H:%M:%f', 'now'));
+
+-- Recipes (the lookup tables and the search index are derived from this table)
+DROP TRIGGER IF EXISTS data_versions_recipes_insert;
+DROP TRIGGER IF EXISTS data_versions_recipes_update;
+DROP TRIGGER IF EXISTS data_versions_recipes_delete;
+
+CREATE TRIGGER data_versions_recipes_insert AFTER INSERT ON recipes
+BEGIN
+    UPDATE data_versions SET version = version + 1, updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now') WHERE name = 'recipes';
+END;
+
+CREATE TRIGGER data_versions_recipes_update AFTER UPDATE ON recipes
+BEGIN
+    UPDATE data_versions SET version = version + 1, updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now') WHERE name = 'recipes';
+END;
+
+CREATE TRIGGER data_versions_recipes_delete AFTER DELETE ON recipes
+BEGIN
+    UPDATE data_versions SET version = version + 1, updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now') WHERE name = 'recipes';
+END;
+
+-- Recipe images
+DROP TRIGGER IF EXISTS data_versions_recipe_images_insert;
+DROP TRIGGER IF EXISTS data_versions_recipe_images_update;
+DROP TRIGGER IF EXISTS data_versions_recipe_images_delete;
+
+CREATE TRIGGER data_versions_recipe_images_insert AFTER INSERT ON recipe_images
+BEGIN
+    UPDATE data_versions SET version = version + 1, updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now') WHERE name = 'recipe_images';
+END;
+
+CREATE TRIGGER data_versions_recipe_images_update AFTER UPDATE ON recipe_images
+BEGIN
+    UPDATE data_versions SET version = version + 1, updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now') WHERE name = 'recipe_images';
+END;
+
+CREATE TRIGGER data_versions_recipe_images_delete AFTER DELETE ON recipe_images
+BEGIN
+    UPDATE data_versions SET version = version + 1, updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now') WHERE name = 'recipe_images';
+END;
+
+-- Daily menus (versions and the recipes in them)
+DROP TRIGGER IF EXISTS data_versions_daily_menus_insert;
+DROP TRIGGER IF EXISTS data_versions_daily_menus_update;
+DROP TRIGGER IF EXISTS data_versions_daily_menus_delete;
+DROP TRIGGER IF EXISTS data_versions_daily_menu_recipes_insert;
+DROP TRIGGER IF EXISTS data_versions_daily_menu_recipes_update;
+DROP TRIGGER IF EXISTS data_versions_daily_menu_recipes_delete;
+
+CREATE TRIGGER data_versions_daily_menus_insert AFTER INSERT ON daily_menus
+BEGIN
+    UPDATE data_versions SET version = version + 1, updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now') WHERE name = 'daily_menus';
+END;
+
+CREATE TRIGGER data_versions_daily_menus_update AFTER UPDATE ON daily_menus
+BEGIN
+    UPDATE data_versions SET version = version + 1, updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now') WHERE name = 'daily_menus';
+END;
+
+CREATE TRIGGER data_versions_daily_menus_delete AFTER DELETE ON daily_menus
+BEGIN
+    UPDATE data_versions SET version = version + 1, updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now') WHERE name = 'daily_menus';
+END;
+
+CREATE TRIGGER data_versions_daily_menu_recipes_insert AFTER INSERT ON daily_menu_recipes
+BEGIN
+    UPDATE data_versions SET version = version + 1, updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now') WHERE name = 'daily_menus';
+END;
+
+CREATE TRIGGER data_versions_daily_menu_recipes_update AFTER UPDATE ON daily_menu_recipes
+BEGIN
+    UPDATE data_versions SET version = version + 1, updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now') WHERE name = 'daily_menus';
+END;
+
+CREATE TRIGGER data_versions_daily_menu_recipes_delete AFTER DELETE ON daily_menu_recipes
+BEGIN
+    UPDATE data_versions SET version = version + 1, updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now') WHERE name = 'daily_menus';
+END;
+
+-- Responses can also change with the code (deploys) or a re-initialized table, so every
+-- run of this script invalidates all previously issued validators
+UPDATE data_versions SET version = version + 1, updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now');
@@ -1,10 +1,18 @@
 -- SQL schema for the recipe_images table
 -- This table stores image information related to recipes.
 
+-- Image bytes live in the content-addressed file store (IMAGE_STORE_PATH), this table
+-- only keeps their metadata. Run `flask migrate-images-to-store` to move legacy BLOBs out.
 CREATE TABLE IF NOT EXISTS recipe_images (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     recipe_id INTEGER NOT NULL,
-    image_data BLOB NOT NULL, -- Changed from image_url TEXT to store image data directly
+    image_data BLOB, -- Legacy: image bytes stored inline, NULL once moved to the file store
+    content_hash TEXT, -- SHA-256 of the image bytes (hex), also the file name in the store
+    mime_type TEXT, -- Sniffed from the file content, e.g. 'image/jpeg'
+    byte_size INTEGER,
+    width INTEGER,
+    height INTEGER,
+    storage_path TEXT, -- Path relative to IMAGE_STORE_PATH, e.g. 'ab/cd/abcd....jpg'
     alt_text TEXT,
     is_primary INTEGER DEFAULT 0 CHECK(is_primary IN (0, 1)), -- Ensure only 0 or 1
     uploaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
@@ -15,6 +23,9 @@ CREATE TABLE IF NOT EXISTS recipe_images (
 -- Optional: Add an index for faster lookups by recipe_id
 CREATE INDEX IF NOT EXISTS idx_recipe_images_recipe_id ON recipe_images(recipe_id);
 
+-- Lookups by content hash (shared files, cleanup of unreferenced files)
+CREATE INDEX IF NOT EXISTS idx_recipe_images_content_hash ON recipe_images(content_hash);
+
 -- Optional: Add a unique constraint if you want only one primary image per recipe
 -- CREATE UNIQUE INDEX IF NOT EXISTS idx_recipe_images_primary ON recipe_images(recipe_id) WHERE is_primary = 1;
 -- Note: SQLite versions before 3.8.0 might not support partial indexes like the one above.
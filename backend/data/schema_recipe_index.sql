@@ -0,0 +1,29 @@
+-- Schema for the normalized lookup tables derived from the recipes JSON columns
+-- These tables are maintained by add_recipe/update_recipe/delete_recipe and can always be
+-- rebuilt from the recipes table (see the `backfill-recipe-index` CLI command).
+
+DROP TABLE IF EXISTS recipe_ingredients;
+DROP TABLE IF EXISTS recipe_tags;
+
+-- One row per ingredient of a recipe (inverted index: ingredient name -> recipes)
+CREATE TABLE recipe_ingredients (
+    recipe_id INTEGER NOT NULL,
+    ingredient_name TEXT NOT NULL, -- Trimmed ingredient name, e.g. '鸡蛋'
+    quantity TEXT, -- Free text quantity as entered, e.g. '2个', '适量'
+    FOREIGN KEY (recipe_id) REFERENCES recipes (id) ON DELETE CASCADE
+);
+
+-- Lookups by ingredient name return recipe ids straight from the index (covering)
+CREATE INDEX idx_recipe_ingredients_name ON recipe_ingredients (ingredient_name, recipe_id);
+CREATE INDEX idx_recipe_ingredients_recipe_id ON recipe_ingredients (recipe_id);
+
+-- One row per (recipe, tag); replaces json_each() scans over recipes.tags
+CREATE TABLE recipe_tags (
+    recipe_id INTEGER NOT NULL,
+    tag TEXT NOT NULL,
+    PRIMARY KEY (recipe_id, tag),
+    FOREIGN KEY (recipe_id) REFERENCES recipes (id) ON DELETE CASCADE
+);
+
+-- Tag filters and tag facet counts are served from this index alone (covering)
+CREATE INDEX idx_recipes_tags ON recipe_tags (tag, recipe_id);
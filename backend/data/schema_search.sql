@@ -0,0 +1,56 @@
+-- Schema for the recipe full-text search index
+-- The index is derived from the recipes table, so it is always safe to drop and rebuild
+-- (see the `rebuild-search-index` CLI command).
+-- NOTE: The triggers call fts_segment() / fts_json_text(), which are registered on every
+-- connection opened through get_db() (see app/models/search.py).
+
+DROP TRIGGER IF EXISTS recipes_fts_after_insert;
+DROP TRIGGER IF EXISTS recipes_fts_after_delete;
+DROP TRIGGER IF EXISTS recipes_fts_after_update;
+DROP TABLE IF EXISTS recipes_fts;
+
+-- CJK text is pre-segmented into one token per character before it reaches the tokenizer
+CREATE VIRTUAL TABLE recipes_fts USING fts5(
+    name,
+    description,
+    ingredient_names, -- Ingredient names only, extracted from the ingredients JSON
+    instruction_text, -- Instruction steps, extracted from the instructions JSON
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+
+CREATE TRIGGER recipes_fts_after_insert
+AFTER INSERT ON recipes
+FOR EACH ROW
+BEGIN
+    INSERT INTO recipes_fts (rowid, name, description, ingredient_names, instruction_text)
+    VALUES (
+        NEW.id,
+        fts_segment(NEW.name),
+        fts_segment(NEW.description),
+        fts_segment(fts_json_text(NEW.ingredients)),
+        fts_segment(fts_json_text(NEW.instructions))
+    );
+END;
+
+CREATE TRIGGER recipes_fts_after_delete
+AFTER DELETE ON recipes
+FOR EACH ROW
+BEGIN
+    DELETE FROM recipes_fts WHERE rowid = OLD.id;
+END;
+
+-- Only re-index when searchable columns change (not on the updated_at bookkeeping update)
+CREATE TRIGGER recipes_fts_after_update
+AFTER UPDATE OF name, description, ingredients, instructions ON recipes
+FOR EACH ROW
+BEGIN
+    DELETE FROM recipes_fts WHERE rowid = OLD.id;
+    INSERT INTO recipes_fts (rowid, name, description, ingredient_names, instruction_text)
+    VALUES (
+        NEW.id,
+        fts_segment(NEW.name),
+        fts_segment(NEW.description),
+        fts_segment(fts_json_text(NEW.ingredients)),
+        fts_segment(fts_json_text(NEW.instructions))
+    );
+END;
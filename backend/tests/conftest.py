@@ -0,0 +1,28 @@
+# backend/tests/conftest.py
+# Shared fixtures for tests that need a real (file backed) database
+
+import pytest
+from backend.app import create_app
+from backend.app.models.recipe import init_db, close_db
+
+
+@pytest.fixture
+def db_app(tmp_path):
+    """App instance backed by a fresh database file in a temporary directory."""
+    app = create_app(config_name='testing')
+    app.config['DATABASE'] = str(tmp_path / 'test_database.db')
+    app.config['IMAGE_STORE_PATH'] = str(tmp_path / 'images')
+
+    with app.app_context():
+        init_db()
+
+    yield app
+
+    with app.app_context():
+        close_db()
+
+
+@pytest.fixture
+def db_client(db_app):
+    """A test client for the file backed app."""
+    return db_app.test_client()
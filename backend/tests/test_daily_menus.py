@@ -0,0 +1,286 @@
+# backend/tests/test_daily_menus.py
+# Tests for the daily menu endpoints
+
+import io
+import os
+import base64
+import shutil
+import threading
+import pytest
+from backend.app.models import recipe as db_recipe
+from backend.app.models import daily_menu as db_daily_menu
+from backend.app.models import menu_repository
+from backend.app.scripts.cli_commands import migrate_menu_versions
+from backend.app.models import image_derivatives
+from backend.tests.test_recipe_images import make_png
+
+MENU_DATE = '2024-05-01'
+
+
+@pytest.fixture
+def menu_recipe(db_app, db_client):
+    """A saved menu with one recipe that has an uploaded image."""
+    with db_app.app_context():
+        recipe_id = db_recipe.add_recipe({"name": "番茄炒蛋", "ingredients": [], "instructions": []})
+    png = make_png(8, 8)
+    db_client.post(f'/api/recipes/{recipe_id}/image',
+                   data={'image': (io.BytesIO(png), 'photo.png')},
+                   content_type='multipart/form-data')
+    with db_app.app_context():
+        db_daily_menu.save_menu(MENU_DATE, [{"recipe_id": recipe_id, "meal_type": "午餐"}])
+    return recipe_id, png
+
+
+def test_menu_references_images_by_url(db_client, menu_recipe):
+    recipe_id, _ = menu_recipe
+    response = db_client.get(f'/api/daily-menus/?date={MENU_DATE}')
+    assert response.status_code == 200
+    recipe = response.get_json()['latest_menu']['recipes'][0]
+    assert recipe['recipe_image_data'] is None
+    assert recipe['recipe_image_mime_type'] == 'image/png'
+    assert recipe['recipe_image_url'] == f"/api/recipes/{recipe_id}/image?v={recipe['recipe_image_hash']}"
+
+    # The versioned URL is served with a long-lived cache header
+    image_response = db_client.get(recipe['recipe_image_url'])
+    assert image_response.status_code == 200
+    assert 'immutable' in image_response.headers['Cache-Control']
+
+
+def test_menu_inline_thumb_mode(db_client, db_app, menu_recipe):
+    _, png = menu_recipe
+    response = db_client.get(f'/api/daily-menus/?date={MENU_DATE}&inline_images=thumb')
+    recipe = response.get_json()['latest_menu']['recipes'][0]
+    assert recipe['recipe_image_mime_type'] == 'image/jpeg'
+    assert base64.b64decode(recipe['recipe_image_data']).startswith(b'\xff\xd8\xff')
+
+    # Without a thumb derivative, small originals are inlined as they are
+    shutil.rmtree(os.path.join(db_app.config['IMAGE_STORE_PATH'], image_derivatives.DERIVATIVE_DIR))
+    response = db_client.get(f'/api/daily-menus/?date={MENU_DATE}&inline_images=thumb')
+    assert base64.b64decode(response.get_json()['latest_menu']['recipes'][0]['recipe_image_data']) == png
+
+    # Originals above the size limit are never inlined
+    db_app.config['MENU_INLINE_IMAGE_MAX_BYTES'] = 10
+    response = db_client.get(f'/api/daily-menus/?date={MENU_DATE}&inline_images=thumb')
+    assert response.get_json()['latest_menu']['recipes'][0]['recipe_image_data'] is None
+
+
+def test_menu_rejects_unknown_inline_mode(db_client, menu_recipe):
+    response = db_client.get(f'/api/daily-menus/?date={MENU_DATE}&inline_images=full')
+    assert response.status_code == 400
+
+
+def test_menu_views_take_two_queries(db_app, menu_recipe):
+    recipe_id, _ = menu_recipe
+    with db_app.app_context():
+        db_daily_menu.save_menu(MENU_DATE, [{"recipe_id": recipe_id, "meal_type": "晚餐"}] * 3)
+        statements = []
+        db = db_recipe.get_read_db()
+        db.set_trace_callback(statements.append)
+        try:
+            latest_menu, versions = db_daily_menu.get_menu_by_date(MENU_DATE)
+            date_queries = len(statements)
+            version = db_daily_menu.get_menu_version(versions[0]['id'])
+        finally:
+            db.set_trace_callback(None)
+    assert date_queries == 2
+    assert len(statements) == 4
+    assert [v['version'] for v in versions] == [1, 2]
+    assert [r['meal_type'] for r in latest_menu['recipes']] == ['晚餐'] * 3
+    assert [r['meal_type'] for r in version['recipes']] == ['午餐']
+
+
+def test_menu_version_endpoint(db_client, menu_recipe):
+    recipe_id, _ = menu_recipe
+    menu_id = db_client.get(f'/api/daily-menus/?date={MENU_DATE}').get_json()['versions'][0]['id']
+    response = db_client.get(f'/api/daily-menus/{menu_id}')
+    assert response.status_code == 200
+    assert response.get_json()['recipes'][0]['recipe_id'] == recipe_id
+    assert db_client.get('/api/daily-menus/9999').status_code == 404
+
+
+def test_save_returns_the_saved_version(db_client, menu_recipe):
+    recipe_id, _ = menu_recipe
+    response = db_client.post(f'/api/daily-menus/?date={MENU_DATE}',
+                              json={"recipes": [{"recipe_id": recipe_id, "meal_type": "早餐"}]})
+    assert response.status_code == 201
+    body = response.get_json()
+    assert body['saved_menu']['version_info']['id'] == body['new_menu_id']
+    assert body['saved_menu']['version_info']['version'] == 2
+    assert body['saved_menu']['recipes'][0]['recipe_image_url'].startswith(f'/api/recipes/{recipe_id}/image')
+
+
+def test_menu_calendar_summarises_days(db_client, db_app, menu_recipe):
+    recipe_id, _ = menu_recipe
+    with db_app.app_context():
+        db_daily_menu.save_menu(MENU_DATE, [{"recipe_id": recipe_id, "meal_type": "晚餐"},
+                                            {"recipe_id": recipe_id, "meal_type": "早餐"},
+                                            {"recipe_id": recipe_id, "meal_type": "晚餐"}])
+        db_daily_menu.save_menu('2024-05-31', [])
+        db_daily_menu.save_menu('2024-06-01', [{"recipe_id": recipe_id}])
+
+    response = db_client.get('/api/daily-menus/calendar?from=2024-05-01&to=2024-05-31')
+    assert response.status_code == 200
+    days = response.get_json()['days']
+    assert [day['date'] for day in days] == [MENU_DATE, '2024-05-31']
+    assert days[0]['version_count'] == 2
+    assert days[0]['dish_count'] == 3
+    assert days[0]['meal_types'] == ['早餐', '晚餐']
+    assert days[1]['dish_count'] == 0 and days[1]['meal_types'] == []
+
+    assert db_client.get('/api/daily-menus/calendar?from=2024-05-02&to=2024-05-01').status_code == 400
+    assert db_client.get('/api/daily-menus/calendar?from=2024-01-01&to=2025-12-31').status_code == 400
+    assert db_client.get('/api/daily-menus/calendar?from=2024-05-01').status_code == 400
+
+
+def test_menu_date_ranges_use_the_date_index(db_app, menu_recipe):
+    with db_app.app_context():
+        assert db_daily_menu.get_dates_with_menus_in_month(2024, 5) == [MENU_DATE]
+        assert db_daily_menu.get_dates_with_menus_in_month(2024, 2) == []
+        db = db_recipe.get_read_db()
+        for sql in (menu_repository.CALENDAR_SQL,
+                    "SELECT DISTINCT menu_date FROM daily_menus WHERE menu_date BETWEEN ? AND ?"):
+            plan = ' '.join(row['detail'] for row in db.execute(f"EXPLAIN QUERY PLAN {sql}", ('2024-05-01', '2024-05-31')))
+            assert 'SCAN daily_menus' not in plan
+
+
+def stored_rows(db_app):
+    with db_app.app_context():
+        return db_recipe.get_db().execute("SELECT COUNT(*) FROM daily_menu_recipes").fetchone()[0]
+
+
+def test_identical_versions_share_their_dishes(db_app, menu_recipe):
+    recipe_id, _ = menu_recipe
+    rows_before = stored_rows(db_app)
+    with db_app.app_context():
+        # Same dishes again (another date, another version), then a changed menu
+        copy_id = db_daily_menu.save_menu('2024-05-02', [{"recipe_id": recipe_id, "meal_type": "午餐"}])
+        changed_id = db_daily_menu.save_menu(MENU_DATE, [{"recipe_id": recipe_id, "meal_type": "晚餐"}])
+        copy = db_daily_menu.get_menu_version(copy_id)
+        latest_menu, versions = db_daily_menu.get_menu_by_date(MENU_DATE)
+    assert stored_rows(db_app) == rows_before + 1
+    assert copy['version_info']['content_menu_id'] == versions[0]['id']
+    assert copy['version_info']['content_hash'] == versions[0]['content_hash']
+    assert [r['meal_type'] for r in copy['recipes']] == ['午餐']
+    assert latest_menu['version_info']['id'] == changed_id
+    assert latest_menu['version_info']['content_menu_id'] is None
+    assert [r['meal_type'] for r in latest_menu['recipes']] == ['晚餐']
+
+
+def test_menu_diff_endpoint(db_client, db_app, menu_recipe):
+    recipe_id, _ = menu_recipe
+    with db_app.app_context():
+        other_id = db_recipe.add_recipe({"name": "紫菜蛋花汤", "ingredients": [], "instructions": []})
+        base_id = db_daily_menu.get_menu_versions_by_date(MENU_DATE)[0]['id']
+        target_id = db_daily_menu.save_menu(MENU_DATE, [{"recipe_id": recipe_id, "meal_type": "午餐"},
+                                                        {"recipe_id": other_id, "meal_type": "晚餐"},
+                                                        {"recipe_id": other_id, "meal_type": "晚餐"}])
+        copy_id = db_daily_menu.save_menu('2024-05-02', [{"recipe_id": recipe_id, "meal_type": "午餐"}])
+
+    diff = db_client.get(f'/api/daily-menus/diff?base={base_id}&target={target_id}').get_json()
+    assert diff['identical'] is False
+    assert diff['added'] == [{"recipe_id": other_id, "recipe_name": "紫菜蛋花汤", "meal_type": "晚餐", "count": 2}]
+    assert diff['removed'] == []
+
+    diff = db_client.get(f'/api/daily-menus/diff?base={target_id}&target={base_id}').get_json()
+    assert [change['count'] for change in diff['removed']] == [2]
+
+    diff = db_client.get(f'/api/daily-menus/diff?base={base_id}&target={copy_id}').get_json()
+    assert diff['identical'] is True and diff['target']['menu_date'] == '2024-05-02'
+
+    assert db_client.get(f'/api/daily-menus/diff?base={base_id}&target=9999').status_code == 404
+    assert db_client.get(f'/api/daily-menus/diff?base={base_id}').status_code == 400
+
+
+def test_migrate_menu_versions_dedupes_existing_versions(db_app, menu_recipe):
+    recipe_id, _ = menu_recipe
+    with db_app.app_context():
+        db = db_recipe.get_db()
+        # Versions saved before content hashing: every version holds its own rows
+        db.execute("UPDATE daily_menus SET content_hash = NULL")
+        for version in (2, 3):
+            menu_id = db.execute("INSERT INTO daily_menus (menu_date, version) VALUES (?, ?)", (MENU_DATE, version)).lastrowid
+            db.execute("INSERT INTO daily_menu_recipes (daily_menu_id, recipe_id, meal_type) VALUES (?, ?, '午餐')", (menu_id, recipe_id))
+        db.commit()
+        migrate_menu_versions()
+        versions = db_daily_menu.get_menu_versions_by_date(MENU_DATE)
+        latest_menu = db_daily_menu.get_latest_menu_by_date(MENU_DATE)
+        migrate_menu_versions() # Nothing left to do the second time
+    assert stored_rows(db_app) == 1
+    assert [v['content_menu_id'] for v in versions] == [None, versions[0]['id'], versions[0]['id']]
+    assert len({v['content_hash'] for v in versions}) == 1
+    assert [r['recipe_id'] for r in latest_menu['recipes']] == [recipe_id]
+
+
+def test_overwrite_replaces_version_one(db_client, db_app, menu_recipe):
+    recipe_id, _ = menu_recipe
+    with db_app.app_context():
+        first_id = db_daily_menu.get_menu_versions_by_date(MENU_DATE)[0]['id']
+        # Another date shares version 1's dishes; replacing them must not change that menu
+        copy_id = db_daily_menu.save_menu('2024-05-02', [{"recipe_id": recipe_id, "meal_type": "午餐"}])
+        db_daily_menu.save_menu(MENU_DATE, [{"recipe_id": recipe_id, "meal_type": "夜宵"}])
+
+    response = db_client.post(f'/api/daily-menus/?date={MENU_DATE}&overwrite=true',
+                              json={"recipes": [{"recipe_id": recipe_id, "meal_type": "早餐"},
+                                                {"recipe_id": recipe_id, "meal_type": "晚餐"}]})
+    assert response.status_code == 201
+    saved_menu = response.get_json()['saved_menu']
+    assert saved_menu['version_info']['id'] == first_id
+    assert [r['meal_type'] for r in saved_menu['recipes']] == ['早餐', '晚餐']
+
+    # Saving the same dishes again is a no-op that still answers with version 1
+    response = db_client.post(f'/api/daily-menus/?date={MENU_DATE}&overwrite=true',
+                              json={"recipes": [{"recipe_id": recipe_id, "meal_type": "早餐"},
+                                                {"recipe_id": recipe_id, "meal_type": "晚餐"}]})
+    assert response.get_json()['new_menu_id'] == first_id
+
+    with db_app.app_context():
+        versions = db_daily_menu.get_menu_versions_by_date(MENU_DATE)
+        copy = db_daily_menu.get_menu_version(copy_id)
+    assert [v['version'] for v in versions] == [1, 2]
+    assert [r['meal_type'] for r in copy['recipes']] == ['午餐']
+    assert copy['version_info']['content_menu_id'] is None
+    assert stored_rows(db_app) == 4
+
+
+
+def test_deleted_recipe_is_not_shared_from_stale_contents(db_app, menu_recipe):
+    recipe_id, _ = menu_recipe
+    with db_app.app_context():
+        other_id = db_recipe.add_recipe({"name": "紫菜蛋花汤", "ingredients": [], "instructions": []})
+        dishes = [{"recipe_id": recipe_id, "meal_type": "午餐"}, {"recipe_id": other_id, "meal_type": "晚餐"}]
+        db_daily_menu.save_menu('2024-05-02', dishes, overwrite=True)
+        db_daily_menu.save_menu('2024-05-03', dishes, overwrite=True) # Shares 2024-05-02's rows
+        db_recipe.delete_recipe(other_id)
+        # Hands the shared rows over to 2024-05-03's version
+        db_daily_menu.save_menu('2024-05-02', [{"recipe_id": recipe_id, "meal_type": "早餐"}], overwrite=True)
+
+        # The old dish list references a deleted recipe: refused as before, not matched to the
+        # versions whose rows lost that dish
+        assert db_daily_menu.save_menu('2024-05-04', dishes) is None
+        assert db_daily_menu.get_menu_versions_by_date('2024-05-04') == []
+        heir = db_daily_menu.get_latest_menu_by_date('2024-05-03')
+    assert heir['version_info']['content_hash'] is None
+    assert [r['recipe_id'] for r in heir['recipes']] == [recipe_id]
+
+def test_concurrent_saves_for_one_date(db_app, menu_recipe):
+    recipe_id, _ = menu_recipe
+    with db_app.app_context():
+        db_daily_menu.save_menu('2024-07-01', [])
+    results = []
+
+    def save(index):
+        with db_app.app_context():
+            results.append(db_daily_menu.save_menu('2024-07-01', [{"recipe_id": recipe_id, "meal_type": "午餐"}] * (index % 3 + 1),
+                                                   overwrite=index % 2 == 0))
+
+    threads = [threading.Thread(target=save, args=(index,)) for index in range(12)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    with db_app.app_context():
+        versions = db_daily_menu.get_menu_versions_by_date('2024-07-01')
+    assert None not in results
+    # Every append got its own number; all overwrites landed on the one version 1
+    assert [v['version'] for v in versions] == list(range(1, 8))
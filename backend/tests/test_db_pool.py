@@ -0,0 +1,106 @@
+# backend/tests/test_db_pool.py
+# Tests for pooled database connections and the PRAGMA profile
+
+import sqlite3
+
+import pytest
+
+from backend.app.models import recipe as db_recipe
+from backend.app.models import db_pool
+from backend.app.models import daily_menu as db_daily_menu
+from backend.app.models.recipe import get_db
+
+
+def test_connections_are_reused_across_requests(db_client):
+    db_client.get('/api/recipes/')
+    before = db_client.get('/api/db-pool-stats').get_json()['data']
+    for _ in range(3):
+        db_client.get('/api/recipes/')
+    after = db_client.get('/api/db-pool-stats').get_json()['data']
+    assert after['created'] == before['created']
+    # 3 list requests on the read-only connection + the stats request (writer and reader)
+    assert after['reused'] == before['reused'] + 5
+
+
+def test_pragma_profile_is_applied(db_client):
+    pragmas = db_client.get('/api/db-pool-stats').get_json()['data']['pragmas']
+    assert pragmas['journal_mode'] == 'wal'
+    assert pragmas['foreign_keys'] == 1
+    assert pragmas['synchronous'] == 1 # NORMAL
+
+
+def test_deleting_a_recipe_cascades(db_app):
+    with db_app.app_context():
+        recipe_id = db_recipe.add_recipe({"name": "番茄炒蛋", "ingredients": [], "instructions": []})
+        db_daily_menu.save_menu('2024-05-01', [{"recipe_id": recipe_id, "meal_type": "午餐"}])
+        db_recipe.delete_recipe(recipe_id)
+        remaining = get_db().execute("SELECT COUNT(*) FROM daily_menu_recipes").fetchone()[0]
+    assert remaining == 0
+
+
+def test_leftover_transactions_are_rolled_back(db_app):
+    with db_app.app_context():
+        get_db().execute("INSERT INTO recipes (name, ingredients, instructions) VALUES ('x', '[]', '[]')")
+    # The connection went back to the pool without a commit
+    with db_app.app_context():
+        db = get_db()
+        assert not db.in_transaction
+        assert db.execute("SELECT COUNT(*) FROM recipes").fetchone()[0] == 0
+
+
+def test_reads_use_read_only_connections(db_client):
+    read_pragmas = db_client.get('/api/db-pool-stats').get_json()['data']['read_pragmas']
+    assert read_pragmas['query_only'] == 1
+    assert read_pragmas['journal_mode'] == 'wal'
+
+
+def test_read_only_connection_refuses_writes(db_app):
+    with db_app.app_context():
+        read_db = db_recipe.get_read_db()
+        assert read_db is not get_db()
+        with pytest.raises(sqlite3.OperationalError):
+            read_db.execute("INSERT INTO recipes (name, ingredients, instructions) VALUES ('x', '[]', '[]')")
+
+
+def test_reads_see_committed_writes(db_app):
+    with db_app.app_context():
+        assert db_recipe.get_all_recipes()[1] == 0
+        recipe_id = db_recipe.add_recipe({"name": "番茄炒蛋", "ingredients": [], "instructions": []})
+        assert db_recipe.get_recipe_by_id(recipe_id)['name'] == "番茄炒蛋"
+        assert db_recipe.get_all_recipes()[1] == 1
+
+
+def test_reads_are_not_blocked_by_an_open_write(db_app):
+    with db_app.app_context():
+        db_recipe.add_recipe({"name": "番茄炒蛋", "ingredients": [], "instructions": []})
+        database = db_app.config['DATABASE']
+        # Another worker holds the write lock in the middle of a menu save
+        other_writer = sqlite3.connect(database)
+        other_writer.execute("BEGIN IMMEDIATE")
+        other_writer.execute("INSERT INTO daily_menus (menu_date, version) VALUES ('2024-05-01', 1)")
+        try:
+            assert db_recipe.get_all_recipes()[1] == 1
+        finally:
+            other_writer.rollback()
+            other_writer.close()
+
+
+def test_writers_back_off_while_another_holds_the_lock(db_app):
+    db_app.config['SQLITE_WRITE_BACKOFF'] = 0.01
+    with db_app.app_context():
+        get_db().execute("PRAGMA busy_timeout = 0")
+        other_writer = sqlite3.connect(db_app.config['DATABASE'])
+        other_writer.execute("BEGIN IMMEDIATE")
+        try:
+            retries_before = db_pool.get_stats()['write_retries']
+            with pytest.raises(sqlite3.OperationalError):
+                db_recipe.begin_write(get_db())
+            assert db_pool.get_stats()['write_retries'] == retries_before + db_app.config['SQLITE_WRITE_RETRIES']
+        finally:
+            other_writer.rollback()
+            other_writer.close()
+        # Once the lock is free the write goes through
+        db_recipe.begin_write(get_db())
+        assert get_db().in_transaction
+        get_db().rollback()
+        get_db().execute("PRAGMA busy_timeout = 5000")
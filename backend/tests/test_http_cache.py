@@ -0,0 +1,76 @@
+# backend/tests/test_http_cache.py
+# Tests for ETag / Last-Modified validators and 304 responses
+
+import io
+import pytest
+from backend.app.models import recipe as db_recipe
+from backend.app.models import daily_menu as db_daily_menu
+from backend.tests.test_recipe_images import make_png
+
+
+@pytest.fixture
+def recipe_id(db_app):
+    with db_app.app_context():
+        return db_recipe.add_recipe({"name": "番茄炒蛋", "ingredients": [], "instructions": []})
+
+
+def test_recipe_list_revalidates_with_304(db_client, recipe_id):
+    response = db_client.get('/api/recipes/')
+    assert response.status_code == 200
+    assert response.headers['Cache-Control'] == 'no-cache'
+    etag = response.headers['ETag']
+
+    response = db_client.get('/api/recipes/', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+    assert response.headers['ETag'] == etag
+
+    # A different query is a different representation
+    response = db_client.get('/api/recipes/?search=番茄', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+
+
+def test_writes_change_the_etag(db_client, db_app, recipe_id):
+    etag = db_client.get(f'/api/recipes/{recipe_id}').headers['ETag']
+    with db_app.app_context():
+        db_recipe.update_recipe(recipe_id, {"description": "家常菜"})
+    response = db_client.get(f'/api/recipes/{recipe_id}', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+
+def test_menu_etag_follows_menu_saves(db_client, db_app, recipe_id):
+    response = db_client.get('/api/daily-menus/dates')
+    etag = response.headers['ETag']
+    assert db_client.get('/api/daily-menus/dates', headers={'If-None-Match': etag}).status_code == 304
+
+    with db_app.app_context():
+        db_daily_menu.save_menu('2024-05-01', [{"recipe_id": recipe_id, "meal_type": "午餐"}])
+    response = db_client.get('/api/daily-menus/dates', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.get_json()['dates'] == ['2024-05-01']
+
+
+def test_image_etag_is_the_content_hash(db_client, db_app, recipe_id):
+    db_client.post(f'/api/recipes/{recipe_id}/image',
+                   data={'image': (io.BytesIO(make_png(8, 8)), 'photo.png')},
+                   content_type='multipart/form-data')
+    response = db_client.get(f'/api/recipes/{recipe_id}/image')
+    with db_app.app_context():
+        content_hash = db_recipe.get_recipe_primary_image(recipe_id)['content_hash']
+    assert response.headers['ETag'] == f'"{content_hash}"'
+
+    response = db_client.get(f'/api/recipes/{recipe_id}/image', headers={'If-None-Match': f'"{content_hash}"'})
+    assert response.status_code == 304
+
+    # Also when nginx would serve the file
+    db_app.config['IMAGE_ACCEL_REDIRECT_PREFIX'] = '/_image_store/'
+    response = db_client.get(f'/api/recipes/{recipe_id}/image', headers={'If-None-Match': f'"{content_hash}"'})
+    assert response.status_code == 304
+    assert 'X-Accel-Redirect' not in response.headers
+
+
+def test_errors_carry_no_validators(db_client):
+    response = db_client.get('/api/daily-menus/dates-in-month?year=2024&month=13')
+    assert response.status_code == 400
+    assert 'ETag' not in response.headers
@@ -0,0 +1,64 @@
+# backend/tests/test_json_documents.py
+# Tests for the JSON provider (orjson / RawJSON fragments) and cached recipe documents
+
+import json
+from datetime import datetime, timezone
+
+import pytest
+
+from backend.app import create_app
+from backend.app import json_provider
+from backend.app.json_provider import RawJSON, orjson
+from backend.app.models import recipe as db_recipe
+from backend.app.models import recipe_documents
+
+
+@pytest.mark.parametrize('use_orjson', [
+    False,
+    pytest.param(True, marks=pytest.mark.skipif(orjson is None, reason="orjson is not installed")),
+])
+def test_raw_json_is_spliced_into_the_output(use_orjson):
+    app = create_app(config_name='testing')
+    app.config['JSON_USE_ORJSON'] = use_orjson
+    json_provider.init_app(app)
+    payload = {
+        "data": [RawJSON(b'{"id":1,"name":"\\u756a\\u8304"}'), RawJSON('{"id":2}')],
+        "when": datetime(2024, 5, 1, 8, 30, tzinfo=timezone.utc),
+        "b": 1, "a": "番茄",
+    }
+    with app.app_context():
+        encoded = app.json.dumps(payload, separators=(',', ':'))
+        pretty = app.json.dumps(payload, indent=2)
+    assert json.loads(encoded) == json.loads(pretty) == {
+        "data": [{"id": 1, "name": "番茄"}, {"id": 2}],
+        "when": "Wed, 01 May 2024 08:30:00 GMT", # Flask's date format either way
+        "b": 1, "a": "番茄",
+    }
+    assert encoded.index('"a"') < encoded.index('"b"') # Sorted keys like Flask's provider
+
+
+def test_detail_document_follows_updates(db_app):
+    client = db_app.test_client()
+    with db_app.app_context():
+        recipe_id = db_recipe.add_recipe({"name": "番茄炒蛋", "ingredients": [], "instructions": ["炒"]})
+    assert client.get(f'/api/recipes/{recipe_id}').get_json()['data']['name'] == "番茄炒蛋"
+    with db_app.app_context():
+        db_recipe.update_recipe(recipe_id, {"name": "西红柿炒蛋"})
+    assert client.get(f'/api/recipes/{recipe_id}').get_json()['data']['name'] == "西红柿炒蛋"
+    assert client.get('/api/recipes/999').status_code != 200
+
+
+def test_list_documents_are_reused(db_app, monkeypatch):
+    client = db_app.test_client()
+    with db_app.app_context():
+        for name in ("番茄炒蛋", "麻婆豆腐"):
+            db_recipe.add_recipe({"name": name, "ingredients": [{"name": "盐"}], "instructions": ["炒"], "tags": ["家常菜"]})
+    first = client.get('/api/recipes/', query_string={'fields': 'summary'}).get_json()
+
+    encoded = []
+    original_store = recipe_documents.store
+    monkeypatch.setattr(recipe_documents, 'store', lambda *args, **kwargs: encoded.append(args) or original_store(*args, **kwargs))
+    second = client.get('/api/recipes/', query_string={'fields': 'summary'}).get_json()
+    assert second == first
+    assert encoded == [] # Both recipes came from the document cache
+    assert first['data'][0]['tags'] == ["家常菜"]
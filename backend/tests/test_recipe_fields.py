@@ -0,0 +1,58 @@
+# backend/tests/test_recipe_fields.py
+# Tests for the ?fields= projection of GET /api/recipes
+
+import json
+from backend.app.models import recipe as db_recipe
+
+RECIPE = {
+    "name": "番茄炒蛋",
+    "description": "家常快手菜",
+    "ingredients": [{"name": "番茄", "quantity": "2个"}, {"name": "鸡蛋", "quantity": "3个"}],
+    "instructions": ["切番茄", "炒鸡蛋", "混合翻炒"],
+    "tags": ["家常菜", "简单"],
+    "difficulty": "简单",
+    "cook_time_minutes": 10,
+}
+
+
+def list_recipes(client, **query):
+    response = client.get('/api/recipes/', query_string=query)
+    return response.status_code, json.loads(response.data)
+
+
+def test_summary_leaves_out_instructions(db_app):
+    with db_app.app_context():
+        db_recipe.add_recipe(RECIPE)
+    status, body = list_recipes(db_app.test_client(), fields='summary')
+    assert status == 200
+    recipe = body['data'][0]
+    assert 'instructions' not in recipe
+    assert recipe['tags'] == ["家常菜", "简单"]
+    # Ingredients come from recipe_ingredients, in the order they were entered
+    assert recipe['ingredients'] == RECIPE['ingredients']
+    assert body['pagination']['total_items'] == 1
+
+
+def test_field_list_always_includes_id(db_app):
+    with db_app.app_context():
+        recipe_id = db_recipe.add_recipe(RECIPE)
+    client = db_app.test_client()
+    status, body = list_recipes(client, fields='name,cook_time_minutes')
+    assert status == 200
+    assert body['data'] == [{"id": recipe_id, "name": "番茄炒蛋", "cook_time_minutes": 10}]
+    # Cursor pagination accepts the same projection
+    status, body = list_recipes(client, fields='name', cursor='')
+    assert body['data'] == [{"id": recipe_id, "name": "番茄炒蛋"}]
+
+
+def test_unknown_fields_are_rejected(db_client):
+    status, body = list_recipes(db_client, fields='name,secret')
+    assert status == 400
+    assert 'secret' in body['message']
+
+
+def test_full_rows_without_fields(db_app):
+    with db_app.app_context():
+        db_recipe.add_recipe(RECIPE)
+    status, body = list_recipes(db_app.test_client())
+    assert body['data'][0]['instructions'] == RECIPE['instructions']
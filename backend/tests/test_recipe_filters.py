@@ -0,0 +1,69 @@
+# backend/tests/test_recipe_filters.py
+# Tests for the indexed recipe filters (ingredients, tags)
+
+import json
+from backend.app.models import recipe as db_recipe
+from backend.app.models.recipe import get_db
+
+
+def add_recipe(app, name, ingredients, tags=None):
+    with app.app_context():
+        return db_recipe.add_recipe({
+            "name": name,
+            "ingredients": [{"name": ingredient, "quantity": "1"} for ingredient in ingredients],
+            "instructions": ["Cook."],
+            "tags": tags or [],
+        })
+
+
+def names(client, **query):
+    response = client.get('/api/recipes/', query_string=query)
+    assert response.status_code == 200
+    return sorted(recipe['name'] for recipe in json.loads(response.data)['data'])
+
+
+def test_ingredients_filter_requires_all_ingredients(db_client, db_app):
+    add_recipe(db_app, "番茄炒蛋", ["番茄", "鸡蛋"])
+    add_recipe(db_app, "蛋花汤", ["鸡蛋", "葱花"])
+    assert names(db_client, ingredients="鸡蛋") == ["番茄炒蛋", "蛋花汤"]
+    assert names(db_client, ingredients="鸡蛋, 番茄") == ["番茄炒蛋"]
+    # Only ingredient names match, not substrings or other JSON values
+    assert names(db_client, ingredients="蛋") == []
+    assert names(db_client, ingredients="1") == []
+
+
+def test_ingredient_rows_follow_updates_and_deletes(db_client, db_app):
+    recipe_id = add_recipe(db_app, "番茄炒蛋", ["番茄", "鸡蛋"])
+    with db_app.app_context():
+        db_recipe.update_recipe(recipe_id, {"ingredients": [{"name": "土豆", "quantity": "2个"}]})
+        rows = get_db().execute(
+            "SELECT ingredient_name, quantity FROM recipe_ingredients WHERE recipe_id = ?", (recipe_id,)
+        ).fetchall()
+        assert [tuple(row) for row in rows] == [("土豆", "2个")]
+
+        db_recipe.delete_recipe(recipe_id)
+        assert get_db().execute("SELECT COUNT(*) FROM recipe_ingredients").fetchone()[0] == 0
+
+
+def test_tags_filter_matches_any_tag(db_client, db_app):
+    add_recipe(db_app, "麻婆豆腐", ["豆腐"], tags=["川菜", "麻辣"])
+    add_recipe(db_app, "番茄炒蛋", ["鸡蛋"], tags=["家常菜"])
+    add_recipe(db_app, "清蒸鱼", ["鱼"], tags=["粤菜"])
+    assert names(db_client, tags=["川菜", "家常菜"]) == ["番茄炒蛋", "麻婆豆腐"]
+    assert names(db_client, tags="麻辣") == ["麻婆豆腐"]
+
+
+def test_tag_counts_facet(db_client, db_app):
+    add_recipe(db_app, "麻婆豆腐", ["豆腐"], tags=["川菜", "下饭菜"])
+    recipe_id = add_recipe(db_app, "回锅肉", ["五花肉"], tags=["川菜", "川菜"])
+    response = db_client.get('/api/recipes/tags')
+    assert response.status_code == 200
+    assert json.loads(response.data)['data'] == [
+        {"tag": "川菜", "count": 2},
+        {"tag": "下饭菜", "count": 1},
+    ]
+
+    with db_app.app_context():
+        db_recipe.update_recipe(recipe_id, {"tags": ["湘菜"]})
+    response = db_client.get('/api/recipes/tags', query_string={'limit': 1})
+    assert json.loads(response.data)['data'] == [{"tag": "下饭菜", "count": 1}]
@@ -0,0 +1,179 @@
+# backend/tests/test_recipe_images.py
+# Tests for recipe image upload and the content-addressed image store
+
+import io
+import hashlib
+import os
+import zlib
+import struct
+import shutil
+import pytest
+from backend.app.models import recipe as db_recipe
+from backend.app.models import image_derivatives
+from backend.app.models.recipe import get_db
+from backend.app.models.image_store import image_dimensions as image_store_dimensions
+
+
+def make_png(width, height, color=(200, 80, 40)):
+    """Builds a small valid RGB PNG in memory."""
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff)
+    raw = b''.join(b'\x00' + bytes(color) * width for _ in range(height))
+    return (b'\x89PNG\r\n\x1a\n'
+            + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(raw))
+            + chunk(b'IEND', b''))
+
+
+@pytest.fixture
+def recipe_id(db_app):
+    with db_app.app_context():
+        return db_recipe.add_recipe({"name": "番茄炒蛋", "ingredients": [], "instructions": []})
+
+
+def upload(client, recipe_id, data, filename='photo.png'):
+    return client.post(f'/api/recipes/{recipe_id}/image',
+                       data={'image': (io.BytesIO(data), filename)},
+                       content_type='multipart/form-data')
+
+
+def test_upload_stores_file_and_metadata_only(db_client, db_app, recipe_id):
+    png = make_png(40, 30)
+    assert upload(db_client, recipe_id, png).status_code == 201
+
+    with db_app.app_context():
+        row = get_db().execute("SELECT * FROM recipe_images WHERE recipe_id = ?", (recipe_id,)).fetchone()
+    assert row['image_data'] is None
+    assert (row['mime_type'], row['byte_size'], row['width'], row['height']) == ('image/png', len(png), 40, 30)
+    assert os.path.exists(os.path.join(db_app.config['IMAGE_STORE_PATH'], row['storage_path']))
+
+    response = db_client.get(f'/api/recipes/{recipe_id}/image')
+    assert response.status_code == 200
+    assert response.mimetype == 'image/png'
+    assert response.data == png
+
+
+def test_identical_uploads_share_one_file(db_client, db_app, recipe_id):
+    png = make_png(8, 8)
+    upload(db_client, recipe_id, png)
+    upload(db_client, recipe_id, png, filename='again.png')
+    store_path = db_app.config['IMAGE_STORE_PATH']
+    stored_files = [name for root, _, files in os.walk(store_path) for name in files
+                    if not os.path.relpath(root, store_path).startswith(image_derivatives.DERIVATIVE_DIR)]
+    assert len(stored_files) == 1
+
+
+def test_upload_rejects_non_image_content(db_client, recipe_id):
+    response = upload(db_client, recipe_id, b'definitely not an image', filename='fake.jpg')
+    assert response.status_code == 400
+
+
+def test_accel_redirect_leaves_file_serving_to_nginx(db_client, db_app, recipe_id):
+    upload(db_client, recipe_id, make_png(8, 8))
+    db_app.config['IMAGE_ACCEL_REDIRECT_PREFIX'] = '/_image_store/'
+    response = db_client.get(f'/api/recipes/{recipe_id}/image')
+    assert response.status_code == 200
+    assert response.headers['X-Accel-Redirect'].startswith('/_image_store/')
+    assert response.headers['X-Accel-Redirect'].endswith('.png')
+    assert response.data == b''
+
+
+def test_upload_generates_derivatives(db_client, db_app, recipe_id):
+    upload(db_client, recipe_id, make_png(1000, 500))
+
+    response = db_client.get(f'/api/recipes/{recipe_id}/image?size=thumb', headers={'Accept': 'image/webp,*/*'})
+    assert response.status_code == 200
+    assert response.mimetype == 'image/webp'
+    assert 'Accept' in response.headers['Vary']
+    assert image_store_dimensions(response.data, 'image/webp') == (320, 160)
+
+    # Without an explicit image/webp in Accept the JPEG variant is served
+    response = db_client.get(f'/api/recipes/{recipe_id}/image?size=card', headers={'Accept': '*/*'})
+    assert response.mimetype == 'image/jpeg'
+    assert image_store_dimensions(response.data, 'image/jpeg') == (640, 320)
+
+
+def test_derivative_falls_back_to_original(db_client, db_app, recipe_id):
+    png = make_png(8, 8)
+    upload(db_client, recipe_id, png)
+    # Simulate derivatives that have not been generated yet
+    shutil.rmtree(os.path.join(db_app.config['IMAGE_STORE_PATH'], image_derivatives.DERIVATIVE_DIR))
+    response = db_client.get(f'/api/recipes/{recipe_id}/image?size=full')
+    assert response.status_code == 200
+    assert response.data == png
+    assert not response.cache_control.immutable
+
+
+def test_image_rejects_unknown_size(db_client, recipe_id):
+    upload(db_client, recipe_id, make_png(8, 8))
+    assert db_client.get(f'/api/recipes/{recipe_id}/image?size=huge').status_code == 400
+
+
+def test_large_upload_is_streamed_into_the_store(db_client, db_app, recipe_id):
+    # Several copy chunks long; the hash and size must cover every chunk
+    png = make_png(16, 16) + os.urandom(300 * 1024)
+    assert upload(db_client, recipe_id, png).status_code == 201
+
+    with db_app.app_context():
+        row = get_db().execute("SELECT * FROM recipe_images WHERE recipe_id = ?", (recipe_id,)).fetchone()
+    assert (row['byte_size'], row['width'], row['height']) == (len(png), 16, 16)
+    assert row['content_hash'] == hashlib.sha256(png).hexdigest()
+    with open(os.path.join(db_app.config['IMAGE_STORE_PATH'], row['storage_path']), 'rb') as f:
+        assert f.read() == png
+
+
+def test_upload_over_the_image_limit_is_rejected(db_client, db_app, recipe_id):
+    db_app.config['MAX_IMAGE_UPLOAD_BYTES'] = 100 * 1024
+    response = upload(db_client, recipe_id, make_png(8, 8) + bytes(200 * 1024))
+    assert response.status_code == 413
+    assert 'limit' in response.get_json()['message']
+
+    with db_app.app_context():
+        assert get_db().execute("SELECT COUNT(*) FROM recipe_images").fetchone()[0] == 0
+    # The partial copy is removed
+    store_path = db_app.config['IMAGE_STORE_PATH']
+    assert [name for _, _, names in os.walk(store_path) for name in names] == []
+
+
+def test_request_body_over_max_content_length_is_rejected(db_client, db_app, recipe_id):
+    db_app.config['MAX_CONTENT_LENGTH'] = 64 * 1024
+    response = upload(db_client, recipe_id, make_png(8, 8) + bytes(128 * 1024))
+    assert response.status_code == 413
+    assert response.get_json()['message']
+
+
+def add_legacy_image(db_app, recipe_id, data):
+    """Inserts a row the way images were stored before the file store (bytes in image_data)."""
+    with db_app.app_context():
+        db = get_db()
+        db.execute("INSERT INTO recipe_images (recipe_id, image_data, is_primary) VALUES (?, ?, 1)", (recipe_id, data))
+        db.commit()
+
+
+def test_legacy_blob_is_streamed_with_ranges(db_client, db_app, recipe_id):
+    png = make_png(32, 32) + os.urandom(200 * 1024)
+    add_legacy_image(db_app, recipe_id, png)
+
+    response = db_client.get(f'/api/recipes/{recipe_id}/image')
+    assert response.status_code == 200
+    assert response.mimetype == 'image/png'
+    assert response.headers['Accept-Ranges'] == 'bytes'
+    assert response.content_length == len(png)
+    assert response.data == png
+
+    response = db_client.get(f'/api/recipes/{recipe_id}/image', headers={'Range': 'bytes=100000-100099'})
+    assert response.status_code == 206
+    assert response.headers['Content-Range'] == f'bytes 100000-100099/{len(png)}'
+    assert response.data == png[100000:100100]
+
+    etag = response.headers['ETag']
+    assert db_client.get(f'/api/recipes/{recipe_id}/image', headers={'If-None-Match': etag}).status_code == 304
+
+
+def test_stored_image_supports_ranges(db_client, recipe_id):
+    png = make_png(20, 20)
+    upload(db_client, recipe_id, png)
+    response = db_client.get(f'/api/recipes/{recipe_id}/image', headers={'Range': 'bytes=0-7'})
+    assert response.status_code == 206
+    assert response.mimetype == 'image/png'
+    assert response.data == png[:8]
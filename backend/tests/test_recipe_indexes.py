@@ -0,0 +1,36 @@
+# backend/tests/test_recipe_indexes.py
+# Tests for the managed recipes indexes and the EXPLAIN QUERY PLAN benchmark
+
+from backend.app.models import recipe_indexes
+from backend.app.models.recipe import get_db
+from backend.app.scripts.index_benchmark import run_index_benchmark
+
+
+def recipes_index_names(db):
+    return {
+        row[0] for row in db.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'recipes' AND sql IS NOT NULL")
+    }
+
+
+def test_init_db_creates_the_managed_indexes(db_app):
+    with db_app.app_context():
+        assert recipes_index_names(get_db()) == set(recipe_indexes.RECIPE_INDEXES)
+        assert recipe_indexes.ensure_recipe_indexes(get_db()) == {'created': [], 'rebuilt': [], 'dropped': []}
+
+
+def test_ensure_migrates_missing_changed_and_unknown_indexes(db_app):
+    with db_app.app_context():
+        db = get_db()
+        db.execute("DROP INDEX idx_recipes_servings")
+        db.execute("DROP INDEX idx_recipes_cuisine")
+        db.execute("CREATE INDEX idx_recipes_cuisine ON recipes (cuisine)")
+        db.execute("CREATE INDEX idx_recipes_tags_json ON recipes (tags)")
+        db.commit()
+        changes = recipe_indexes.ensure_recipe_indexes(db)
+        assert changes == {'created': ['idx_recipes_servings'], 'rebuilt': ['idx_recipes_cuisine'], 'dropped': ['idx_recipes_tags_json']}
+        assert recipes_index_names(db) == set(recipe_indexes.RECIPE_INDEXES)
+
+
+def test_every_filter_path_uses_an_index():
+    results = run_index_benchmark(5000, repeat=1)
+    assert [result['label'] for result in results if not result['ok']] == []
@@ -0,0 +1,81 @@
+# backend/tests/test_recipe_pagination.py
+# Tests for keyset (cursor) pagination on GET /api/recipes
+
+import json
+import pytest
+from backend.app.models import recipe as db_recipe
+from backend.app.models.recipe import get_db
+
+
+@pytest.fixture
+def many_recipes(db_app):
+    """25 recipes; the first ten share one created_at to exercise the id tie-breaker."""
+    with db_app.app_context():
+        db = get_db()
+        for index in range(25):
+            created_at = '2024-01-01 08:00:00' if index < 10 else f'2024-01-{index:02d} 08:00:00'
+            db.execute(
+                "INSERT INTO recipes (name, ingredients, instructions, tags, difficulty, created_at) VALUES (?, '[]', '[]', '[]', ?, ?)",
+                (f'Recipe {index:02d}', [None, '简单', '中等'][index % 3], created_at)
+            )
+        db.commit()
+
+
+def collect_pages(client, **query):
+    query.update(cursor='', limit=7)
+    ids, pages = [], 0
+    while True:
+        response = client.get('/api/recipes/', query_string=query)
+        assert response.status_code == 200
+        body = json.loads(response.data)
+        ids.extend(recipe['id'] for recipe in body['data'])
+        pages += 1
+        if not body['pagination']['has_more']:
+            return ids, pages, body['pagination']
+        query['cursor'] = body['pagination']['next_cursor']
+
+
+@pytest.mark.parametrize('sort,order', [
+    ('created_at', 'desc'), ('name', 'asc'), ('difficulty', 'desc'), ('updated_at', 'asc'),
+])
+def test_cursor_pages_match_offset_listing(db_client, many_recipes, sort, order):
+    offset_response = db_client.get('/api/recipes/', query_string={'sort': sort, 'order': order, 'limit': 100})
+    expected_ids = [recipe['id'] for recipe in json.loads(offset_response.data)['data']]
+
+    ids, pages, pagination = collect_pages(db_client, sort=sort, order=order)
+    assert ids == expected_ids
+    assert pages == 4
+    assert 'total_items' not in pagination
+
+
+def test_cursor_total_is_optional(db_client, many_recipes):
+    response = db_client.get('/api/recipes/', query_string={'cursor': '', 'includeTotal': 'true'})
+    pagination = json.loads(response.data)['pagination']
+    assert pagination['total_items'] == 25
+    assert pagination['per_page'] == 8
+
+
+def test_invalid_cursor_is_rejected(db_client, many_recipes):
+    assert db_client.get('/api/recipes/', query_string={'cursor': 'not-a-cursor'}).status_code == 400
+
+    response = db_client.get('/api/recipes/', query_string={'cursor': '', 'sort': 'name'})
+    next_cursor = json.loads(response.data)['pagination']['next_cursor']
+    # A cursor only makes sense for the sort order it was issued for
+    response = db_client.get('/api/recipes/', query_string={'cursor': next_cursor, 'sort': 'created_at'})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize('sort,index', [('created_at', 'idx_recipes_created_at'), ('updated_at', 'idx_recipes_updated_at')])
+def test_timestamp_cursor_seeks_in_the_index(db_app, many_recipes, sort, index):
+    with db_app.app_context():
+        _, next_cursor, _ = db_recipe.get_recipes_by_cursor({'sort': sort, 'order': 'desc'}, limit=7)
+        statements = []
+        db = db_recipe.get_read_db()
+        db.set_trace_callback(statements.append)
+        try:
+            db_recipe.get_recipes_by_cursor({'sort': sort, 'order': 'desc'}, cursor=next_cursor, limit=7)
+        finally:
+            db.set_trace_callback(None)
+        plan = ' '.join(row[3] for row in db.execute("EXPLAIN QUERY PLAN " + statements[-1]))
+    assert f"SEARCH recipes USING COVERING INDEX {index} (" in plan or f"SEARCH recipes USING INDEX {index} (" in plan
+    assert 'SCAN recipes' not in plan
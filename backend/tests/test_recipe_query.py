@@ -0,0 +1,53 @@
+# backend/tests/test_recipe_query.py
+# Tests for the compiled recipe list queries (app/models/recipe_query.py)
+
+from backend.app.models import recipe as db_recipe
+from backend.app.models import recipe_query
+from backend.app.models.recipe import get_db
+
+
+def add_recipes(count, **fields):
+    for index in range(count):
+        db_recipe.add_recipe(dict({"name": f"Recipe {index:02d}", "ingredients": [], "instructions": []}, **fields))
+
+
+def test_same_shape_compiles_to_same_sql():
+    first = recipe_query.build({'cuisine': '川菜', 'cook_time_max': 30, 'tags': ['辣', '下饭']})
+    second = recipe_query.build({'cuisine': '粤菜', 'cook_time_max': 10, 'tags': ['清淡', '汤']})
+    assert first.compiled is second.compiled
+    assert first.params == ['辣', '下饭', '川菜', 30]
+    assert second.params == ['清淡', '汤', '粤菜', 10]
+
+
+def test_shape_depends_on_present_filters_and_sort():
+    base = recipe_query.build({'cuisine': '川菜'})
+    assert recipe_query.build({'cuisine': '川菜', 'servings_min': 0}).compiled is not base.compiled
+    assert recipe_query.build({'cuisine': '川菜', 'sort': 'name', 'order': 'asc'}).compiled is not base.compiled
+    # Duplicated terms and empty values do not create new shapes
+    assert recipe_query.build({'cuisine': '川菜', 'difficulty': ''}).compiled is base.compiled
+    assert (recipe_query.build({'ingredients': '鸡蛋, 鸡蛋'}).compiled
+            is recipe_query.build({'ingredients': '番茄'}).compiled)
+
+
+def test_page_and_total_come_from_one_query(db_app):
+    with db_app.app_context():
+        add_recipes(5, cuisine='川菜')
+        add_recipes(2, cuisine='粤菜')
+        recipes, total = db_recipe.get_all_recipes({'cuisine': '川菜'}, page=2, limit=2)
+    assert total == 5
+    assert len(recipes) == 2
+    assert 'total_count' not in recipes[0]
+
+
+def test_total_past_the_last_page(db_app):
+    with db_app.app_context():
+        add_recipes(3)
+        assert db_recipe.get_all_recipes(page=5, limit=2) == ([], 3)
+        assert db_recipe.get_all_recipes({'cuisine': '川菜'}) == ([], 0)
+
+
+def test_explain_reports_the_plan(db_app):
+    with db_app.app_context():
+        query = recipe_query.build({'search': '豆腐'})
+        plan = recipe_query.explain(get_db(), query.compiled.page_sql, recipe_query.page_params(query, 8, 0))
+    assert any('recipes_fts' in line for line in plan)
@@ -0,0 +1,59 @@
+# backend/tests/test_recipe_random.py
+# Tests for random recipe sampling
+
+import pytest
+from backend.app.models import recipe as db_recipe
+from backend.app.models import recipe_sampler
+from backend.app.models.recipe import get_db
+
+
+@pytest.fixture
+def recipe_ids(db_app):
+    with db_app.app_context():
+        ids = []
+        for number in range(30):
+            ids.append(db_recipe.add_recipe({
+                "name": f"菜谱 {number}",
+                "ingredients": [],
+                "instructions": [],
+                "cuisine": "川菜" if number % 3 == 0 else "粤菜",
+                "cook_time_minutes": number,
+                "tags": ["辣"] if number % 2 == 0 else ["清淡"],
+            }))
+        return ids
+
+
+def test_random_returns_distinct_recipes(db_client, recipe_ids):
+    data = db_client.get('/api/recipes/random?count=10').get_json()['data']
+    assert len(data) == 10
+    assert len({recipe['id'] for recipe in data}) == 10
+
+
+def test_seed_makes_the_pick_reproducible(db_client, recipe_ids):
+    first = db_client.get('/api/recipes/random?count=3&seed=2024-05-01').get_json()['data']
+    second = db_client.get('/api/recipes/random?count=3&seed=2024-05-01').get_json()['data']
+    assert [recipe['id'] for recipe in first] == [recipe['id'] for recipe in second]
+
+
+def test_random_applies_filters(db_client, recipe_ids):
+    data = db_client.get('/api/recipes/random?count=50&cuisine=川菜&tags=辣&cookTimeMax=20').get_json()['data']
+    # Numbers divisible by 6 up to 20: 0, 6, 12, 18
+    assert sorted(recipe['cook_time_minutes'] for recipe in data) == [0, 6, 12, 18]
+
+
+def test_probing_skips_deleted_ids(db_app, recipe_ids):
+    with db_app.app_context():
+        for recipe_id in recipe_ids[::2]:
+            db_recipe.delete_recipe(recipe_id)
+        remaining = set(recipe_ids[1::2])
+        for seed in range(20):
+            ids = recipe_sampler.sample_ids(get_db(), 5, seed=seed)
+            assert len(ids) == 5 and set(ids) <= remaining
+
+
+def test_id_array_is_refreshed_after_writes(db_app, db_client, recipe_ids):
+    url = '/api/recipes/random?count=50&cuisine=鲁菜'
+    assert db_client.get(url).get_json()['data'] == []
+    with db_app.app_context():
+        db_recipe.update_recipe(recipe_ids[0], {"cuisine": "鲁菜"})
+    assert [recipe['id'] for recipe in db_client.get(url).get_json()['data']] == [recipe_ids[0]]
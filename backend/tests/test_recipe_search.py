@@ -0,0 +1,59 @@
+# backend/tests/test_recipe_search.py
+# Tests for the full-text recipe search
+
+import json
+from backend.app.models import recipe as db_recipe
+
+
+def add_recipes(app):
+    with app.app_context():
+        db_recipe.add_recipe({
+            "name": "麻婆豆腐",
+            "description": "经典川菜",
+            "ingredients": [{"name": "嫩豆腐", "quantity": "1块"}, {"name": "牛肉末", "quantity": "50克"}],
+            "instructions": ["豆腐切小块。", "下牛肉末炒散。"],
+            "tags": ["川菜"],
+        })
+        db_recipe.add_recipe({
+            "name": "番茄炒蛋",
+            "description": "Quick home style tomato and egg",
+            "ingredients": [{"name": "番茄", "quantity": "2个"}, {"name": "鸡蛋", "quantity": "3个"}],
+            "instructions": ["鸡蛋打散。", "番茄切块。"],
+            "tags": ["家常菜"],
+        })
+
+
+def search(client, term):
+    response = client.get('/api/recipes/', query_string={'search': term})
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    return [recipe['name'] for recipe in data['data']], data['pagination']['total_items']
+
+
+def test_search_matches_chinese_substrings(db_client, db_app):
+    add_recipes(db_app)
+    assert search(db_client, '豆腐') == (['麻婆豆腐'], 1)
+    # Ingredient names and instruction text are indexed as well
+    assert search(db_client, '牛肉') == (['麻婆豆腐'], 1)
+    assert search(db_client, '打散') == (['番茄炒蛋'], 1)
+
+
+def test_search_prefix_and_multiple_terms(db_client, db_app):
+    add_recipes(db_app)
+    assert search(db_client, 'tom') == (['番茄炒蛋'], 1)
+    assert search(db_client, '番茄 豆腐') == ([], 0)
+    # Input that is only FTS syntax / punctuation must not break the query
+    names, total = search(db_client, '"*')
+    assert sorted(names) == sorted(['番茄炒蛋', '麻婆豆腐']) and total == 2
+
+
+def test_search_index_follows_updates_and_deletes(db_client, db_app):
+    add_recipes(db_app)
+    with db_app.app_context():
+        recipe_id = db_recipe.get_all_recipes({'search': '豆腐'})[0][0]['id']
+        db_recipe.update_recipe(recipe_id, {"name": "家常豆花"})
+    assert search(db_client, '豆花') == (['家常豆花'], 1)
+
+    with db_app.app_context():
+        db_recipe.delete_recipe(recipe_id)
+    assert search(db_client, '豆花') == ([], 0)
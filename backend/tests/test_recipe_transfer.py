@@ -0,0 +1,99 @@
+# backend/tests/test_recipe_transfer.py
+# Tests for the NDJSON bulk import/export (app/models/recipe_transfer.py and its endpoints)
+
+import json
+from backend.app.middleware import generate_api_token
+from backend.app.models import recipe as db_recipe
+from backend.app.models import recipe_transfer
+from backend.app.models.recipe import get_db
+
+
+def recipe_line(name, **fields):
+    return json.dumps(dict({"name": name, "ingredients": [{"name": "鸡蛋", "quantity": "2个"}], "instructions": ["炒"]}, **fields))
+
+
+def auth_headers():
+    token, _ = generate_api_token()
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_import_batches_and_reports_invalid_lines(db_app):
+    lines = [
+        recipe_line("番茄炒蛋", tags=["家常"]),
+        "not json",
+        "",
+        json.dumps({"name": "No steps", "ingredients": [{"name": "盐"}], "instructions": []}),
+        json.dumps({"recipeData": json.loads(recipe_line("蛋花汤"))}),
+        recipe_line("蒸蛋", servings=-1),
+        recipe_line("煎蛋"),
+    ]
+    with db_app.app_context():
+        report = recipe_transfer.import_recipes(lines, batch_size=2)
+        names = [row['name'] for row in get_db().execute("SELECT name FROM recipes ORDER BY id")]
+        ingredient_count = get_db().execute("SELECT COUNT(*) FROM recipe_ingredients").fetchone()[0]
+        tags = [row['tag'] for row in get_db().execute("SELECT tag FROM recipe_tags")]
+    assert names == ["番茄炒蛋", "蛋花汤", "煎蛋"]
+    assert ingredient_count == 3
+    assert tags == ["家常"]
+    assert report['imported'] == 3
+    assert report['failed'] == 3
+    assert [failure['line'] for failure in report['errors']] == [2, 4, 6]
+    assert 'instructions' in report['errors'][1]['errors']
+    assert 'servings' in report['errors'][2]['errors']
+
+
+def test_export_round_trips_through_import(db_app):
+    with db_app.app_context():
+        for index in range(5):
+            db_recipe.add_recipe(json.loads(recipe_line(f"Recipe {index}", cuisine='川菜')))
+        chunks = list(recipe_transfer.export_recipes())
+        exported = ''.join(chunks).splitlines()
+        array = json.loads(''.join(recipe_transfer.export_recipes('json')))
+        report = recipe_transfer.import_recipes(exported)
+        total = get_db().execute("SELECT COUNT(*) FROM recipes").fetchone()[0]
+    assert [json.loads(line)['name'] for line in exported] == [f"Recipe {index}" for index in range(5)]
+    assert [recipe['name'] for recipe in array] == [f"Recipe {index}" for index in range(5)]
+    assert report == {'imported': 5, 'failed': 0, 'errors': []}
+    assert total == 10
+
+
+def test_import_and_export_endpoints(db_client):
+    headers = auth_headers()
+    body = '\n'.join([recipe_line("番茄炒蛋"), '{"name": ""}']) + '\n'
+
+    response = db_client.post('/api/secure/recipes/import', data=body, headers=headers,
+                              content_type='application/x-ndjson')
+    assert response.status_code == 200
+    assert response.get_json()['data']['imported'] == 1
+    assert response.get_json()['data']['errors'][0]['line'] == 2
+
+    response = db_client.post('/api/secure/recipes/import', json={}, headers=headers)
+    assert response.status_code == 415
+
+    response = db_client.get('/api/secure/recipes/export', headers=headers)
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    assert response.is_streamed
+    assert [json.loads(line)['name'] for line in response.get_data(as_text=True).splitlines()] == ["番茄炒蛋"]
+
+    assert db_client.get('/api/secure/recipes/export?format=xml', headers=headers).status_code == 400
+    assert db_client.get('/api/secure/recipes/export').status_code == 401
+
+
+def test_import_endpoint_has_its_own_body_limit(db_app, db_client):
+    # MAX_CONTENT_LENGTH is sized for image uploads; the streamed import is not bound by it
+    db_app.config['MAX_CONTENT_LENGTH'] = 1024
+    body = ''.join(recipe_line(f"Recipe {index}") + '\n' for index in range(50))
+    response = db_client.post('/api/secure/recipes/import', data=body, headers=auth_headers(),
+                              content_type='application/x-ndjson')
+    assert response.status_code == 200
+    assert response.get_json()['data']['imported'] == 50
+
+
+def test_import_over_its_body_limit_reports_that_limit(db_app, db_client):
+    db_app.config['RECIPE_IMPORT_MAX_BYTES'] = 2 * 1024
+    body = ''.join(recipe_line(f"Recipe {index}") + '\n' for index in range(50))
+    response = db_client.post('/api/secure/recipes/import', data=body, headers=auth_headers(),
+                              content_type='application/x-ndjson')
+    assert response.status_code == 413
+    assert response.get_json()['message'] == "Request body exceeds the limit of 2KB."
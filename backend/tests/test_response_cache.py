@@ -0,0 +1,132 @@
+# backend/tests/test_response_cache.py
+# Tests for the shared response cache and its invalidation by writes
+
+import sqlite3
+import pytest
+from backend.app.models import recipe as db_recipe
+from backend.app.models import daily_menu as db_daily_menu
+from backend.app.models import response_cache
+from backend.tests.test_recipe_images import make_png, upload
+
+
+@pytest.fixture
+def cache_app(db_app, tmp_path):
+    db_app.config['RESPONSE_CACHE_PATH'] = str(tmp_path / 'response_cache.db')
+    return db_app
+
+
+@pytest.fixture
+def cache_client(cache_app):
+    return cache_app.test_client()
+
+
+def add_recipe(app, name):
+    with app.app_context():
+        return db_recipe.add_recipe({"name": name, "ingredients": [], "instructions": []})
+
+
+def test_list_is_served_from_cache_with_normalized_keys(cache_client, cache_app):
+    add_recipe(cache_app, "番茄炒蛋")
+    assert cache_client.get('/api/recipes/?page=1&limit=5').headers['X-Cache'] == 'MISS'
+    response = cache_client.get('/api/recipes/?limit=5&page=1&search=')
+    assert response.headers['X-Cache'] == 'HIT'
+    assert response.get_json()['data'][0]['name'] == "番茄炒蛋"
+
+    stats = cache_client.get('/api/cache-stats').get_json()['data']
+    assert (stats['hits'], stats['misses'], stats['entries']) == (1, 1, 1)
+
+
+def test_writes_invalidate_only_affected_entries(cache_client, cache_app):
+    first_id = add_recipe(cache_app, "番茄炒蛋")
+    second_id = add_recipe(cache_app, "麻婆豆腐")
+    cache_client.get('/api/recipes/')
+    cache_client.get(f'/api/recipes/{first_id}')
+    cache_client.get(f'/api/recipes/{second_id}')
+
+    with cache_app.app_context():
+        db_recipe.update_recipe(first_id, {"name": "西红柿炒鸡蛋"})
+
+    assert cache_client.get(f'/api/recipes/{second_id}').headers['X-Cache'] == 'HIT'
+    response = cache_client.get(f'/api/recipes/{first_id}')
+    assert response.headers['X-Cache'] == 'MISS'
+    assert response.get_json()['data']['name'] == "西红柿炒鸡蛋"
+    assert cache_client.get('/api/recipes/').headers['X-Cache'] == 'MISS'
+
+
+def test_menu_entries_follow_menu_and_recipe_writes(cache_client, cache_app):
+    recipe_id = add_recipe(cache_app, "番茄炒蛋")
+    other_id = add_recipe(cache_app, "麻婆豆腐")
+    with cache_app.app_context():
+        db_daily_menu.save_menu('2024-05-01', [{"recipe_id": recipe_id, "meal_type": "午餐"}])
+    url = '/api/daily-menus/?date=2024-05-01'
+    cache_client.get(url)
+    assert cache_client.get(url).headers['X-Cache'] == 'HIT'
+
+    # Recipes that are not on the menu don't affect it
+    with cache_app.app_context():
+        db_recipe.update_recipe(other_id, {"description": "川菜"})
+    assert cache_client.get(url).headers['X-Cache'] == 'HIT'
+
+    with cache_app.app_context():
+        db_recipe.update_recipe(recipe_id, {"description": "家常菜"})
+    response = cache_client.get(url)
+    assert response.headers['X-Cache'] == 'MISS'
+    assert response.get_json()['latest_menu']['recipes'][0]['recipe_description'] == "家常菜"
+
+    assert cache_client.get(url).headers['X-Cache'] == 'HIT'
+    assert upload(cache_client, recipe_id, make_png(4, 4)).status_code == 201
+    response = cache_client.get(url)
+    assert response.headers['X-Cache'] == 'MISS'
+    assert response.get_json()['latest_menu']['recipes'][0]['recipe_image_url'] is not None
+
+    with cache_app.app_context():
+        db_daily_menu.save_menu('2024-05-01', [{"recipe_id": other_id, "meal_type": "晚餐"}])
+    response = cache_client.get(url)
+    assert response.headers['X-Cache'] == 'MISS'
+    assert len(response.get_json()['versions']) == 2
+
+
+def test_lru_eviction_and_ttl(cache_client, cache_app):
+    add_recipe(cache_app, "番茄炒蛋")
+    cache_app.config['RESPONSE_CACHE_MAX_ENTRIES'] = 2
+    for page in (1, 2, 3):
+        cache_client.get(f'/api/recipes/?page={page}')
+    with cache_app.app_context():
+        stats = response_cache.get_stats()
+    assert stats['entries'] <= 2
+    assert stats['evictions'] >= 1
+
+    cache_app.config['RESPONSE_CACHE_TTL'] = 0
+    cache_client.get('/api/recipes/?page=9')
+    assert cache_client.get('/api/recipes/?page=9').headers['X-Cache'] == 'MISS'
+
+
+def test_response_built_before_an_invalidation_is_not_stored(cache_app):
+    with cache_app.app_context():
+        # A view read its data, then a write committed and invalidated before the view's put()
+        generation = response_cache.current_generation()
+        response_cache.invalidate(response_cache.recipe_tag(1))
+        response_cache.put('/api/recipes/1', b'{}', 'application/json', [response_cache.recipe_tag(1)], generation)
+        response_cache.put('/api/recipes/2', b'{}', 'application/json', [response_cache.recipe_tag(2)], generation)
+        assert response_cache.get('/api/recipes/1') is None
+        assert response_cache.get('/api/recipes/2') is not None
+
+        response_cache.put('/api/recipes/1', b'{}', 'application/json', [response_cache.recipe_tag(1)], response_cache.current_generation())
+        assert response_cache.get('/api/recipes/1') is not None
+
+
+def test_hits_are_counted_without_writing(cache_client, cache_app):
+    add_recipe(cache_app, "番茄炒蛋")
+    cache_client.get('/api/recipes/')
+    for _ in range(3):
+        assert cache_client.get('/api/recipes/').headers['X-Cache'] == 'HIT'
+
+    cache_file = sqlite3.connect(cache_app.config['RESPONSE_CACHE_PATH'])
+    try:
+        stored_hits = cache_file.execute("SELECT value FROM response_cache_stats WHERE name = 'hits'").fetchone()[0]
+        assert stored_hits == 0
+        with cache_app.app_context():
+            assert response_cache.get_stats()['hits'] == 3
+        assert cache_file.execute("SELECT hits FROM response_cache WHERE key = '/api/recipes'").fetchone()[0] == 3
+    finally:
+        cache_file.close()
@@ -0,0 +1,57 @@
+# backend/tests/test_shopping_list.py
+# Tests for the shopping list aggregation (app/models/shopping_list.py and its endpoint)
+
+import pytest
+from backend.app.models import recipe as db_recipe
+from backend.app.models import daily_menu as db_daily_menu
+from backend.app.models.shopping_list import parse_quantity
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('2个', (2, '个')),
+    ('1.5kg', (1500, '克')),
+    ('1/2杯', (0.5, '杯')),
+    ('半只', (0.5, '只')),
+    ('1茶匙（可选）', (1, '茶匙')),
+    ('330毫升', (330, '毫升')),
+    ('适量', None),
+    ('3-4片', None),
+    ('十二个', (12, '个')),
+    ('二十克', (20, '克')),
+    ('两百克', (200, '克')),
+    ('一百零五毫升', (105, '毫升')),
+    ('12个（现成）', (12, '个')),
+    ('500克左右', None),
+    ('2个鸡蛋', None),
+    (None, None),
+])
+def test_parse_quantity(text, expected):
+    assert parse_quantity(text) == expected
+
+
+def test_shopping_list_merges_latest_menus(db_client, db_app):
+    def recipe(name, ingredients):
+        return db_recipe.add_recipe({"name": name, "ingredients": ingredients, "instructions": ["做"]})
+
+    with db_app.app_context():
+        eggs = recipe("番茄炒蛋", [{"name": "鸡蛋", "quantity": "2个"}, {"name": "番茄", "quantity": "300克"},
+                                   {"name": "盐", "quantity": "适量"}])
+        soup = recipe("番茄汤", [{"name": "番茄", "quantity": "0.5kg"}, {"name": "盐", "quantity": "少许"},
+                                 {"name": "鸡蛋", "quantity": "1个"}])
+        db_daily_menu.save_menu('2024-06-01', [{"recipe_id": soup}])  # Replaced by version 2 below
+        db_daily_menu.save_menu('2024-06-01', [{"recipe_id": eggs, "meal_type": "午餐"}, {"recipe_id": eggs, "meal_type": "晚餐"}])
+        db_daily_menu.save_menu('2024-06-03', [{"recipe_id": soup}])
+        db_daily_menu.save_menu('2024-06-09', [{"recipe_id": soup}])  # Outside the range
+
+    response = db_client.get('/api/daily-menus/shopping-list?from=2024-06-01&to=2024-06-07')
+    assert response.status_code == 200
+    items = {item['name']: item for item in response.get_json()['items']}
+    assert items['鸡蛋']['quantities'] == [{"amount": 5, "unit": "个"}]
+    assert items['番茄']['quantities'] == [{"amount": 1100, "unit": "克"}]
+    assert items['番茄']['recipe_ids'] == sorted([eggs, soup])
+    assert items['盐']['quantities'] == []
+    assert items['盐']['notes'] == ['少许', '适量']
+
+    response = db_client.get('/api/daily-menus/shopping-list?from=2024-06-08&to=2024-06-08')
+    assert response.get_json()['items'] == []
+    assert db_client.get('/api/daily-menus/shopping-list?from=2024-06-08').status_code == 400
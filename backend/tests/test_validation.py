@@ -0,0 +1,65 @@
+# backend/tests/test_validation.py
+# Tests for the compiled recipe validators (app/validation.py)
+
+from backend.app import validation
+from backend.app.middleware import generate_api_token
+
+
+def valid_recipe(**fields):
+    return dict({"name": "番茄炒蛋", "ingredients": [{"name": "鸡蛋", "quantity": "2个"}], "instructions": ["炒"]}, **fields)
+
+
+def test_create_reports_each_field():
+    validated, errors = validation.validate_new_recipe({
+        "name": "",
+        "ingredients": [{"name": "盐"}, "鸡蛋", {"quantity": "1勺"}],
+        "servings": -2,
+        "cook_time_minutes": "abc",
+    })
+    assert validated == {}
+    assert errors == {
+        "name": "Required field 'name' cannot be empty.",
+        "ingredients": [
+            {"index": 1, "errors": {"general": "Ingredient at index 1 must be an object."}},
+            {"index": 2, "errors": {"name": "Ingredient 3: Name is required and cannot be empty."}},
+        ],
+        "instructions": "Missing required field: instructions",
+        "servings": "Servings cannot be negative.",
+        "cook_time_minutes": "Cook Time Minutes must be a valid number if provided.",
+    }
+
+
+def test_create_normalizes_and_drops_unknown_fields():
+    validated, errors = validation.validate_new_recipe(valid_recipe(prep_time_minutes="15", servings=2.5, id=7, rating=5))
+    assert errors == {}
+    assert validated['prep_time_minutes'] == 15
+    assert validated['servings'] == 2.5
+    assert 'id' not in validated and 'rating' not in validated
+
+
+def test_numbers_reject_booleans_and_non_finite_values():
+    _, errors = validation.validate_new_recipe(valid_recipe(servings=True, prep_time_minutes="nan"))
+    assert set(errors) == {'servings', 'prep_time_minutes'}
+
+
+def test_update_checks_only_present_fields():
+    assert validation.validate_recipe_update({"cuisine": "粤菜", "servings": None}) == ({"cuisine": "粤菜", "servings": None}, {})
+    _, errors = validation.validate_recipe_update({"name": "", "ingredients": [], "instructions": "炒"})
+    assert errors == {
+        "name": "Name cannot be empty.",
+        "ingredients": ["Ingredients list cannot be empty if provided for update."],
+        "instructions": "Instructions must be a list of strings.",
+    }
+
+
+def test_both_blueprints_use_the_validators(db_client):
+    token, _ = generate_api_token()
+    headers = {"Authorization": f"Bearer {token}"}
+    response = db_client.post('/api/secure/recipes', json={"recipeData": valid_recipe(servings="4")}, headers=headers)
+    assert response.status_code == 201
+    recipe_id = response.get_json()['data']['id']
+    assert response.get_json()['data']['servings'] == 4
+
+    response = db_client.put(f'/api/recipes/{recipe_id}', json={"recipeData": {"instructions": [" "]}})
+    assert response.status_code == 400
+    assert response.get_json()['errors'] == {"instructions": [{"index": 0, "error": "Instruction must be a non-empty string."}]}
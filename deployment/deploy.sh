@@ -211,6 +211,60 @@ if [ ! -f "instance/database.db" ]; then
     fi
 else
     log_info "Using existing database"
+
+    # Derived indexes are rebuilt from the recipes table, so this is safe on every deploy
+    log_info "Rebuilding search index..."
+    sudo -u $DEPLOY_USER PYTHONPATH=$DEPLOY_DIR/backend $DEPLOY_DIR/venv/bin/python -m flask rebuild-search-index
+    if [ $? -ne 0 ]; then
+        log_error "Failed to rebuild search index"
+        exit 1
+    fi
+
+    log_info "Backfilling recipe lookup tables..."
+    sudo -u $DEPLOY_USER PYTHONPATH=$DEPLOY_DIR/backend $DEPLOY_DIR/venv/bin/python -m flask backfill-recipe-index
+    if [ $? -ne 0 ]; then
+        log_error "Failed to backfill recipe lookup tables"
+        exit 1
+    fi
+
+    log_info "Moving image BLOBs to the image store..."
+    sudo -u $DEPLOY_USER PYTHONPATH=$DEPLOY_DIR/backend $DEPLOY_DIR/venv/bin/python -m flask migrate-images-to-store
+    if [ $? -ne 0 ]; then
+        log_error "Failed to migrate images"
+        exit 1
+    fi
+
+    # Adds the menu content columns if needed and dedupes identical menu versions
+    log_info "Migrating menu versions..."
+    sudo -u $DEPLOY_USER PYTHONPATH=$DEPLOY_DIR/backend $DEPLOY_DIR/venv/bin/python -m flask migrate-menu-versions
+    if [ $? -ne 0 ]; then
+        log_error "Failed to migrate menu versions"
+        exit 1
+    fi
+fi
+
+# HTTP cache validators: (re)creates the version counters and invalidates old ETags after a deploy
+log_info "Refreshing data versions..."
+sudo -u $DEPLOY_USER PYTHONPATH=$DEPLOY_DIR/backend $DEPLOY_DIR/venv/bin/python -m flask init-data-versions
+if [ $? -ne 0 ]; then
+    log_error "Failed to refresh data versions"
+    exit 1
+fi
+
+# Filter/sort indexes of the recipes table and fresh planner statistics
+log_info "Updating recipe indexes..."
+sudo -u $DEPLOY_USER PYTHONPATH=$DEPLOY_DIR/backend $DEPLOY_DIR/venv/bin/python -m flask ensure-indexes
+if [ $? -ne 0 ]; then
+    log_error "Failed to update recipe indexes"
+    exit 1
+fi
+
+# Resized image variants are named by content hash, so only missing ones are generated
+log_info "Generating image derivatives..."
+sudo -u $DEPLOY_USER PYTHONPATH=$DEPLOY_DIR/backend $DEPLOY_DIR/venv/bin/python -m flask generate-image-derivatives
+if [ $? -ne 0 ]; then
+    log_error "Failed to generate image derivatives"
+    exit 1
 fi
 
 # Install systemd services
@@ -55,6 +55,10 @@ if [ -f "../backend/instance/database.db" ]; then
     log_info "Copying existing database"
     mkdir -p $PACKAGE_DIR/backend/instance
     cp ../backend/instance/database.db $PACKAGE_DIR/backend/instance/
+    # Image files referenced by the database live next to it
+    if [ -d "../backend/instance/images" ]; then
+        cp -r ../backend/instance/images $PACKAGE_DIR/backend/instance/
+    fi
 else
     log_warn "Database not found. A new one will be created during deployment."
 fi
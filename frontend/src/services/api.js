@@ -75,9 +75,10 @@ const createRecipe = async (recipeData) => {
 };
 
 // Function to fetch random recipes
-const fetchRandomRecipes = async (count = 3) => {
+// options: { cuisine, difficulty, tags: [], cookTimeMax, seed } (all optional)
+const fetchRandomRecipes = async (count = 3, options = {}) => {
   try {
-    const response = await api.get('/recipes/random', { params: { count } });
+    const response = await api.get('/recipes/random', { params: { count, ...options } });
     // Assuming the backend returns { "data": [...] }
     return response.data.data;
   } catch (error) {
@@ -109,9 +110,14 @@ const uploadRecipeImage = async (recipeId, imageFile) => {
 
 
 // Function to fetch recipe image
-const getRecipeImage = async (recipeId) => {
+// size: 'thumb' | 'card' | 'full' selects a resized variant (omit for the original upload)
+const getRecipeImage = async (recipeId, size) => {
   try {
-    const response = await api.get(`/recipes/${recipeId}/image`, { responseType: 'blob' });
+    const response = await api.get(`/recipes/${recipeId}/image`, {
+      responseType: 'blob',
+      params: size ? { size } : undefined,
+      headers: { Accept: 'image/webp,image/jpeg;q=0.9,*/*;q=0.8' },
+    });
     return URL.createObjectURL(response.data);
   } catch (error) {
     console.error(`API Error fetching image for recipe ${recipeId}:`, error);
@@ -120,6 +126,24 @@ const getRecipeImage = async (recipeId) => {
   }
 };
 
+/**
+ * Builds the direct URL of a recipe's primary image.
+ * Passing the image's content hash as `version` makes the URL cacheable forever,
+ * because a new image always gets a new hash.
+ * @param {number} recipeId - The recipe ID.
+ * @param {string} [version] - The image content hash (recipe_image_hash in menu responses).
+ * @param {string} [size] - 'thumb' | 'card' | 'full' for a resized variant.
+ * @returns {string}
+ */
+const getRecipeImageUrl = (recipeId, version, size) => {
+  const params = new URLSearchParams();
+  if (size) params.set('size', size);
+  if (version) params.set('v', version);
+  const query = params.toString();
+  const url = `${apiBaseUrl}/recipes/${recipeId}/image`;
+  return query ? `${url}?${query}` : url;
+};
+
 // Function to download the database file
 const downloadDatabase = async () => {
   try {
@@ -219,6 +243,38 @@ const fetchDatesWithMenusInMonth = async (year, month) => {
   }
 };
 
+/**
+ * Fetches per-day menu summaries for a date range (at most a year).
+ * @param {string} from - First date, 'YYYY-MM-DD'.
+ * @param {string} to - Last date, 'YYYY-MM-DD' (inclusive).
+ * @returns {Promise<object[]>} - Promise resolving to [{ date, version_count, latest_menu_id, dish_count, meal_types }, ...]
+ */
+const fetchMenuCalendar = async (from, to) => {
+  try {
+    const response = await api.get('/daily-menus/calendar', { params: { from, to } });
+    return response.data.days;
+  } catch (error) {
+    console.error(`API Error fetching menu calendar ${from}..${to}:`, error);
+    throw error;
+  }
+};
+
+/**
+ * Fetches the ingredients needed for the latest menu of every day in a date range, merged by name.
+ * @param {string} from - First date, 'YYYY-MM-DD'.
+ * @param {string} to - Last date, 'YYYY-MM-DD' (inclusive).
+ * @returns {Promise<object[]>} - Promise resolving to [{ name, quantities: [{ amount, unit }], notes, recipe_ids }, ...]
+ */
+const fetchShoppingList = async (from, to) => {
+  try {
+    const response = await api.get('/daily-menus/shopping-list', { params: { from, to } });
+    return response.data.items;
+  } catch (error) {
+    console.error(`API Error fetching shopping list ${from}..${to}:`, error);
+    throw error;
+  }
+};
+
 
 
 export {
@@ -226,6 +282,7 @@ export {
   getRecipeById,
   fetchRandomRecipes,
   getRecipeImage,
+  getRecipeImageUrl,
   uploadRecipeImage,
   createRecipe,
   updateRecipe,
@@ -235,6 +292,8 @@ export {
   saveDailyMenu,
   fetchMenuById,
   fetchDatesWithMenusInMonth,
+  fetchMenuCalendar,
+  fetchShoppingList,
   downloadDatabase, // Export the new function
 };
 
@@ -243,6 +302,7 @@ export default {
   getRecipeById,
   fetchRandomRecipes,
   getRecipeImage,
+  getRecipeImageUrl,
   uploadRecipeImage,
   createRecipe,
   updateRecipe,
@@ -252,5 +312,7 @@ export default {
   saveDailyMenu,
   fetchMenuById,
   fetchDatesWithMenusInMonth,
+  fetchMenuCalendar,
+  fetchShoppingList,
   downloadDatabase,
 };